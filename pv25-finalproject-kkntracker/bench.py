@@ -0,0 +1,277 @@
+"""Benchmarks of the Supabase request layer against fake_postgrest.py.
+
+    python bench.py latency --delays 0 0.1 0.5 1
+    python bench.py coalesce --clicks 20
+    python bench.py retries --fail-rates 0 0.2 0.5
+    python bench.py writes --edits 30 --delay 0.1
+    python bench.py lost --lost-rates 0 0.2 0.5
+    python bench.py feed --edits 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from PyQt6.QtCore import QCoreApplication, QElapsedTimer, QEventLoop, QTimer
+from supabase import ClientOptions, create_client
+
+from fake_postgrest import FakePostgrest
+from feed import ChangeFeed
+from mirror import TABLE, LogbookMirror
+from worker import RequestWorker
+
+# Interval of the timer standing in for the GUI: repaints, animations
+TICK_MS = 5
+
+
+def start_server(args, **options):
+    server = FakePostgrest(("127.0.0.1", 0), **options)
+    server.table.seed(args.rows, random.Random(1))
+    server.serve_in_thread()
+    client = create_client(server.url, "local.dev.key", options=ClientOptions(postgrest_client_timeout=10))
+    return server, client
+
+
+def run_until(app, finished, limit=60.0):
+    """Run the event loop until finished(), return the longest gap between timer ticks in ms"""
+    clock = QElapsedTimer()
+    clock.start()
+    last = [0]
+    longest = [0]
+
+    def tick():
+        now = clock.elapsed()
+        longest[0] = max(longest[0], now - last[0])
+        last[0] = now
+
+    timer = QTimer()
+    timer.timeout.connect(tick)
+    timer.start(TICK_MS)
+    end = time.monotonic() + limit
+    while not finished() and time.monotonic() < end:
+        app.processEvents(QEventLoop.ProcessEventsFlag.AllEvents, 10)
+    tick()
+    timer.stop()
+    return longest[0]
+
+
+def bench_latency(app, args):
+    print(f"{args.rows} kegiatan, jeda timer GUI terpanjang selama memuat seluruh tabel")
+    print(f"{'jeda server':>12}{'langsung ms':>14}{'worker ms':>12}{'selesai ms':>13}")
+    for delay in args.delays:
+        server, client = start_server(args, delay=delay)
+        load = lambda: client.table(TABLE).select("*").execute()
+
+        # The old way: execute() on the GUI thread blocks it for the whole request
+        start = time.perf_counter()
+        load()
+        blocking = (time.perf_counter() - start) * 1000
+
+        worker = RequestWorker()
+        done = []
+        start = time.perf_counter()
+        worker.submit(load, on_done=done.append)
+        stall = run_until(app, lambda: done)
+        total = (time.perf_counter() - start) * 1000
+        worker.close()
+        server.shutdown()
+        print(f"{delay * 1000:>10.0f}ms{blocking:>14.0f}{stall:>12.0f}{total:>13.0f}")
+    return 0
+
+
+def bench_coalesce(app, args):
+    server, client = start_server(args, delay=args.delay)
+    worker = RequestWorker()
+    results = []
+    for _ in range(args.clicks):
+        worker.submit(lambda: client.table(TABLE).select("*").execute(), key="sync", on_done=results.append)
+        app.processEvents()
+    run_until(app, lambda: len(results) == args.clicks)
+    print(f"{args.clicks} klik refresh dalam satu request yang berjalan: {server.requests} request ke server, "
+          f"{len(results)} hasil")
+    worker.close()
+    server.shutdown()
+    return 0
+
+
+def bench_retries(app, args):
+    print(f"{args.reads} pembacaan per baris")
+    print(f"{'gagal server':>13}{'tanpa ulang':>13}{'ulang 3x':>10}{'request':>9}")
+    for fail_rate in args.fail_rates:
+        server, client = start_server(args, fail_rate=fail_rate)
+        worker = RequestWorker()
+        worker.BACKOFF = 0.01
+        successes = {}
+        for retries in (0, 3):
+            outcomes = []
+            for _ in range(args.reads):
+                worker.submit(
+                    lambda: client.table(TABLE).select("id").limit(1).execute(), retries=retries,
+                    on_done=lambda _: outcomes.append(True), on_error=lambda _: outcomes.append(False)
+                )
+            run_until(app, lambda: len(outcomes) == args.reads)
+            successes[retries] = sum(outcomes) / args.reads
+        worker.close()
+        server.shutdown()
+        print(f"{fail_rate:>13.0%}{successes[0]:>13.0%}{successes[3]:>10.0%}{server.requests:>9}")
+    return 0
+
+
+def bench_writes(app, args):
+    server, client = start_server(args, delay=args.delay)
+    rng = random.Random(3)
+    edits = []
+    for i in range(args.edits):
+        kind = rng.choice(["insert", "update", "delete"])
+        edits.append((kind, rng.randint(1, args.rows), {"judul": f"Edit {i}", "jkem": 2, "tanggal": "2025-01-01",
+                                                         "status": "Rencana", "catatan": ""}))
+
+    # The old way: each edit waits for its request before the table shows it
+    start = time.perf_counter()
+    for kind, log_id, values in edits:
+        table = client.table(TABLE)
+        if kind == "insert":
+            table.insert(values).execute()
+        elif kind == "update":
+            table.update(values).eq("id", log_id).execute()
+        else:
+            table.delete().eq("id", log_id).execute()
+    direct = (time.perf_counter() - start) * 1000 / args.edits
+    direct_requests = server.requests
+
+    with tempfile.TemporaryDirectory() as folder:
+        mirror = LogbookMirror(os.path.join(folder, "bench.db"))
+        mirror.sync(client)
+        start = time.perf_counter()
+        for kind, log_id, values in edits:
+            if kind == "insert":
+                mirror.stage_insert(values)
+            elif kind == "update":
+                mirror.stage_update(log_id, values)
+            else:
+                mirror.stage_delete(log_id)
+        staged = (time.perf_counter() - start) * 1000 / args.edits
+        before = server.requests
+        start = time.perf_counter()
+        result = mirror.flush(client)
+        flushed = (time.perf_counter() - start) * 1000
+        mirror.close()
+
+    print(f"{args.edits} edit, jeda server {args.delay * 1000:.0f}ms")
+    print(f"langsung:     {direct:8.1f} ms per edit sampai tampil, {direct_requests} request")
+    print(f"write-behind: {staged:8.1f} ms per edit sampai tampil, {server.requests - before} request "
+          f"({flushed:.0f} ms di belakang, {len(result.conflicts)} konflik)")
+    server.shutdown()
+    return 0
+
+
+def bench_lost(app, args):
+    def values(i):
+        return {"judul": f"Baru {i}", "jkem": 2, "tanggal": "2025-01-01", "status": "Rencana", "catatan": ""}
+
+    print(f"{args.inserts} kegiatan baru, jawaban yang hilang setelah tersimpan")
+    print(f"{'hilang':>8}{'tanpa kunci':>13}{'client_id':>11}")
+    for lost_rate in args.lost_rates:
+        server, client = start_server(args, lost_rate=lost_rate)
+        worker = RequestWorker()
+        worker.BACKOFF = 0.01
+
+        # Without a key: every retry of a lost answer inserts the row again
+        outcomes = []
+        for i in range(args.inserts):
+            worker.submit(
+                lambda i=i: client.table(TABLE).insert(values(i)).execute(), retries=3,
+                on_done=lambda _: outcomes.append(True), on_error=lambda _: outcomes.append(False)
+            )
+        run_until(app, lambda: len(outcomes) == args.inserts)
+        plain = len(server.table.rows) - args.rows
+
+        # The mirror's queue, flushed with retries until empty like the app does
+        with tempfile.TemporaryDirectory() as folder:
+            mirror = LogbookMirror(os.path.join(folder, "bench.db"))
+            mirror.sync(client)
+            before = len(server.table.rows)
+            for i in range(args.inserts):
+                mirror.stage_insert(values(i))
+            while mirror.pending_count():
+                outcomes = []
+                worker.submit(mirror.flush, client, retries=3,
+                              on_done=outcomes.append, on_error=outcomes.append)
+                run_until(app, lambda: outcomes)
+            keyed = len(server.table.rows) - before
+            mirror.close()
+
+        worker.close()
+        server.shutdown()
+        print(f"{lost_rate:>8.0%}{plain:>13}{keyed:>11}")
+    return 0
+
+
+def bench_feed(app, args):
+    server, client = start_server(args)
+    feed = ChangeFeed(server.url, "local.dev.key")
+    seen = {}
+    feed.rowChanged.connect(lambda kind, row: seen.setdefault(row.get("judul"), time.perf_counter()))
+    feed.start()
+    run_until(app, lambda: feed.connected, limit=10)
+
+    latencies = []
+    for i in range(args.edits):
+        judul = f"Edit {i}"
+        start = time.perf_counter()
+        client.table(TABLE).update({"judul": judul}).eq("id", i % args.rows + 1).execute()
+        run_until(app, lambda: judul in seen, limit=5)
+        latencies.append((seen[judul] - start) * 1000)
+    feed.stop()
+    server.shutdown()
+
+    print(f"{args.edits} perubahan anggota lain")
+    print(f"realtime:  median {statistics.median(latencies):.0f} ms, terlama {max(latencies):.0f} ms sampai diterima")
+    print(f"polling:   rata-rata {args.poll / 2:.0f} s, terlama {args.poll:.0f} s (interval {args.poll:.0f} s)")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark request Supabase Logbook KKN")
+    parser.add_argument("--rows", type=int, default=500, help="jumlah kegiatan di server lokal")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    latency = commands.add_parser("latency", help="bandingkan GUI yang menunggu request dengan worker")
+    latency.add_argument("--delays", type=float, nargs="+", default=[0, 0.1, 0.5, 1.0])
+    latency.set_defaults(func=bench_latency)
+
+    coalesce = commands.add_parser("coalesce", help="klik refresh berulang selama sinkronisasi berjalan")
+    coalesce.add_argument("--clicks", type=int, default=20)
+    coalesce.add_argument("--delay", type=float, default=0.5)
+    coalesce.set_defaults(func=bench_coalesce)
+
+    retries = commands.add_parser("retries", help="keberhasilan request dengan server yang sering gagal")
+    retries.add_argument("--fail-rates", type=float, nargs="+", default=[0, 0.2, 0.5])
+    retries.add_argument("--reads", type=int, default=100)
+    retries.set_defaults(func=bench_retries)
+
+    writes = commands.add_parser("writes", help="edit langsung ke server dibandingkan antrean write-behind")
+    writes.add_argument("--edits", type=int, default=30)
+    writes.add_argument("--delay", type=float, default=0.1)
+    writes.set_defaults(func=bench_writes)
+
+    lost = commands.add_parser("lost", help="kegiatan ganda saat jawaban server hilang setelah tersimpan")
+    lost.add_argument("--lost-rates", type=float, nargs="+", default=[0, 0.2, 0.5])
+    lost.add_argument("--inserts", type=int, default=50)
+    lost.set_defaults(func=bench_lost)
+
+    feed = commands.add_parser("feed", help="waktu sampai perubahan anggota lain terlihat, realtime dan polling")
+    feed.add_argument("--edits", type=int, default=50)
+    feed.add_argument("--poll", type=float, default=300, help="interval polling lama dalam detik")
+    feed.set_defaults(func=bench_feed)
+
+    args = parser.parse_args(argv)
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    return args.func(app, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,522 @@
+"""Local stand-in for the Supabase REST (PostgREST) endpoints of logbook_kkn.
+
+Keeps the table in memory and understands the requests supabase-py sends
+for this app: select with filters, order, limit and count, insert, update
+and delete. Every write stamps updated_at like the trigger on Supabase and
+is pushed to Realtime subscribers on /realtime/v1/websocket, the same
+Phoenix messages feed.py gets from Supabase. Delays and 502 failures can be
+injected to try slow or flaky networks, also after a write was applied (a
+lost response), and Realtime can be cut off.
+
+    python fake_postgrest.py --port 54321 --seed 200
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=local.dev.key python kkn_appv3.py
+"""
+import argparse
+import base64
+import hashlib
+import itertools
+import json
+import random
+import socket
+import struct
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+TABLE = "logbook_kkn"
+STATUSES = ["Rencana", "Berlangsung", "Selesai", "Dibatalkan"]
+# Query parameters that are not column filters
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+REALTIME_PATH = "/realtime/v1/websocket"
+# Appended to Sec-WebSocket-Key for the handshake answer (RFC 6455)
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _value(text):
+    """A filter or column value as something that compares like in Postgres"""
+    if isinstance(text, (int, float)) or text is None:
+        return text
+    text = str(text)
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        value = datetime.fromisoformat(text)
+    except ValueError:
+        return text
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _matches(row, column, condition):
+    operator, _, operand = condition.partition(".")
+    value = _value(row.get(column))
+    if operator == "is":
+        return (value is None) == (operand == "null")
+    if value is None:
+        return False
+    if operator == "in":
+        return value in [_value(item.strip('"')) for item in operand.strip("()").split(",") if item]
+    operand = _value(operand)
+    try:
+        return {
+            "eq": value == operand,
+            "neq": value != operand,
+            "gt": value > operand,
+            "gte": value >= operand,
+            "lt": value < operand,
+            "lte": value <= operand,
+        }[operator]
+    except TypeError:
+        return False
+
+
+def _sort_key(value):
+    # NULLS LAST, like the Postgres default for ascending order
+    value = _value(value)
+    return (1, 0) if value is None else (0, value)
+
+
+class FakeTable:
+    """The rows of one table plus the id and updated_at sequences"""
+
+    def __init__(self):
+        self.rows = {}
+        self.next_id = 1
+        self.last_stamp = datetime.now(timezone.utc)
+        self.lock = threading.Lock()
+
+    def stamp(self):
+        # Strictly increasing, like now() of separate transactions
+        now = datetime.now(timezone.utc)
+        self.last_stamp = max(now, self.last_stamp + timedelta(microseconds=1))
+        return self.last_stamp.isoformat()
+
+    def insert(self, values):
+        row = {"id": self.next_id, "judul": "", "jkem": 1, "tanggal": date.today().isoformat(),
+               "status": "Rencana", "catatan": ""}
+        row.update({key: value for key, value in values.items() if key != "id"})
+        row["created_at"] = row["updated_at"] = self.stamp()
+        self.rows[row["id"]] = row
+        self.next_id += 1
+        return dict(row)
+
+    def seed(self, count, rng):
+        start = date.today() - timedelta(days=count)
+        for i in range(count):
+            self.insert({
+                "judul": f"Kegiatan {i + 1}",
+                "jkem": rng.randint(1, 8),
+                "tanggal": (start + timedelta(days=i)).isoformat(),
+                "status": rng.choice(STATUSES),
+                "catatan": "Catatan kegiatan " * rng.randint(1, 10),
+            })
+
+    def find(self, column, value):
+        """The row whose column equals value, for on_conflict"""
+        for row in self.rows.values():
+            if value is not None and row.get(column) == value:
+                return row
+        return None
+
+    def select(self, filters):
+        return [row for row in self.rows.values()
+                if all(_matches(row, column, condition) for column, condition in filters)]
+
+
+class RealtimeSession:
+    """One websocket client of the Realtime endpoint, with the topics it joined"""
+
+    def __init__(self, handler):
+        self.connection = handler.connection
+        self.rfile = handler.rfile
+        self.wfile = handler.wfile
+        self.send_lock = threading.Lock()
+        # topic -> postgres_changes subscription id
+        self.topics = {}
+        self.closed = False
+
+    def read_message(self):
+        """Next text message, None once the client closed"""
+        parts = []
+        while True:
+            header = self.rfile.read(2)
+            if len(header) < 2:
+                return None
+            first, second = header
+            opcode = first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", self.rfile.read(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", self.rfile.read(8))[0]
+            mask = self.rfile.read(4) if second & 0x80 else b""
+            payload = self.rfile.read(length)
+            if mask:
+                payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+
+            if opcode == 0x8:
+                self.send_frame(0x8, payload[:2])
+                return None
+            if opcode == 0x9:
+                self.send_frame(0xA, payload)
+            elif opcode != 0xA:
+                parts.append(payload)
+                if first & 0x80:
+                    return b"".join(parts).decode("utf-8")
+
+    def send_frame(self, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        with self.send_lock:
+            if self.closed:
+                return
+            try:
+                self.wfile.write(header + payload)
+                self.wfile.flush()
+            except OSError:
+                self.closed = True
+
+    def send(self, topic, event, payload, ref=None):
+        message = {"topic": topic, "event": event, "payload": payload, "ref": ref}
+        self.send_frame(0x1, json.dumps(message).encode("utf-8"))
+
+    def drop(self):
+        """Cut the connection without a close frame, like a lost network"""
+        self.closed = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class PostgrestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # Request parsing
+    def _parse(self):
+        """(filters, options, JSON body) of the request, None after answering a wrong path"""
+        # Read the body even when unused, the connection is kept alive
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        parts = urlsplit(self.path)
+        prefix = "/rest/v1/"
+        if not parts.path.startswith(prefix) or parts.path[len(prefix):] != TABLE:
+            self._send(404, {"message": f"relation {parts.path} does not exist"})
+            return None
+        params = parse_qsl(parts.query, keep_blank_values=True)
+        filters = [(key, value) for key, value in params if key not in RESERVED_PARAMS]
+        options = {key: value for key, value in params if key in RESERVED_PARAMS}
+        return filters, options, body
+
+    def _prefer(self, name):
+        for part in self.headers.get("Prefer", "").split(","):
+            key, _, value = part.strip().partition("=")
+            if key == name:
+                return value
+        return None
+
+    # Response helpers
+    def _send(self, status, payload=None, headers=None):
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_rows(self, rows, status=200, total=None):
+        headers = {}
+        if total is not None:
+            headers["Content-Range"] = f"0-{len(rows) - 1}/{total}" if rows else f"*/{total}"
+        if "vnd.pgrst.object" in self.headers.get("Accept", ""):
+            if len(rows) != 1:
+                self._send(406, {"code": "PGRST116", "message": "JSON object requested, multiple (or no) rows returned",
+                                 "details": f"The result contains {len(rows)} rows", "hint": None})
+                return
+            self._send(status, rows[0], headers)
+            return
+        self._send(status, rows, headers)
+
+    def _project(self, rows, options):
+        columns = options.get("select", "*")
+        if columns in ("*", ""):
+            return [dict(row) for row in rows]
+        names = [name.strip() for name in columns.split(",")]
+        return [{name: row.get(name) for name in names} for row in rows]
+
+    def _inject(self):
+        """Count the request and apply the configured delay and failures, True when failed"""
+        server = self.server
+        with server.stats_lock:
+            server.requests += 1
+        if server.delay:
+            time.sleep(server.delay)
+        if server.fail_rate and server.rng.random() < server.fail_rate:
+            self._bad_gateway()
+            return True
+        return False
+
+    def _lost(self):
+        """After a write was applied: answer 502 at lost_rate, True when answered"""
+        server = self.server
+        if server.lost_rate and server.rng.random() < server.lost_rate:
+            self._bad_gateway()
+            return True
+        return False
+
+    def _bad_gateway(self):
+        # Like a failing gateway: an HTML page, not a PostgREST error
+        body = b"<html><body>502 Bad Gateway</body></html>"
+        self.send_response(502)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    # Realtime
+    def _realtime(self):
+        server = self.server
+        key = self.headers.get("Sec-WebSocket-Key")
+        if not server.realtime:
+            self._send(503, {"message": "Realtime is unavailable"})
+            return
+        if not key or self.headers.get("Upgrade", "").lower() != "websocket":
+            self._send(400, {"message": "Expected a websocket upgrade"})
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()).decode("ascii")
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.close_connection = True
+
+        session = RealtimeSession(self)
+        with server.stats_lock:
+            server.sessions.add(session)
+        try:
+            while True:
+                text = session.read_message()
+                if text is None:
+                    break
+                self._realtime_message(session, json.loads(text))
+        except (OSError, ValueError):
+            pass
+        finally:
+            session.closed = True
+            with server.stats_lock:
+                server.sessions.discard(session)
+
+    def _realtime_message(self, session, message):
+        topic = message.get("topic")
+        event = message.get("event")
+        ref = message.get("ref")
+        response = {}
+        if event == "phx_join":
+            config = (message.get("payload") or {}).get("config") or {}
+            changes = [dict(change, id=next(self.server.subscription_ids))
+                       for change in config.get("postgres_changes", []) if change.get("table") == TABLE]
+            if changes:
+                session.topics[topic] = changes[0]["id"]
+            response = {"postgres_changes": changes}
+        elif event == "phx_leave":
+            session.topics.pop(topic, None)
+        session.send(topic, "phx_reply", {"status": "ok", "response": response}, ref)
+        if event == "phx_join" and topic in session.topics:
+            session.send(topic, "system", {"status": "ok", "message": "Subscribed to PostgreSQL",
+                                           "extension": "postgres_changes", "channel": topic.split(":", 1)[-1]})
+
+    # Methods
+    def do_GET(self):
+        if self.path.startswith(REALTIME_PATH):
+            self._realtime()
+            return
+        parsed = self._parse()
+        if parsed is None:
+            return
+        filters, options, body = parsed
+        if self._inject():
+            return
+        table = self.server.table
+        with table.lock:
+            rows = [dict(row) for row in table.select(filters)]
+        total = len(rows)
+
+        for spec in reversed(options.get("order", "").split(",")):
+            if not spec:
+                continue
+            column, _, direction = spec.partition(".")
+            descending = direction.startswith("desc")
+            rows.sort(key=lambda row: _sort_key(row.get(column)), reverse=descending)
+
+        offset = int(options.get("offset", 0))
+        limit = options.get("limit")
+        rows = rows[offset:offset + int(limit) if limit is not None else None]
+        self._send_rows(self._project(rows, options), total=total if self._prefer("count") else None)
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        parsed = self._parse()
+        if parsed is None:
+            return
+        _, options, body = parsed
+        values = body if isinstance(body, list) else [body]
+        if self._inject():
+            return
+        # Upsert: on_conflict names a unique column, resolution what to do
+        # with a row that already has the value
+        conflict = options.get("on_conflict")
+        merge = self._prefer("resolution") == "merge-duplicates"
+        table = self.server.table
+        inserted, updated = [], []
+        with table.lock:
+            for value in values:
+                existing = table.find(conflict, value.get(conflict)) if conflict else None
+                if existing is None:
+                    inserted.append(table.insert(value))
+                elif merge:
+                    existing.update({key: item for key, item in value.items() if key not in ("id", "created_at")})
+                    existing["updated_at"] = table.stamp()
+                    updated.append(dict(existing))
+        self.server.publish("INSERT", inserted)
+        self.server.publish("UPDATE", updated)
+        if self._lost():
+            return
+        self._send_rows(self._project(inserted + updated, options), status=201)
+
+    def do_PATCH(self):
+        parsed = self._parse()
+        if parsed is None:
+            return
+        filters, options, body = parsed
+        values = body or {}
+        if self._inject():
+            return
+        table = self.server.table
+        with table.lock:
+            rows = table.select(filters)
+            for row in rows:
+                row.update({key: value for key, value in values.items() if key not in ("id", "created_at")})
+                row["updated_at"] = table.stamp()
+            rows = [dict(row) for row in rows]
+        self.server.publish("UPDATE", rows)
+        if self._lost():
+            return
+        self._send_rows(self._project(rows, options))
+
+    def do_DELETE(self):
+        parsed = self._parse()
+        if parsed is None:
+            return
+        filters, options, body = parsed
+        if self._inject():
+            return
+        table = self.server.table
+        with table.lock:
+            rows = table.select(filters)
+            for row in rows:
+                del table.rows[row["id"]]
+        self.server.publish("DELETE", rows)
+        if self._lost():
+            return
+        self._send_rows(self._project(rows, options))
+
+
+class FakePostgrest(ThreadingHTTPServer):
+    """The server, usable from other scripts: FakePostgrest(("127.0.0.1", 0)).serve_in_thread()"""
+
+    daemon_threads = True
+
+    def __init__(self, address, delay=0.0, fail_rate=0.0, lost_rate=0.0, realtime=True, verbose=False):
+        super().__init__(address, PostgrestHandler)
+        self.table = FakeTable()
+        # Injected per request: seconds of delay and the share answered with
+        # 502, and the share of applied writes answered with 502
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.lost_rate = lost_rate
+        self.rng = random.Random(2)
+        self.verbose = verbose
+        self.requests = 0
+        self.stats_lock = threading.Lock()
+        # Realtime: False refuses new websockets, sessions are the open ones
+        self.realtime = realtime
+        self.sessions = set()
+        self.subscription_ids = itertools.count(1)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def publish(self, kind, rows):
+        """Push INSERT, UPDATE or DELETE of rows to every joined Realtime session"""
+        with self.stats_lock:
+            sessions = list(self.sessions)
+        stamp = datetime.now(timezone.utc).isoformat()
+        for row in rows:
+            # Default replica identity: the old record only has the primary key
+            data = {"schema": "public", "table": TABLE, "commit_timestamp": stamp, "type": kind,
+                    "record": {} if kind == "DELETE" else row,
+                    "old_record": {} if kind == "INSERT" else {"id": row["id"]}, "errors": None}
+            for session in sessions:
+                for topic, subscription in list(session.topics.items()):
+                    session.send(topic, "postgres_changes", {"ids": [subscription], "data": data})
+
+    def drop_realtime(self):
+        """Cut every Realtime connection, as if the network went away"""
+        with self.stats_lock:
+            sessions = list(self.sessions)
+        for session in sessions:
+            session.drop()
+
+    def serve_in_thread(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server PostgREST lokal untuk tabel logbook_kkn")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--seed", type=int, default=0, help="jumlah kegiatan contoh")
+    parser.add_argument("--delay", type=float, default=0.0, help="jeda setiap request dalam detik")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="bagian request yang dijawab 502 (0-1)")
+    parser.add_argument("--lost-rate", type=float, default=0.0,
+                        help="bagian penulisan yang tersimpan tetapi dijawab 502 (0-1)")
+    parser.add_argument("--no-realtime", action="store_true", help="tolak koneksi Realtime (websocket)")
+    parser.add_argument("--verbose", action="store_true", help="tampilkan setiap request")
+    args = parser.parse_args()
+
+    server = FakePostgrest((args.host, args.port), delay=args.delay, fail_rate=args.fail_rate,
+                           lost_rate=args.lost_rate, realtime=not args.no_realtime, verbose=args.verbose)
+    server.table.seed(args.seed, random.Random(1))
+    print(f"SUPABASE_URL={server.url} ({len(server.table.rows)} kegiatan)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
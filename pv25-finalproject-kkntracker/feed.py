@@ -0,0 +1,193 @@
+"""Push feed of row changes in logbook_kkn from Supabase Realtime.
+
+Speaks the Phoenix channel protocol of Realtime over a websocket on its
+own thread (websockets comes with supabase) and hands every change to the
+GUI thread through signals. Realtime only pushes what happens while the
+socket is joined, so every (re)join asks for a delta sync that covers the
+gap. The table has to be in the realtime publication on Supabase:
+
+    alter publication supabase_realtime add table logbook_kkn;
+
+fake_postgrest.py serves the same protocol for local testing.
+"""
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from urllib.parse import urlencode
+
+from PyQt6.QtCore import QObject, pyqtSignal
+from websockets.exceptions import WebSocketException
+from websockets.sync.client import connect
+
+from mirror import TABLE
+
+# Phoenix protocol version used by supabase-js and realtime-py
+VSN = "1.0.0"
+
+
+class FeedError(Exception):
+    """The server ended or refused the subscription"""
+
+
+def realtime_url(supabase_url, key):
+    """Websocket endpoint of Realtime for a Supabase project URL"""
+    base = re.sub(r"^http", "ws", supabase_url.rstrip("/"), flags=re.IGNORECASE)
+    return f"{base}/realtime/v1/websocket?{urlencode({'apikey': key, 'vsn': VSN})}"
+
+
+class ChangeFeed(QObject):
+    """Realtime subscription to INSERT, UPDATE and DELETE on one table.
+
+    rowChanged(type, row) carries the new row, or for DELETE the old row
+    (at least its id). resyncNeeded() asks for a delta sync: after each
+    join, and when an event arrived incomplete. A dropped connection is
+    retried forever with backoff; connectedChanged tells the app when to
+    fall back to polling.
+    """
+
+    rowChanged = pyqtSignal(str, object)
+    resyncNeeded = pyqtSignal()
+    connectedChanged = pyqtSignal(bool)
+
+    # Seconds between Phoenix heartbeats, and without a reply before the
+    # connection counts as dead
+    HEARTBEAT = 25.0
+    HEARTBEAT_TIMEOUT = 10.0
+    JOIN_TIMEOUT = 10.0
+    # Seconds before the first reconnect, doubled up to MAX_BACKOFF
+    BACKOFF = 1.0
+    MAX_BACKOFF = 30.0
+    # How often the thread looks up from a silent socket
+    TICK = 0.5
+
+    def __init__(self, supabase_url, key, table=TABLE, parent=None):
+        super().__init__(parent)
+        self.url = realtime_url(supabase_url, key)
+        self.key = key
+        self.table = table
+        self.topic = f"realtime:{table}"
+        self.connected = False
+        self._refs = itertools.count(1)
+        self._stop = threading.Event()
+        self._socket = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="kkn-realtime", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """Stop reconnecting and close the socket"""
+        self._stop.set()
+        socket = self._socket
+        if socket is not None:
+            socket.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # Feed thread
+    def _run(self):
+        delay = self.BACKOFF
+        while not self._stop.is_set():
+            try:
+                with connect(self.url, open_timeout=self.JOIN_TIMEOUT, ping_interval=None,
+                             close_timeout=1) as socket:
+                    self._socket = socket
+                    self._join(socket)
+                    self._set_connected(True)
+                    self.resyncNeeded.emit()
+                    delay = self.BACKOFF
+                    self._listen(socket)
+            except (OSError, TimeoutError, WebSocketException, FeedError, ValueError):
+                pass
+            finally:
+                self._socket = None
+            if self._stop.is_set():
+                break
+            self._set_connected(False)
+            # Jitter keeps the whole team from reconnecting at the same moment
+            self._stop.wait(delay * random.uniform(0.5, 1.5))
+            delay = min(delay * 2, self.MAX_BACKOFF)
+
+    def _set_connected(self, connected):
+        if connected != self.connected:
+            self.connected = connected
+            self.connectedChanged.emit(connected)
+
+    def _send(self, socket, topic, event, payload):
+        ref = str(next(self._refs))
+        socket.send(json.dumps({"topic": topic, "event": event, "payload": payload, "ref": ref, "join_ref": ref}))
+        return ref
+
+    def _join(self, socket):
+        ref = self._send(socket, self.topic, "phx_join", {
+            "config": {
+                "broadcast": {"ack": False, "self": False},
+                "presence": {"key": ""},
+                "postgres_changes": [{"event": "*", "schema": "public", "table": self.table}],
+                "private": False,
+            },
+            "access_token": self.key,
+        })
+        deadline = time.monotonic() + self.JOIN_TIMEOUT
+        while time.monotonic() < deadline:
+            message = json.loads(socket.recv(timeout=max(deadline - time.monotonic(), 0)))
+            if message.get("ref") == ref:
+                payload = message.get("payload") or {}
+                if payload.get("status") != "ok":
+                    raise FeedError(f"join ditolak: {payload.get('response')}")
+                return
+        raise TimeoutError("join")
+
+    def _listen(self, socket):
+        next_beat = time.monotonic() + self.HEARTBEAT
+        # ref and send time of the heartbeat waiting for its reply
+        waiting = sent = None
+        while not self._stop.is_set():
+            try:
+                message = json.loads(socket.recv(timeout=self.TICK))
+            except TimeoutError:
+                message = None
+
+            if message is not None:
+                if message.get("topic") == "phoenix" and message.get("ref") == waiting:
+                    waiting = None
+                else:
+                    self._handle(message)
+
+            now = time.monotonic()
+            if waiting is not None and now - sent > self.HEARTBEAT_TIMEOUT:
+                raise FeedError("heartbeat tidak dijawab")
+            if now >= next_beat:
+                waiting, sent = self._send(socket, "phoenix", "heartbeat", {}), now
+                next_beat = now + self.HEARTBEAT
+
+    def _handle(self, message):
+        if message.get("topic") != self.topic:
+            return
+        event = message.get("event")
+        payload = message.get("payload") or {}
+        if event == "postgres_changes":
+            data = payload.get("data") or {}
+            # Realtime leaves the record out of events it could not send whole
+            if data.get("errors"):
+                self.resyncNeeded.emit()
+                return
+            kind = data.get("type")
+            row = data.get("old_record") if kind == "DELETE" else data.get("record")
+            if kind in ("INSERT", "UPDATE", "DELETE") and row and "id" in row:
+                self.rowChanged.emit(kind, row)
+            else:
+                self.resyncNeeded.emit()
+        elif event in ("phx_error", "phx_close"):
+            raise FeedError(event)
+        elif event == "system" and payload.get("status") == "error":
+            raise FeedError(payload.get("message") or "system error")
+        elif event == "system" and payload.get("extension") == "postgres_changes":
+            # Supabase starts streaming only now, later than the join reply
+            self.resyncNeeded.emit()
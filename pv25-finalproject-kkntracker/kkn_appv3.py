@@ -9,12 +9,16 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtGui import QAction, QIcon, QFont, QPixmap, QPainter, QColor, QPen, QIntValidator
 from PyQt6.QtCore import QDate, Qt, QTimer, QPropertyAnimation, QRect, QEasingCurve, pyqtSignal
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 import json
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import os
 
+from feed import ChangeFeed
+from mirror import LogbookMirror
+from worker import RequestWorker
+
 # --- PANGGIL KONFIGURASI SUPABASE ---
 load_dotenv()
 
@@ -22,6 +26,19 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
+# Salinan lokal logbook_kkn, tabel dibaca dari sini dan hanya perubahan yang diunduh
+CACHE_DB = os.getenv("KKN_CACHE_DB", "logbook_cache.db")
+
+# Batas waktu (detik) satu request HTTP, dan satu operasi termasuk percobaan ulang
+REQUEST_TIMEOUT = 10
+OPERATION_TIMEOUT = 30
+# Jeda (milidetik) sebelum perubahan yang antre dikirim, dan sebelum dicoba
+# lagi setelah pengiriman gagal
+FLUSH_DELAY_MS = 300
+FLUSH_RETRY_MS = 30000
+# Selama Realtime terputus, data disinkronkan tiap interval ini (milidetik)
+FALLBACK_REFRESH_MS = 60000
+
 NAMA_MAHASISWA = "Muhammad Nune Huria Sakti"
 NIM_MAHASISWA = "F1D022075"
 
@@ -434,9 +451,23 @@ class OverlayWidget(QWidget):
 class KKNLogbookApp(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        self.supabase: Client = create_client(
+            SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(postgrest_client_timeout=REQUEST_TIMEOUT)
+        )
+        self.mirror = LogbookMirror(CACHE_DB)
+        # Every Supabase call runs here, the window never waits for the network
+        self.worker = RequestWorker(self)
+        # Changes of other members, pushed by Supabase Realtime
+        self.feed = ChangeFeed(SUPABASE_URL, SUPABASE_KEY, parent=self)
         self.init_notification_system()
         self.current_log_id = None
+        # Baris lengkap yang sedang dibuka di formulir dan isi awal formulirnya
+        self.current_log = None
+        self.loaded_form = None
+        # Baris lengkap logbook_kkn per id, diisi oleh populate_table
+        self.log_store = {}
+        # True after a flush failed, until the queued edits reach Supabase
+        self.offline = False
         self.overlay = None
         
         self.setWindowTitle("Logbook Digital - KKN PMD")
@@ -447,7 +478,15 @@ class KKNLogbookApp(QMainWindow):
         self.setup_ui()
         self.apply_modern_styles()
         
-        # Load initial data
+        # Single-shot timer that sends queued edits in one go
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.timeout.connect(self.flush_writes)
+        
+        # Show the local copy at once, then send edits left from the last
+        # session and sync it
+        self.show_logs()
+        self.update_pending_label()
         self.load_data()
         
         # Setup auto-refresh
@@ -545,7 +584,17 @@ class KKNLogbookApp(QMainWindow):
         self.last_updated_label = QLabel("Last updated: Never")
         self.last_updated_label.setStyleSheet("color: #666; font-size: 11px;")
         
+        # Edits waiting in the write-behind queue
+        self.pending_label = QLabel("")
+        self.pending_label.setStyleSheet("color: #e67e22; font-size: 11px;")
+        
+        # Realtime connection state
+        self.live_label = QLabel("")
+        self.live_label.setStyleSheet("color: #666; font-size: 11px;")
+        
         status_bar.addWidget(student_info)
+        status_bar.addPermanentWidget(self.pending_label)
+        status_bar.addPermanentWidget(self.live_label)
         status_bar.addPermanentWidget(self.last_updated_label)
         
         self.setStatusBar(status_bar)
@@ -951,74 +1000,160 @@ class KKNLogbookApp(QMainWindow):
         """)
 
     def setup_auto_refresh(self):
-        """Setup auto-refresh timer"""
+        """Follow other members' changes through Realtime, polling only while it is down"""
         self.refresh_timer = QTimer()
         self.refresh_timer.timeout.connect(self.load_data)
-        self.refresh_timer.start(300000)  # Refresh every 5 minutes
+        self.on_feed_state(False)
+        
+        self.feed.rowChanged.connect(self.apply_remote_change)
+        # After every (re)connect: a delta sync covers what happened meanwhile
+        self.feed.resyncNeeded.connect(self.load_data)
+        self.feed.connectedChanged.connect(self.on_feed_state)
+        self.feed.start()
+
+    def on_feed_state(self, connected):
+        if connected:
+            self.refresh_timer.stop()
+            self.live_label.setText("🟢 Realtime")
+        else:
+            self.refresh_timer.start(FALLBACK_REFRESH_MS)
+            self.live_label.setText(f"🔄 Refresh tiap {FALLBACK_REFRESH_MS // 1000} detik")
+
+    def apply_remote_change(self, kind, row):
+        """Apply one pushed row change to the mirror and the table, without reloading either"""
+        log_id = row['id']
+        if kind == "DELETE":
+            # Like apply(), local edits stay until flush() settles them with the server
+            if log_id not in self.log_store or self.mirror.has_pending(log_id):
+                return
+            self.mirror.remove([log_id])
+        elif not self.mirror.apply([row], advance=False):
+            return
+        log = self.mirror.get(log_id)
+        
+        self.table.blockSignals(True)
+        # Our own insert, shown under its temporary id when the flush answered too late
+        for temp_id in [other for other in self.log_store if other < 0 and self.mirror.resolve(other) == log_id]:
+            self.place_table_row(temp_id, None)
+        self.place_table_row(log_id, log)
+        self.table.blockSignals(False)
+        self.update_statistics(list(self.log_store.values()))
+        if self.search_input.text():
+            self.filter_table()
+        self.check_open_log()
+
+    def place_table_row(self, log_id, log):
+        """Update, move or remove the table row of log_id; log None removes it"""
+        ids = [self.table.item(r, 0).data(Qt.ItemDataRole.UserRole) for r in range(self.table.rowCount())]
+        selected = False
+        if log_id in self.log_store:
+            row_idx = ids.index(log_id)
+            selected = self.table.item(row_idx, 0).isSelected()
+            self.table.removeRow(row_idx)
+            del ids[row_idx]
+            del self.log_store[log_id]
+        if log is None:
+            return
+        
+        # Same order as mirror.rows(): newest tanggal first, then highest id
+        key = (log['tanggal'], log_id)
+        row_idx = next((r for r, other in enumerate(ids) if (self.log_store[other]['tanggal'], other) < key), len(ids))
+        self.table.insertRow(row_idx)
+        self.set_table_row(row_idx, log)
+        self.log_store[log_id] = log
+        if selected:
+            self.table.selectRow(row_idx)
 
     def load_data(self):
-        """Load data from Supabase with enhanced error handling"""
-        try:
-            response = self.supabase.table("logbook_kkn").select("*").order("tanggal", desc=True).execute()
-            logs = response.data
-            
-            self.populate_table(logs)
-            self.update_statistics(logs)
-            
-            # Update last updated time
-            current_time = datetime.now().strftime("%H:%M:%S")
-            self.last_updated_label.setText(f"Last updated: {current_time}")
-            
-        except Exception as e:
-            self.show_notification(f"❌ Gagal memuat data: {str(e)}", "error")
+        """Sync the local mirror with Supabase in the background"""
+        # Only rows changed since the last sync are downloaded; a refresh
+        # while a sync is running waits for that sync
+        self.worker.submit(
+            self.mirror.sync, self.supabase,
+            key="sync", retries=3, timeout=OPERATION_TIMEOUT,
+            on_done=self.on_synced, on_late=self.on_synced,
+            on_error=lambda e: self.show_notification(f"⚠️ Gagal sinkron, menampilkan data lokal: {e}", "warning")
+        )
+
+    def on_synced(self, result):
+        """Show the mirror again when the sync brought changes"""
+        current_time = datetime.now().strftime("%H:%M:%S")
+        self.last_updated_label.setText(f"Last updated: {current_time}")
+        if result.error:
+            self.on_flush_failed(result.error)
+        else:
+            self.on_flushed(result.flushed)
+        if result.changed or result.deleted:
+            self.show_logs()
+            self.check_open_log()
+
+    def show_logs(self):
+        """Fill the table and statistics from the local mirror"""
+        logs = self.mirror.rows()
+        self.current_log_id = self.mirror.resolve(self.current_log_id)
+        self.table.blockSignals(True)
+        self.populate_table(logs)
+        # Keep the open kegiatan selected, without refilling the form
+        for row in range(self.table.rowCount()):
+            if self.table.item(row, 0).data(Qt.ItemDataRole.UserRole) == self.current_log_id:
+                self.table.selectRow(row)
+                break
+        self.table.blockSignals(False)
+        self.update_statistics(logs)
 
     def populate_table(self, logs):
         """Populate table with data"""
+        # Full rows by id, the cells below only show a shortened catatan
+        self.log_store = {log['id']: log for log in logs}
         self.table.setRowCount(len(logs))
         
         for row_idx, log in enumerate(logs):
-            # Store ID in first item
-            title_item = QTableWidgetItem(log['judul'])
-            title_item.setData(Qt.ItemDataRole.UserRole, log['id'])
-            self.table.setItem(row_idx, 0, title_item)
-            
-            # JKEM
-            jkem_value = log.get('jkem', 0) # Ambil nilai jkem, default 0 jika tidak ada
-            jkem_item = QTableWidgetItem(str(jkem_value))
-            jkem_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter) # Pusatkan teks
-            self.table.setItem(row_idx, 1, jkem_item)
-            
-            # Date formatting
-            date_str = log['tanggal']
-            try:
-                date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-                formatted_date = date_obj.strftime('%d/%m/%Y')
-            except:
-                formatted_date = date_str
-            self.table.setItem(row_idx, 2, QTableWidgetItem(formatted_date))
-            
-            # Status 
-            status = log['status']
-            status_item = QTableWidgetItem(f" {status}") # Beri spasi agar rapi
-            if 'Selesai' in status:
-                status_item.setBackground(QColor(212, 237, 218))
-                status_item.setText("✅" + status_item.text())
-            elif 'Berlangsung' in status:
-                status_item.setBackground(QColor(255, 243, 205))
-                status_item.setText("⚡" + status_item.text())
-            elif 'Dibatalkan' in status:
-                status_item.setBackground(QColor(248, 215, 218))
-                status_item.setText("❌" + status_item.text())
-            else: # Rencana
-                status_item.setBackground(QColor(209, 236, 241))
-                status_item.setText("📋" + status_item.text())
-            self.table.setItem(row_idx, 3, status_item)
+            self.set_table_row(row_idx, log)
+
+    def set_table_row(self, row_idx, log):
+        """Fill the cells of one table row from a logbook_kkn row"""
+        # Store ID in first item
+        title_item = QTableWidgetItem(log['judul'])
+        title_item.setData(Qt.ItemDataRole.UserRole, log['id'])
+        self.table.setItem(row_idx, 0, title_item)
+        
+        # JKEM
+        jkem_value = log.get('jkem', 0) # Ambil nilai jkem, default 0 jika tidak ada
+        jkem_item = QTableWidgetItem(str(jkem_value))
+        jkem_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter) # Pusatkan teks
+        self.table.setItem(row_idx, 1, jkem_item)
+        
+        # Date formatting
+        date_str = log['tanggal']
+        try:
+            date_obj = datetime.strptime(date_str, '%Y-%m-%d')
+            formatted_date = date_obj.strftime('%d/%m/%Y')
+        except:
+            formatted_date = date_str
+        self.table.setItem(row_idx, 2, QTableWidgetItem(formatted_date))
+        
+        # Status 
+        status = log['status']
+        status_item = QTableWidgetItem(f" {status}") # Beri spasi agar rapi
+        if 'Selesai' in status:
+            status_item.setBackground(QColor(212, 237, 218))
+            status_item.setText("✅" + status_item.text())
+        elif 'Berlangsung' in status:
+            status_item.setBackground(QColor(255, 243, 205))
+            status_item.setText("⚡" + status_item.text())
+        elif 'Dibatalkan' in status:
+            status_item.setBackground(QColor(248, 215, 218))
+            status_item.setText("❌" + status_item.text())
+        else: # Rencana
+            status_item.setBackground(QColor(209, 236, 241))
+            status_item.setText("📋" + status_item.text())
+        self.table.setItem(row_idx, 3, status_item)
 
-            # Notes (truncated) (Kolom 4)
-            notes = log.get('catatan', '')
-            if len(notes) > 50:
-                notes = notes[:50] + "..."
-            self.table.setItem(row_idx, 4, QTableWidgetItem(notes))
+        # Notes (truncated) (Kolom 4)
+        notes = log.get('catatan', '')
+        if len(notes) > 50:
+            notes = notes[:50] + "..."
+        self.table.setItem(row_idx, 4, QTableWidgetItem(notes))
 
     def update_statistics(self, logs):
         """Update statistics display"""
@@ -1055,41 +1190,67 @@ class KKNLogbookApp(QMainWindow):
 
             selected_row = selected_rows[0].row()
             
-            # Ambil ID log dari data pengguna pada item pertama
-            log_id_item = self.table.item(selected_row, 0)
-            self.current_log_id = log_id_item.data(Qt.ItemDataRole.UserRole)
-            
-            # Isi kolom formulir
-            title = self.table.item(selected_row, 0).text()
-            jkem_str = self.table.item(selected_row, 1).text()
-            date_str = self.table.item(selected_row, 2).text()
-            status_with_emoji = self.table.item(selected_row, 3).text().strip()
-            
-            # Ambil catatan lengkap dari database karena tabel hanya menampilkan potongan
-            try:
-                response = self.supabase.table("logbook_kkn").select("catatan, jkem").eq("id", self.current_log_id).single().execute()
-                notes = response.data.get('catatan', '')
-                jkem_val = response.data.get('jkem', 1)
-            except Exception as e:
-                notes = "Gagal mengambil detail."
-                jkem_val = 1
-                self.show_notification(f"❌ Gagal mengambil detail: {e}", "error")
-            
-            self.title_input.setText(title)
-            
-            # Atur tanggal
-            self.date_input.setDate(QDate.fromString(date_str, "dd/MM/yyyy"))
-            
-            # Atur nilai JKEM
-            self.jkem_input.setValue(jkem_val)
-            
-            # Atur status (cocokkan teks tanpa emoji)
-            for i in range(self.status_input.count()):
-                if self.status_input.itemText(i).endswith(status_with_emoji.split(" ", 1)[-1]):
-                    self.status_input.setCurrentIndex(i)
-                    break
-            
-            self.notes_input.setText(notes)
+            # Ambil ID log dari data pengguna pada item pertama, baris lengkapnya
+            # (termasuk catatan yang tidak dipotong) sudah ada di log_store
+            log_id = self.table.item(selected_row, 0).data(Qt.ItemDataRole.UserRole)
+            log = self.log_store.get(log_id)
+            if log is not None:
+                self.fill_form(log)
+
+    def fill_form(self, log):
+        """Isi formulir dari satu baris lengkap logbook_kkn, tanpa request ke server"""
+        self.current_log_id = log['id']
+        self.current_log = log
+        
+        self.title_input.setText(log['judul'])
+        
+        # Atur tanggal
+        self.date_input.setDate(QDate.fromString(log['tanggal'], "yyyy-MM-dd"))
+        
+        # Atur nilai JKEM
+        self.jkem_input.setValue(log.get('jkem') or 1)
+        
+        # Atur status (cocokkan teks tanpa emoji)
+        for i in range(self.status_input.count()):
+            if self.status_input.itemText(i).endswith(log['status']):
+                self.status_input.setCurrentIndex(i)
+                break
+        
+        self.notes_input.setText(log.get('catatan') or '')
+        
+        # Isi awal formulir, untuk mengetahui apakah pengguna sudah mengubahnya
+        self.loaded_form = self.form_data()
+
+    def form_data(self):
+        """Isi formulir sebagai kolom logbook_kkn, tanpa emoji dari teks combo box"""
+        return {
+            'judul': self.title_input.text().strip(),
+            'jkem': self.jkem_input.value(),
+            'tanggal': self.date_input.date().toString("yyyy-MM-dd"),
+            'status': self.status_input.currentText().split(" ", 1)[-1],
+            'catatan': self.notes_input.toPlainText().strip(),
+        }
+
+    def check_open_log(self):
+        """Revalidate the form after a sync, only when the open row got a new version"""
+        self.current_log_id = self.mirror.resolve(self.current_log_id)
+        if self.current_log_id is None:
+            return
+        log = self.log_store.get(self.current_log_id)
+        if log is None:
+            self.current_log_id = None
+            self.current_log = None
+            self.show_notification("⚠️ Kegiatan yang sedang dibuka telah dihapus oleh anggota lain.", "warning")
+            return
+        if log.get('updated_at') == self.current_log.get('updated_at'):
+            return
+        
+        if self.form_data() == self.loaded_form:
+            self.fill_form(log)
+        else:
+            # Keep the user's edits, saving them overwrites the other change knowingly
+            self.current_log = log
+            self.show_notification("⚠️ Kegiatan ini baru diubah oleh anggota lain, update akan menimpanya.", "warning")
 
     def add_log(self):
         """Tambahkan entri log baru ke database"""
@@ -1098,56 +1259,28 @@ class KKNLogbookApp(QMainWindow):
             self.show_notification("❌ Judul kegiatan tidak boleh kosong!", "error")
             return
             
-        # Ambil data dari formulir, hilangkan emoji dari teks combo box
-        jkem = self.jkem_input.value()
-        date_str = self.date_input.date().toString("yyyy-MM-dd")
-        status = self.status_input.currentText().split(" ", 1)[-1]
-        notes = self.notes_input.toPlainText().strip()
-        
-        
-        log_data = {
-            'judul': title,
-            'jkem': jkem,
-            'tanggal': date_str,
-            'status': status,
-            'catatan': notes,
-        }
-        
-        try:
-            self.supabase.table("logbook_kkn").insert(log_data).execute()
-            self.show_notification("✅ Kegiatan berhasil ditambahkan!", "success")
-            self.load_data()
-            self.clear_form()
-        except Exception as e:
-            self.show_notification(f"❌ Gagal menambahkan kegiatan: {e}", "error")
+        # Langsung tampil dari mirror lokal, dikirim ke Supabase di belakang
+        self.mirror.stage_insert(self.form_data())
+        self.after_local_write("✅ Kegiatan berhasil ditambahkan!")
 
     def update_log(self):
         """Perbarui entri log yang ada"""
         if self.current_log_id is None:
             self.show_notification("ℹ️ Pilih kegiatan dari tabel untuk diupdate.", "info")
             return
+        self.current_log_id = self.mirror.resolve(self.current_log_id)
             
         title = self.title_input.text().strip()
         if not title:
             self.show_notification("❌ Judul kegiatan tidak boleh kosong!", "error")
             return
             
-        # Ambil data yang diperbarui dari formulir
-        updated_data = {
-            'judul': title,
-            'jkem': self.jkem_input.value(),
-            'tanggal': self.date_input.date().toString("yyyy-MM-dd"),
-            'status': self.status_input.currentText().split(" ", 1)[-1],
-            'catatan': self.notes_input.toPlainText().strip()
-        }
-        
-        try:
-            self.supabase.table("logbook_kkn").update(updated_data).eq("id", self.current_log_id).execute()
-            self.show_notification("✅ Kegiatan berhasil diupdate!", "success")
-            self.load_data()
+        if self.mirror.stage_update(self.current_log_id, self.form_data()) is None:
+            self.show_notification("⚠️ Kegiatan ini sudah tidak ada.", "warning")
             self.clear_form()
-        except Exception as e:
-            self.show_notification(f"❌ Gagal mengupdate kegiatan: {e}", "error")
+            self.show_logs()
+            return
+        self.after_local_write("✅ Kegiatan berhasil diupdate!")
 
     def delete_log(self):
         """Hapus entri log yang dipilih"""
@@ -1162,13 +1295,55 @@ class KKNLogbookApp(QMainWindow):
                                         QMessageBox.StandardButton.No)
                                         
         if reply == QMessageBox.StandardButton.Yes:
-            try:
-                self.supabase.table("logbook_kkn").delete().eq("id", self.current_log_id).execute()
-                self.show_notification("🗑️ Kegiatan berhasil dihapus!", "success")
-                self.load_data()
-                self.clear_form()
-            except Exception as e:
-                self.show_notification(f"❌ Gagal menghapus kegiatan: {e}", "error")
+            # The dialog waited while a flush may have inserted the row
+            self.mirror.stage_delete(self.mirror.resolve(self.current_log_id))
+            self.after_local_write("🗑️ Kegiatan berhasil dihapus!")
+
+    def after_local_write(self, message):
+        """Show a staged edit at once and send it shortly, together with any edits that follow"""
+        self.clear_form()
+        self.show_logs()
+        self.show_notification(message, "success")
+        self.update_pending_label()
+        self.flush_timer.start(FLUSH_DELAY_MS)
+
+    def flush_writes(self):
+        """Send the queued edits to Supabase in the background"""
+        self.worker.submit(
+            self.mirror.flush, self.supabase,
+            key="flush", retries=3, timeout=OPERATION_TIMEOUT,
+            # A flush that timed out may still have sent the edits
+            on_done=self.on_flushed, on_late=self.on_flushed,
+            on_error=self.on_flush_failed
+        )
+
+    def on_flushed(self, result):
+        """Take the server's ids and report the edits that could not be saved"""
+        if self.offline:
+            self.offline = False
+            self.show_notification("🌐 Tersambung kembali, semua perubahan sudah tersimpan.", "success")
+        for judul, reason in result.conflicts + result.rejected:
+            self.show_notification(f"⚠️ Perubahan '{judul}' tidak disimpan: {reason}", "warning", duration=6000)
+        if result.sent:
+            self.show_logs()
+        self.update_pending_label()
+        # Edits made while this flush was finishing
+        if self.mirror.pending_count():
+            self.flush_timer.start(FLUSH_DELAY_MS)
+
+    def on_flush_failed(self, message):
+        """Keep the edits queued and try again later"""
+        if not self.offline:
+            self.offline = True
+            self.show_notification(
+                f"⚠️ Perubahan disimpan lokal dan dikirim saat koneksi kembali: {message}", "warning", duration=5000
+            )
+        self.update_pending_label()
+        self.flush_timer.start(FLUSH_RETRY_MS)
+
+    def update_pending_label(self):
+        count = self.mirror.pending_count()
+        self.pending_label.setText(f"⏳ {count} perubahan belum terkirim" if count else "")
 
     def clear_form(self):
         """Kosongkan semua kolom input dan pilihan saat ini"""
@@ -1178,6 +1353,7 @@ class KKNLogbookApp(QMainWindow):
         self.status_input.setCurrentIndex(0)
         self.notes_input.clear()
         self.current_log_id = None
+        self.current_log = None
         self.table.clearSelection()
         self.title_input.setFocus()
         self.show_notification("🧹 Formulir dibersihkan.", "info", duration=1500)
@@ -1240,6 +1416,13 @@ class KKNLogbookApp(QMainWindow):
         if hasattr(self, 'notification_manager'):
             self.notification_manager.resize_event()
 
+    def closeEvent(self, event):
+        """Drop pending requests and close the local mirror"""
+        self.feed.stop()
+        self.worker.close()
+        self.mirror.close()
+        super().closeEvent(event)
+
 if __name__ == '__main__':
     app = QApplication(sys.argv)
 
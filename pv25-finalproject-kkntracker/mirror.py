@@ -0,0 +1,450 @@
+"""Local SQLite mirror of the Supabase table logbook_kkn.
+
+The app reads from the mirror; sync() only transfers rows whose
+updated_at is at or after the newest one already mirrored (the
+watermark). The Supabase table needs that column and a trigger that
+keeps it current:
+
+    alter table logbook_kkn
+        add column if not exists updated_at timestamptz not null default now();
+    create or replace function set_updated_at() returns trigger
+        language plpgsql as $$ begin new.updated_at = now(); return new; end $$;
+    create trigger logbook_kkn_updated_at before update on logbook_kkn
+        for each row execute function set_updated_at();
+
+Without the column every sync is a full load.
+
+Inserts carry a client_id generated when the row is added, so an insert
+resent after its answer was lost does not add the row twice:
+
+    alter table logbook_kkn add column if not exists client_id uuid unique;
+
+Without it flush() raises SchemaError and keeps the queue (see readme.md).
+
+Edits are applied to the mirror at once and queued in pending_writes
+(write-behind); flush() sends the queue in order, one request per run of
+inserts or deletes, and an update only lands when the row still has the
+updated_at it was edited from. The queue is part of the SQLite file, so
+edits made offline or before a restart are sent by the next flush.
+"""
+import json
+import sqlite3
+import threading
+import uuid
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from postgrest import APIError
+
+from worker import is_transient
+
+TABLE = "logbook_kkn"
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS logbook (
+        id INTEGER PRIMARY KEY,
+        tanggal TEXT,
+        updated_at TEXT,
+        data TEXT NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_logbook_tanggal ON logbook (tanggal DESC, id DESC);
+
+    CREATE TABLE IF NOT EXISTS sync_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+
+    -- op is insert, update or delete; base is the updated_at the edit was
+    -- made from, log_id is negative for rows not inserted on the server yet
+    CREATE TABLE IF NOT EXISTS pending_writes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        op TEXT NOT NULL,
+        log_id INTEGER NOT NULL,
+        base TEXT,
+        data TEXT
+    );
+'''
+
+# Most pending writes sent in one request
+MAX_BATCH = 200
+
+# PostgREST and Postgres codes for a missing client_id column or a missing
+# unique constraint on it
+SCHEMA_ERRORS = {"42703", "42P10", "PGRST204"}
+
+# Result of LogbookMirror.sync: changed rows (new or different), ids of
+# deleted rows, whether the whole table was transferred, the FlushResult
+# of the pending edits sent first, and the SchemaError message when they
+# could not be sent
+SyncResult = namedtuple("SyncResult", "changed deleted full flushed error")
+
+# Result of LogbookMirror.flush: number of pending writes handled, server id of every
+# inserted temporary id, and (judul, reason) of the edits that were dropped
+# because the row changed on the server or the server rejected them
+FlushResult = namedtuple("FlushResult", "sent ids conflicts rejected")
+
+
+class SchemaError(Exception):
+    """The Supabase table lacks the client_id column or its unique constraint"""
+
+
+def parse_timestamp(value):
+    """Supabase timestamptz text as an aware datetime"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _encode(row):
+    return json.dumps(row, sort_keys=True, ensure_ascii=False)
+
+
+class LogbookMirror:
+    """Rows of logbook_kkn kept in a local SQLite file.
+
+    Safe to use from several threads: sync() runs on the request worker
+    while the GUI thread reads.
+    """
+
+    def __init__(self, path="logbook_cache.db"):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.RLock()
+        # Held for a whole flush or sync, one exchange with the server at a time
+        self.remote_lock = threading.RLock()
+        # seq of the pending writes whose request is on its way
+        self.sending = set()
+        # Server id of every temporary id inserted since the mirror was opened,
+        # also for flushes whose result never reached the app
+        self.settled = {}
+        with self.lock:
+            self.conn.executescript(SCHEMA)
+
+    def rows(self):
+        """All mirrored rows as dicts, newest tanggal first (like the old select)"""
+        with self.lock:
+            cursor = self.conn.execute("SELECT data FROM logbook ORDER BY tanggal DESC, id DESC")
+            return [json.loads(data) for data, in cursor]
+
+    def get(self, log_id):
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM logbook WHERE id = ?", (log_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def ids(self):
+        """Ids the server should have: mirrored rows without local-only inserts, plus pending deletes"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id FROM logbook WHERE id > 0 UNION SELECT log_id FROM pending_writes WHERE op = 'delete'"
+            )
+            return {log_id for log_id, in rows}
+
+    def resolve(self, log_id):
+        """The server id of a row inserted under a temporary id, other ids unchanged"""
+        with self.lock:
+            return self.settled.get(log_id, log_id)
+
+    def count(self):
+        return len(self.ids())
+
+    def pending_count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM pending_writes").fetchone()[0]
+
+    def has_pending(self, log_id):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM pending_writes WHERE log_id = ?", (log_id,)).fetchone() is not None
+
+    def _pending_ids(self):
+        return {log_id for log_id, in self.conn.execute("SELECT DISTINCT log_id FROM pending_writes")}
+
+    def _write(self, row):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO logbook (id, tanggal, updated_at, data) VALUES (?, ?, ?, ?)",
+            (row["id"], row.get("tanggal"), row.get("updated_at"), _encode(row))
+        )
+
+    def watermark(self):
+        """updated_at of the newest mirrored change, None before the first delta-capable sync"""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM sync_state WHERE key = 'watermark'").fetchone()
+        return row[0] if row else None
+
+    def apply(self, rows, advance=True):
+        """Insert or replace rows, returns the ones that were new or different.
+
+        Rows with pending edits keep the local version, flush() settles them.
+        With advance=False the watermark stays, for rows that did not come
+        from a pull (realtime events), so the next pull still covers any
+        change missed in between.
+        """
+        changed = []
+        with self.lock, self.conn:
+            watermark = self.watermark()
+            pending = self._pending_ids()
+            for row in rows:
+                current = self.conn.execute("SELECT data FROM logbook WHERE id = ?", (row["id"],)).fetchone()
+                if row["id"] not in pending and (current is None or current[0] != _encode(row)):
+                    self._write(row)
+                    changed.append(row)
+
+                stamp = row.get("updated_at")
+                if stamp and (watermark is None or parse_timestamp(stamp) > parse_timestamp(watermark)):
+                    watermark = stamp
+            if advance and watermark is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO sync_state (key, value) VALUES ('watermark', ?)", (watermark,)
+                )
+        return changed
+
+    def remove(self, ids):
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM logbook WHERE id = ?", [(log_id,) for log_id in ids])
+
+    # Local edits, called on the GUI thread
+    def stage_insert(self, values):
+        """Add a row under a temporary negative id and queue its insert, returns the row"""
+        values = dict(values, client_id=str(uuid.uuid4()))
+        with self.lock, self.conn:
+            lowest = self.conn.execute(
+                "SELECT MIN(id) FROM (SELECT id FROM logbook UNION SELECT log_id FROM pending_writes)"
+            ).fetchone()[0]
+            row = dict(values, id=min(lowest or 0, 0) - 1)
+            self._write(row)
+            self.conn.execute(
+                "INSERT INTO pending_writes (op, log_id, data) VALUES ('insert', ?, ?)", (row["id"], _encode(values))
+            )
+        return row
+
+    def stage_update(self, log_id, values):
+        """Change a mirrored row and queue the update, returns the row or None when it is gone"""
+        with self.lock, self.conn:
+            current = self.get(log_id)
+            if current is None:
+                return None
+            row = dict(current, **values)
+            self._write(row)
+
+            # Fold into the last queued write of the row while it is not on its way
+            last = self.conn.execute(
+                "SELECT seq, op, data FROM pending_writes WHERE log_id = ? ORDER BY seq DESC LIMIT 1", (log_id,)
+            ).fetchone()
+            if last is not None and last[0] not in self.sending:
+                seq, _, data = last
+                self.conn.execute(
+                    "UPDATE pending_writes SET data = ? WHERE seq = ?", (_encode(dict(json.loads(data), **values)), seq)
+                )
+            else:
+                self.conn.execute(
+                    "INSERT INTO pending_writes (op, log_id, base, data) VALUES ('update', ?, ?, ?)",
+                    (log_id, current.get("updated_at"), _encode(values))
+                )
+        return row
+
+    def stage_delete(self, log_id):
+        """Remove a row and queue its delete; a row never sent just disappears"""
+        with self.lock, self.conn:
+            current = self.get(log_id)
+            self.conn.execute("DELETE FROM logbook WHERE id = ?", (log_id,))
+            queued = self.conn.execute(
+                "SELECT seq, op FROM pending_writes WHERE log_id = ? ORDER BY seq", (log_id,)
+            ).fetchall()
+            unsent = [seq for seq, _ in queued if seq not in self.sending]
+            self.conn.executemany("DELETE FROM pending_writes WHERE seq = ?", [(seq,) for seq in unsent])
+            if log_id > 0 or len(unsent) < len(queued):
+                self.conn.execute(
+                    "INSERT INTO pending_writes (op, log_id, base) VALUES ('delete', ?, ?)",
+                    (log_id, current.get("updated_at") if current else None)
+                )
+
+    def clear(self):
+        """Forget every row and the watermark, the next sync is a full load"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM logbook")
+            self.conn.execute("DELETE FROM sync_state WHERE key = 'watermark'")
+
+    # Write-behind, called on the request worker
+    def flush(self, client):
+        """Send the pending writes in order through client, returns a FlushResult.
+
+        Network errors, overloaded servers and SchemaError are raised;
+        whatever was not sent stays queued. A rejected batch is retried one
+        write at a time, and a write the server rejects on its own is dropped.
+        """
+        ids, conflicts, rejected = {}, [], []
+        sent = 0
+        single = False
+        with self.remote_lock:
+            while True:
+                batch = self._next_batch(single)
+                if not batch:
+                    break
+                op = batch[0][1]
+                try:
+                    if op == "insert":
+                        conflicts += self._send_inserts(client, batch, ids)
+                    elif op == "delete":
+                        self._send_deletes(client, batch)
+                    else:
+                        conflicts += self._send_update(client, batch[0])
+                except APIError as e:
+                    if is_transient(e):
+                        raise
+                    if len(batch) > 1:
+                        single = True
+                        continue
+                    rejected += self._discard(client, batch[0][2], e.message or str(e))
+                finally:
+                    with self.lock:
+                        self.sending.clear()
+                sent += len(batch)
+        return FlushResult(sent, ids, conflicts, rejected)
+
+    def _next_batch(self, single):
+        """Leading run of queued inserts or deletes, or the first update, marked as sending"""
+        with self.lock:
+            queued = self.conn.execute(
+                "SELECT seq, op, log_id, base, data FROM pending_writes ORDER BY seq LIMIT ?", (MAX_BATCH,)
+            ).fetchall()
+            batch = []
+            for entry in queued:
+                if batch and (single or entry[1] != batch[0][1] or entry[1] == "update"):
+                    break
+                batch.append(entry)
+            self.sending.update(entry[0] for entry in batch)
+        return batch
+
+    def _send_inserts(self, client, batch, ids):
+        """Insert rows keyed by client_id, returns the conflicts.
+
+        Rows already inserted by an attempt whose answer was lost are
+        skipped by the server and fetched instead.
+        """
+        values = []
+        with self.lock, self.conn:
+            for seq, _, _, _, data in batch:
+                value = json.loads(data)
+                if not value.get("client_id"):
+                    # Queued before inserts had a key
+                    value["client_id"] = str(uuid.uuid4())
+                    self.conn.execute("UPDATE pending_writes SET data = ? WHERE seq = ?", (_encode(value), seq))
+                values.append(value)
+
+        table = client.table(TABLE)
+        try:
+            rows = table.upsert(values, on_conflict="client_id", ignore_duplicates=True).execute().data
+        except APIError as e:
+            # Not the rows' fault, dropping them would lose every new kegiatan
+            if str(e.code) in SCHEMA_ERRORS:
+                raise SchemaError(
+                    f"kolom client_id (uuid unique) belum ada di tabel {TABLE}, lihat readme.md: {e.message or e}"
+                ) from e
+            raise
+        found = {row["client_id"]: row for row in rows}
+        missing = [value["client_id"] for value in values if value["client_id"] not in found]
+        if missing:
+            found.update((row["client_id"], row) for row in table.select("*").in_("client_id", missing).execute().data)
+
+        gone = []
+        with self.lock, self.conn:
+            for (seq, _, temp_id, _, _), value in zip(batch, values):
+                row = found.get(value["client_id"])
+                if row is None:
+                    gone.append(temp_id)
+                    continue
+                self.conn.execute("DELETE FROM pending_writes WHERE seq = ?", (seq,))
+                self._settle(temp_id, row)
+                ids[temp_id] = row["id"]
+        # Inserted, then deleted by someone else before the answer came through
+        return [conflict for temp_id in gone for conflict in self._discard(client, temp_id, "dihapus oleh anggota lain")]
+
+    def _send_deletes(self, client, batch):
+        # A delete wins over edits made on the server meanwhile
+        client.table(TABLE).delete().in_("id", [entry[2] for entry in batch]).execute()
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM pending_writes WHERE seq = ?", [(entry[0],) for entry in batch])
+
+    def _send_update(self, client, entry):
+        """PATCH one row if it still has the updated_at it was edited from, returns the conflicts"""
+        seq, _, log_id, base, data = entry
+        query = client.table(TABLE).update(json.loads(data)).eq("id", log_id)
+        if base is not None:
+            query = query.eq("updated_at", base)
+        rows = query.execute().data
+        if not rows:
+            # Changed or deleted by someone else since the edit: theirs is kept
+            return self._discard(client, log_id, "diubah atau dihapus oleh anggota lain")
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM pending_writes WHERE seq = ?", (seq,))
+            self._settle(log_id, rows[0])
+        return []
+
+    def _settle(self, log_id, row):
+        """Store the server's row for a sent write, keeping later local edits on top of it"""
+        local = self.get(log_id)
+        stamp = row.get("updated_at")
+        if log_id < 0:
+            self.settled[log_id] = row["id"]
+        self.conn.execute("UPDATE pending_writes SET log_id = ?, base = ? WHERE log_id = ?", (row["id"], stamp, log_id))
+        self.conn.execute("DELETE FROM logbook WHERE id = ?", (log_id,))
+        if not self.conn.execute("SELECT 1 FROM pending_writes WHERE log_id = ?", (row["id"],)).fetchone():
+            self._write(row)
+        elif local is not None:
+            self._write(dict(local, id=row["id"], updated_at=stamp))
+
+    def _discard(self, client, log_id, reason):
+        """Drop the pending writes of a row and restore the server's version, returns [(judul, reason)]"""
+        local = self.get(log_id)
+        with self.lock:
+            data = self.conn.execute(
+                "SELECT data FROM pending_writes WHERE log_id = ? AND data IS NOT NULL ORDER BY seq DESC", (log_id,)
+            ).fetchone()
+        values = local or (json.loads(data[0]) if data else {})
+        judul = values.get("judul") or f"kegiatan #{log_id}"
+        rows = client.table(TABLE).select("*").eq("id", log_id).execute().data if log_id > 0 else []
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM pending_writes WHERE log_id = ?", (log_id,))
+            self.conn.execute("DELETE FROM logbook WHERE id = ?", (log_id,))
+            for row in rows:
+                self._write(row)
+        return [(judul, reason)]
+
+    def sync(self, client):
+        """Send the pending writes, then bring the mirror up to date with the Supabase table"""
+        with self.remote_lock:
+            try:
+                flushed = self.flush(client)
+            except SchemaError as e:
+                # Reading still works, the edits wait for the column
+                return self._pull(client)._replace(error=str(e))
+            return self._pull(client)._replace(flushed=flushed)
+
+    def _pull(self, client):
+        watermark = self.watermark()
+        if watermark is None:
+            rows = client.table(TABLE).select("*").execute().data
+            deleted = self.ids() - {row["id"] for row in rows}
+            self.remove(deleted)
+            return SyncResult(self.apply(rows), deleted, True, None, None)
+
+        # Rows changed at the watermark itself come back again, apply() skips them
+        rows = client.table(TABLE).select("*").gte("updated_at", watermark).order("updated_at").execute().data
+        changed = self.apply(rows)
+
+        # Every remote row is mirrored now, so a different count means rows
+        # were deleted, or committed with an updated_at before the watermark
+        deleted = set()
+        remote_count = client.table(TABLE).select("id", count="exact", head=True).execute().count
+        if remote_count != self.count():
+            remote_ids = {row["id"] for row in client.table(TABLE).select("id").execute().data}
+            local_ids = self.ids()
+            deleted = local_ids - remote_ids
+            self.remove(deleted)
+            missing = remote_ids - local_ids
+            if missing:
+                rows = client.table(TABLE).select("*").in_("id", sorted(missing)).execute().data
+                changed += self.apply(rows)
+        return SyncResult(changed, deleted, False, None, None)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
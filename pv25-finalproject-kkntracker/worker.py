@@ -0,0 +1,194 @@
+import itertools
+import random
+import threading
+
+import httpx
+from postgrest import APIError
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+# HTTP status codes worth another try, the request itself was fine
+TRANSIENT_STATUS = {"408", "425", "429", "500", "502", "503", "504"}
+
+
+def is_transient(error):
+    """True for network errors and overloaded servers, False for rejected requests"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    return isinstance(error, APIError) and str(error.code) in TRANSIENT_STATUS
+
+
+class RequestTask(QRunnable):
+    """One Supabase call, retried with backoff while it fails transiently"""
+
+    def __init__(self, worker, task_id, function, args, kwargs, retries):
+        super().__init__()
+        self.worker = worker
+        self.task_id = task_id
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.retries = retries
+        # Set by cancel(), also wakes a task sleeping between attempts
+        self.cancelled = threading.Event()
+
+    def run(self):
+        delay = self.worker.BACKOFF
+        for attempt in range(self.retries + 1):
+            if self.cancelled.is_set():
+                # Lets the worker forget the call
+                self.worker.taskFailed.emit(self.task_id, "dibatalkan")
+                return
+            try:
+                result = self.function(*self.args, **self.kwargs)
+            except Exception as e:
+                if attempt == self.retries or not is_transient(e):
+                    self.worker.taskFailed.emit(self.task_id, str(e))
+                    return
+                # Jitter keeps several clients from retrying in lockstep
+                self.cancelled.wait(delay * random.uniform(0.5, 1.5))
+                delay = min(delay * 2, self.worker.MAX_BACKOFF)
+            else:
+                self.worker.taskFinished.emit(self.task_id, result)
+                return
+
+
+class RequestWorker(QObject):
+    """Runs blocking Supabase calls on a thread pool, off the GUI thread.
+
+    submit() returns at once; on_done(result) or on_error(message) is
+    called later on the GUI thread through queued signals. Calls with the
+    same key share one request while it runs, and a call submitted with a
+    group cancels the earlier call of that group.
+    """
+
+    taskFinished = pyqtSignal(int, object)
+    taskFailed = pyqtSignal(int, str)
+    busyChanged = pyqtSignal(bool)
+
+    # Seconds before the first retry, doubled for every next one
+    BACKOFF = 0.5
+    MAX_BACKOFF = 8.0
+
+    def __init__(self, parent=None, max_threads=4):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+
+        self._ids = itertools.count(1)
+        self._tasks = {}
+        self._callbacks = {}
+        self._keys = {}
+        self._groups = {}
+        # on_late callbacks of calls submitted with one, until they return
+        self._late = {}
+
+        self.taskFinished.connect(self._on_finished)
+        self.taskFailed.connect(self._on_failed)
+
+    def submit(self, function, *args, on_done=None, on_error=None, on_late=None, key=None, group=None,
+               retries=0, timeout=None, **kwargs):
+        """Queue function(*args, **kwargs) and return its task id.
+
+        Only idempotent calls (reads, updates and deletes by id, inserts
+        keyed by client_id) should get retries. After timeout seconds the
+        call is given up with an error, whatever the retries are doing; an
+        attempt already on its way may still succeed, on_late(result) then
+        gets its result.
+        """
+        # Same request already running, wait for its result instead
+        if key is not None and key in self._keys:
+            task_id = self._keys[key]
+            self._callbacks[task_id].append((on_done, on_error))
+            # One late result needs each handler once, however often it was asked for
+            if on_late and on_late not in self._late.get(task_id, []):
+                self._late.setdefault(task_id, []).append(on_late)
+            return task_id
+
+        task_id = next(self._ids)
+        task = RequestTask(self, task_id, function, args, kwargs, retries)
+        if group is not None:
+            previous = self._groups.get(group)
+            if previous is not None:
+                self.cancel(previous)
+            self._groups[group] = task_id
+        if key is not None:
+            self._keys[key] = task_id
+
+        was_busy = self.is_busy()
+        self._tasks[task_id] = (task, key, group)
+        self._callbacks[task_id] = [(on_done, on_error)]
+        if on_late:
+            self._late[task_id] = [on_late]
+        if timeout is not None:
+            QTimer.singleShot(int(timeout * 1000), lambda: self._expire(task_id, timeout))
+        self.pool.start(task)
+        if not was_busy:
+            self.busyChanged.emit(True)
+        return task_id
+
+    def cancel(self, task_id):
+        """Drop a call: it is not retried again and its result is ignored"""
+        entry = self._tasks.get(task_id)
+        if entry is not None:
+            entry[0].cancelled.set()
+        self._late.pop(task_id, None)
+        self._release(task_id)
+
+    def cancel_group(self, group):
+        task_id = self._groups.get(group)
+        if task_id is not None:
+            self.cancel(task_id)
+
+    def is_busy(self):
+        return bool(self._tasks)
+
+    def close(self, timeout=5.0):
+        """Cancel everything and wait a little for running requests to return"""
+        for task_id in list(self._tasks):
+            self.cancel(task_id)
+        self._late.clear()
+        self.pool.waitForDone(int(timeout * 1000))
+
+    # Called on the GUI thread
+    def _release(self, task_id):
+        entry = self._tasks.pop(task_id, None)
+        callbacks = self._callbacks.pop(task_id, [])
+        if entry is not None:
+            _, key, group = entry
+            if key is not None and self._keys.get(key) == task_id:
+                del self._keys[key]
+            if group is not None and self._groups.get(group) == task_id:
+                del self._groups[group]
+            if not self._tasks:
+                self.busyChanged.emit(False)
+        return callbacks
+
+    def _expire(self, task_id, timeout):
+        if task_id not in self._tasks:
+            return
+        callbacks = self._callbacks.get(task_id, [])
+        # Unlike cancel(), a late result is still wanted
+        late = self._late.pop(task_id, None)
+        self.cancel(task_id)
+        if late:
+            self._late[task_id] = late
+        for _, on_error in callbacks:
+            if on_error:
+                on_error(f"tidak ada jawaban dari server dalam {timeout:g} detik")
+
+    def _on_finished(self, task_id, result):
+        late = self._late.pop(task_id, [])
+        if task_id not in self._tasks:
+            # Expired before the answer came
+            for on_late in late:
+                on_late(result)
+            return
+        for on_done, _ in self._release(task_id):
+            if on_done:
+                on_done(result)
+
+    def _on_failed(self, task_id, message):
+        self._late.pop(task_id, None)
+        for _, on_error in self._release(task_id):
+            if on_error:
+                on_error(message)
@@ -0,0 +1,227 @@
+import bisect
+import heapq
+import math
+import operator
+from array import array
+from collections import namedtuple
+
+# NumPy is optional, every calculation has a stdlib version
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Item columns loaded for analysis, row i of every array is one item.
+# category holds an index into categories.
+Inventory = namedtuple("Inventory", "codes quantity price category categories")
+
+# Result of abc_classification: classes has 0 (A), 1 (B) or 2 (C) per item
+ABCResult = namedtuple("ABCResult", "classes counts value_shares")
+ABC_LABELS = "ABC"
+
+
+def load_inventory(db, chunk_size=50000, use_numpy=None):
+    """Read code, quantity, price and category of every item into arrays.
+
+    Rows are fetched in chunks straight into typed arrays; with NumPy
+    (default when installed) those are then viewed as ndarrays without
+    copying.
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+
+    codes = []
+    quantity = array("q")
+    price = array("d")
+    category = array("q")
+    index = {}
+
+    # Own cursor, like the exports
+    cursor = db.conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT code, CAST(COALESCE(quantity, 0) AS INTEGER), COALESCE(price, 0),
+                   COALESCE(category, '')
+            FROM items
+        ''')
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            chunk_codes, chunk_quantity, chunk_price, chunk_category = zip(*rows)
+            codes.extend(chunk_codes)
+            quantity.extend(chunk_quantity)
+            price.extend(chunk_price)
+            for name in set(chunk_category).difference(index):
+                index[name] = len(index)
+            category.extend(map(index.__getitem__, chunk_category))
+    finally:
+        cursor.close()
+
+    if use_numpy:
+        quantity = np.frombuffer(quantity, dtype=np.int64)
+        price = np.frombuffer(price, dtype=np.float64)
+        category = np.frombuffer(category, dtype=np.int64)
+    return Inventory(codes, quantity, price, category, list(index))
+
+
+def _vectorized(inventory):
+    return np is not None and isinstance(inventory.quantity, np.ndarray)
+
+
+def item_values(inventory):
+    """Stock value (quantity * price) of every item"""
+    if _vectorized(inventory):
+        return inventory.quantity * inventory.price
+    return array("d", map(operator.mul, inventory.quantity, inventory.price))
+
+
+def valuation(inventory, values=None):
+    """(number of items, total quantity, total value)"""
+    if values is None:
+        values = item_values(inventory)
+    if _vectorized(inventory):
+        return len(inventory.codes), int(inventory.quantity.sum()), float(values.sum())
+    return len(inventory.codes), sum(inventory.quantity), math.fsum(values)
+
+
+def category_rollup(inventory, values=None):
+    """(category, items, quantity, value) per category, highest value first"""
+    if values is None:
+        values = item_values(inventory)
+    size = len(inventory.categories)
+    if _vectorized(inventory):
+        counts = np.bincount(inventory.category, minlength=size)
+        quantities = np.bincount(inventory.category, weights=inventory.quantity, minlength=size)
+        totals = np.bincount(inventory.category, weights=values, minlength=size)
+        rows = [
+            (name, int(counts[i]), int(quantities[i]), float(totals[i]))
+            for i, name in enumerate(inventory.categories)
+        ]
+    else:
+        counts = [0] * size
+        quantities = [0] * size
+        totals = [0.0] * size
+        for i, quantity, value in zip(inventory.category, inventory.quantity, values):
+            counts[i] += 1
+            quantities[i] += quantity
+            totals[i] += value
+        rows = list(zip(inventory.categories, counts, quantities, totals))
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows
+
+
+def top_items(inventory, n=10, values=None):
+    """(code, value) of the n items with the highest stock value"""
+    if values is None:
+        values = item_values(inventory)
+    n = min(n, len(inventory.codes))
+    if n <= 0:
+        return []
+    if _vectorized(inventory):
+        # Equal values keep their row order, like heapq.nlargest
+        top = np.sort(np.argpartition(-values, n - 1)[:n])
+        top = top[np.argsort(-values[top], kind="stable")]
+    else:
+        top = heapq.nlargest(n, range(len(values)), key=values.__getitem__)
+    return [(inventory.codes[i], float(values[i])) for i in top]
+
+
+def low_stock(inventory, threshold=5):
+    """(code, quantity) of the items with at most threshold in stock, lowest first"""
+    if _vectorized(inventory):
+        low = np.flatnonzero(inventory.quantity <= threshold)
+        low = low[np.argsort(inventory.quantity[low], kind="stable")]
+    else:
+        low = [i for i, quantity in enumerate(inventory.quantity) if quantity <= threshold]
+        low.sort(key=inventory.quantity.__getitem__)
+    return [(inventory.codes[i], int(inventory.quantity[i])) for i in low]
+
+
+def value_percentiles(inventory, percentiles=(50, 90, 99), values=None):
+    """{percentile: item value}, interpolated linearly like numpy.percentile"""
+    if values is None:
+        values = item_values(inventory)
+    if not len(values):
+        return {p: 0.0 for p in percentiles}
+    if _vectorized(inventory):
+        return dict(zip(percentiles, (float(v) for v in np.percentile(values, percentiles))))
+
+    ordered = sorted(values)
+    result = {}
+    for p in percentiles:
+        rank = p / 100 * (len(ordered) - 1)
+        low = math.floor(rank)
+        high = min(low + 1, len(ordered) - 1)
+        result[p] = ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+    return result
+
+
+def abc_classification(inventory, a=0.8, b=0.95, values=None):
+    """Class A, B or C per item by its share of the total stock value.
+
+    Items are ranked by value; an item is A while the items ranked above
+    it hold less than `a` of the total value, B below `b`, C for the rest.
+    """
+    if values is None:
+        values = item_values(inventory)
+    total = valuation(inventory, values)[2]
+    count = len(inventory.codes)
+
+    if _vectorized(inventory):
+        classes = np.full(count, 2, dtype=np.int8)
+        if total > 0:
+            order = np.argsort(-values, kind="stable")
+            ranked = values[order]
+            before = (np.cumsum(ranked) - ranked) / total
+            classes[order] = np.searchsorted(np.array([a, b]), before, side="right")
+        counts = np.bincount(classes, minlength=3)
+        shares = np.bincount(classes, weights=values, minlength=3)
+    else:
+        classes = array("b", [2]) * count
+        if total > 0:
+            order = sorted(range(count), key=values.__getitem__, reverse=True)
+            running = 0.0
+            for i in order:
+                classes[i] = bisect.bisect_right((a, b), running / total)
+                running += values[i]
+        counts = [0, 0, 0]
+        shares = [0.0, 0.0, 0.0]
+        for c, value in zip(classes, values):
+            counts[c] += 1
+            shares[c] += value
+
+    return ABCResult(
+        classes,
+        {ABC_LABELS[c]: int(counts[c]) for c in range(3)},
+        {ABC_LABELS[c]: float(shares[c]) / total if total else 0.0 for c in range(3)},
+    )
+
+
+def inventory_report(db, top=10, low_threshold=5):
+    """Text lines of a complete stock analysis, for manage.py and the GUI"""
+    inventory = load_inventory(db)
+    values = item_values(inventory)
+    items, quantity, value = valuation(inventory, values)
+
+    lines = [f"{items} jenis barang, {quantity} stok, nilai Rp {value:,.0f}", "", "Per kategori:"]
+    for category, count, category_quantity, category_value in category_rollup(inventory, values):
+        lines.append(f"  {category or '-'}: {count} jenis, {category_quantity} stok, Rp {category_value:,.0f}")
+
+    lines += ["", f"{top} barang dengan nilai stok tertinggi:"]
+    for code, item_value in top_items(inventory, top, values):
+        lines.append(f"  {code}: Rp {item_value:,.0f}")
+
+    percentiles = value_percentiles(inventory, values=values)
+    lines += ["", "Nilai stok per barang: " + ", ".join(
+        f"P{p} Rp {v:,.0f}" for p, v in percentiles.items()
+    )]
+
+    abc = abc_classification(inventory, values=values)
+    lines.append("Kelas ABC: " + ", ".join(
+        f"{label} {abc.counts[label]} barang ({abc.value_shares[label]:.0%} nilai)" for label in ABC_LABELS
+    ))
+
+    low = low_stock(inventory, low_threshold)
+    lines.append(f"Stok menipis (<= {low_threshold}): {len(low)} barang")
+    return lines
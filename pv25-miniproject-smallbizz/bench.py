@@ -0,0 +1,564 @@
+import argparse
+import csv
+import datetime
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import analytics
+from columnar import parquet_available, read_columnar
+from db import ConflictError, DatabaseManager
+
+CATEGORIES = ["Elektronik", "Peralatan", "Bahan", "Alat Kantor", "Furniture", "Lainnya"]
+WORDS = ["kabel", "lampu", "meja", "kursi", "kertas", "baut", "obeng", "cat", "lem", "pipa",
+         "saklar", "kipas", "rak", "map", "tinta", "palu", "kunci", "selang", "ember", "sapu"]
+
+
+def make_item(i, rng):
+    name = f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i % 997}"
+    notes = rng.choice(["", "gudang A", "gudang B", "stok lama", "promo"])
+    return (f"QC-{i:07d}", name, rng.randint(0, 500), rng.randint(1, 500) * 1000.0,
+            rng.choice(CATEGORIES), notes)
+
+
+def populate(db, count, seed=1):
+    """Fill the items table with count generated items"""
+    rng = random.Random(seed)
+    batch = []
+    for i in range(count):
+        batch.append(make_item(i, rng))
+        if len(batch) == 10000:
+            db.c.executemany('''
+                INSERT INTO items (code, name, quantity, price, category, notes)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', batch)
+            batch = []
+    if batch:
+        db.c.executemany('''
+            INSERT INTO items (code, name, quantity, price, category, notes)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', batch)
+    db.conn.commit()
+
+
+def timed(function, repeat):
+    """Best and mean time of function() in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times), sum(times) / len(times)
+
+
+def bench_search(args):
+    searches = [("kabel", "Semua"), ("kab", "Nama"), ("QC-00012", "Kode"),
+                ("Furniture", "Kategori"), ("gudang", "Catatan"), ("lampu meja", "Semua")]
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            db = DatabaseManager(os.path.join(directory, f"search_{size}.db"))
+            populate(db, size)
+            if not db.full_text:
+                print("SQLite ini tidak mendukung FTS5, benchmark dilewati")
+                db.close()
+                return 1
+
+            print(f"\n{size:,} item")
+            print(f"{'kata kunci':<14}{'filter':<10}{'hasil':>8}{'LIKE ms':>12}{'FTS5 ms':>12}")
+            for keyword, filter_by in searches:
+                results = {}
+                for full_text in (False, True):
+                    db.full_text = full_text
+                    count = len(db.search_items(keyword, filter_by))
+                    best, _ = timed(lambda: db.search_items(keyword, filter_by), args.repeat)
+                    results[full_text] = (count, best)
+                print(f"{keyword:<14}{filter_by:<10}{results[True][0]:>8}"
+                      f"{results[False][1]:>12.2f}{results[True][1]:>12.2f}")
+            db.close()
+    return 0
+
+
+def bench_typing(args):
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseManager(os.path.join(directory, "typing.db"))
+        populate(db, args.size)
+
+        # What the live search runs after every pause in typing: count and first page
+        def search(keyword):
+            db.count_items(keyword, args.filter)
+            db.fetch_page(args.page_size, keyword, args.filter)
+
+        print(f"{args.size:,} item, filter {args.filter}")
+        print(f"{'diketik':<16}{'hasil':>8}{'terbaik ms':>12}{'rata-rata ms':>14}")
+        for end in range(1, len(args.text) + 1):
+            keyword = args.text[:end]
+            if keyword.endswith(" "):
+                continue
+            best, mean = timed(lambda: search(keyword), args.repeat)
+            print(f"{keyword:<16}{db.count_items(keyword, args.filter):>8}{best:>12.1f}{mean:>14.1f}")
+        db.close()
+    return 0
+
+
+def bench_writes(args):
+    rng = random.Random(2)
+    items = [make_item(i, rng) for i in range(args.count)]
+    runs = [
+        ("safe, commit per item", "safe", False),
+        ("default, commit per item", "default", False),
+        ("default, satu transaksi", "default", True),
+    ]
+
+    print(f"{args.count:,} insert + update + delete")
+    print(f"{'mode':<28}{'detik':>10}{'tulis/detik':>14}")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, profile, batched in runs:
+            db = DatabaseManager(os.path.join(directory, f"writes_{profile}_{batched}.db"), profile=profile)
+
+            def write_all():
+                for code, name, quantity, price, category, notes in items:
+                    db.insert_item(code, name, quantity, price, category, notes)
+                for code, name, quantity, price, category, notes in items:
+                    db.update_item(code, name, quantity + 1, price, category, notes)
+                for item in items:
+                    db.delete_item(item[0])
+
+            start = time.perf_counter()
+            if batched:
+                with db.transaction():
+                    write_all()
+            else:
+                write_all()
+            elapsed = time.perf_counter() - start
+            print(f"{label:<28}{elapsed:>10.2f}{3 * args.count / elapsed:>14,.0f}")
+            db.close()
+    return 0
+
+
+def make_legacy(path, count):
+    """Items table of the first release, before notes and timestamps existed"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            code TEXT UNIQUE,
+            name TEXT NOT NULL,
+            quantity INTEGER DEFAULT 0,
+            price REAL DEFAULT 0,
+            category TEXT
+        )
+    ''')
+    rng = random.Random(3)
+    conn.executemany(
+        'INSERT INTO items (code, name, quantity, price, category) VALUES (?, ?, ?, ?, ?)',
+        (make_item(i, rng)[:5] for i in range(count))
+    )
+    conn.commit()
+    conn.close()
+
+
+def bench_startup(args):
+    print(f"{'item':>10}{'upgrade ms':>14}{'tanpa versi ms':>16}{'terkini ms':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            path = os.path.join(directory, f"startup_{size}.db")
+            make_legacy(path, size)
+
+            # First start on an old file runs every migration
+            start = time.perf_counter()
+            DatabaseManager(path).close()
+            upgrade = (time.perf_counter() - start) * 1000
+
+            # A current schema without user_version goes through every check,
+            # like each start did before migrations were versioned
+            def unversioned():
+                conn = sqlite3.connect(path)
+                conn.execute("PRAGMA user_version = 0")
+                conn.close()
+                start = time.perf_counter()
+                DatabaseManager(path).close()
+                return (time.perf_counter() - start) * 1000
+
+            checks = min(unversioned() for _ in range(args.repeat))
+            current, _ = timed(lambda: DatabaseManager(path).close(), args.repeat)
+            print(f"{size:>10,}{upgrade:>14.1f}{checks:>16.1f}{current:>12.1f}")
+    return 0
+
+
+# update_timestamp as it was before migration 5, a second UPDATE for every row
+LEGACY_TIMESTAMP_TRIGGER = '''
+    CREATE TRIGGER update_timestamp
+    AFTER UPDATE ON items
+    FOR EACH ROW
+    BEGIN
+        UPDATE items SET updated_at = datetime('now', 'localtime') WHERE id = OLD.id;
+    END
+'''
+
+# update_timestamp of migration 5, fires again for a stamp from the same second
+SAME_VALUE_TIMESTAMP_TRIGGER = '''
+    CREATE TRIGGER update_timestamp
+    AFTER UPDATE ON items
+    FOR EACH ROW
+    WHEN NEW.updated_at IS OLD.updated_at
+    BEGIN
+        UPDATE items SET updated_at = datetime('now', 'localtime') WHERE id = OLD.id;
+    END
+'''
+
+
+def bench_updates(args):
+    stamped = "UPDATE items SET price = price * 1.1, updated_at = datetime('now', 'localtime')"
+    old_stamp = "'2000-01-01 00:00:00'"
+    # Rows saved earlier in the same second, like an edit right after a save
+    same_second = "datetime('now', 'localtime')"
+    runs = [
+        ("trigger lama", LEGACY_TIMESTAMP_TRIGGER, old_stamp, "UPDATE items SET price = price * 1.1"),
+        ("updated_at di UPDATE", None, old_stamp, stamped),
+        ("detik sama, migrasi 5", SAME_VALUE_TIMESTAMP_TRIGGER, same_second, stamped),
+        ("detik sama, sekarang", None, same_second, stamped),
+    ]
+
+    print(f"{args.count:,} baris diubah dengan satu UPDATE")
+    print(f"{'mode':<24}{'ms':>10}{'baris ditulis':>16}")
+    with tempfile.TemporaryDirectory() as directory:
+        for number, (label, trigger, stamp, statement) in enumerate(runs):
+            path = os.path.join(directory, f"updates_{number}.db")
+            db = DatabaseManager(path)
+            populate(db, args.count)
+            if trigger:
+                db.c.execute("DROP TRIGGER update_timestamp")
+                db.c.execute(trigger)
+            db.c.execute(f"UPDATE items SET updated_at = {stamp}")
+            db.conn.commit()
+
+            changes = db.conn.total_changes
+            start = time.perf_counter()
+            with db.transaction():
+                db.c.execute(statement)
+            elapsed = (time.perf_counter() - start) * 1000
+            written = db.conn.total_changes - changes
+            # Rows written by the statement and every trigger it fired
+            print(f"{label:<24}{elapsed:>10.1f}{written:>16,}")
+            db.close()
+    return 0
+
+
+def bench_pages(args):
+    print(f"{args.size:,} item, halaman {args.page_size} baris")
+    print(f"{'halaman ke':>12}{'OFFSET ms':>12}{'keyset ms':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseManager(os.path.join(directory, "pages.db"))
+        populate(db, args.size)
+
+        # Walk the whole table once by token, remembering where pages start
+        tokens = [None]
+        page = db.fetch_page(args.page_size)
+        while page.token is not None:
+            tokens.append(page.token)
+            page = db.fetch_page(args.page_size, token=page.token)
+
+        for fraction in (0, 0.25, 0.5, 0.75, 0.99):
+            number = int(fraction * (len(tokens) - 1))
+            offset, _ = timed(lambda: db.fetch_rows(number * args.page_size, args.page_size), args.repeat)
+            keyset, _ = timed(lambda: db.fetch_page(args.page_size, token=tokens[number]), args.repeat)
+            print(f"{number:>12,}{offset:>12.2f}{keyset:>12.2f}")
+        db.close()
+    return 0
+
+
+def bench_cache(args):
+    # Few best sellers are scanned far more often than the rest
+    rng = random.Random(4)
+    lookups = [f"QC-{int(args.size * rng.random() ** 3):07d}" for _ in range(args.lookups)]
+
+    print(f"{args.size:,} item, {args.lookups:,} pencarian kode")
+    print(f"{'cache':>10}{'hit rate':>10}{'evictions':>12}{'us/cari':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.db")
+        db = DatabaseManager(path)
+        populate(db, args.size)
+        db.close()
+
+        for cache_size in args.cache_sizes:
+            db = DatabaseManager(path, cache_size=cache_size)
+            start = time.perf_counter()
+            for code in lookups:
+                db.get_item_by_code(code)
+            elapsed = (time.perf_counter() - start) / len(lookups) * 1e6
+            stats = db.cache_stats()["items"]
+            print(f"{cache_size:>10,}{stats['hit_rate']:>10.1%}{stats['evictions']:>12,}{elapsed:>10.2f}")
+            db.close()
+    return 0
+
+
+def bench_ledger(args):
+    rng = random.Random(5)
+    print(f"{args.items:,} item, {args.movements:,} mutasi stok")
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseManager(os.path.join(directory, "ledger.db"))
+        # Snapshots are taken by hand below
+        db.SNAPSHOT_INTERVAL = float("inf")
+        populate(db, args.items)
+        codes = [f"QC-{i:07d}" for i in range(args.items)]
+
+        start = time.perf_counter()
+        for _ in range(0, args.movements, args.batch):
+            db.record_movements((rng.choice(codes), rng.randint(-5, 5), "bench") for _ in range(args.batch))
+        elapsed = time.perf_counter() - start
+        print(f"catat mutasi per {args.batch:,}: {args.movements / elapsed:,.0f} mutasi/detik")
+
+        code = codes[len(codes) // 2]
+        current, _ = timed(lambda: db.get_stock(code), args.repeat)
+        print(f"stok sekarang (kolom items.quantity): {current:.3f} ms")
+
+        print(f"{'stok per tanggal':<26}{'satu item ms':>14}{'semua item ms':>15}")
+        for label in ("tanpa snapshot", "dengan snapshot"):
+            if label == "dengan snapshot":
+                db.create_stock_snapshot()
+            now = datetime.datetime.now() + datetime.timedelta(seconds=1)
+            one, _ = timed(lambda: db.stock_as_of(now, code), args.repeat)
+            every, _ = timed(lambda: db.stock_as_of(now), args.repeat)
+            print(f"{label:<26}{one:>14.3f}{every:>15.1f}")
+        db.close()
+    return 0
+
+
+def load_csv(filename):
+    """How a reporting job reads an export_to_csv file, typed column lists"""
+    columns = {"code": [], "name": [], "quantity": [], "price": [], "category": [], "notes": []}
+    with open(filename, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader)
+        for code, name, quantity, price, category, notes in reader:
+            columns["code"].append(code)
+            columns["name"].append(name)
+            columns["quantity"].append(int(quantity))
+            columns["price"].append(float(price))
+            columns["category"].append(category)
+            columns["notes"].append(notes)
+    return columns
+
+
+def bench_columnar(args):
+    formats = [("CSV", ".csv"), ("kolom .sbc", ".sbc")]
+    if parquet_available():
+        formats.append(("Parquet", ".parquet"))
+
+    print(f"{args.size:,} item")
+    print(f"{'format':<14}{'ekspor s':>10}{'ukuran MB':>11}{'muat ulang s':>14}{'3 kolom s':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseManager(os.path.join(directory, "columnar.db"))
+        populate(db, args.size)
+        for label, extension in formats:
+            filename = os.path.join(directory, "export" + extension)
+            start = time.perf_counter()
+            if extension == ".csv":
+                db.export_to_csv(filename)
+            else:
+                db.export_columnar(filename)
+            exported = time.perf_counter() - start
+            size = os.path.getsize(filename) / 1024 / 1024
+
+            if extension == ".csv":
+                load, _ = timed(lambda: load_csv(filename), args.repeat)
+                partial = load
+            else:
+                load, _ = timed(lambda: read_columnar(filename), args.repeat)
+                partial, _ = timed(
+                    lambda: read_columnar(filename, ["quantity", "price", "category"]), args.repeat
+                )
+            print(f"{label:<14}{exported:>10.2f}{size:>11.1f}{load / 1000:>14.2f}{partial / 1000:>11.2f}")
+        db.close()
+    return 0
+
+
+def list_rollup(db):
+    """Totals and category rollup with list comprehensions over fetch_all()"""
+    items = db.fetch_all()
+    total_value = sum(item[2] * item[3] for item in items)
+    categories = {}
+    for item in items:
+        count, quantity, value = categories.get(item[4], (0, 0, 0.0))
+        categories[item[4]] = (count + 1, quantity + item[2], value + item[2] * item[3])
+    return len(items), sum(item[2] for item in items), total_value, categories
+
+
+def analytics_pass(inventory):
+    values = analytics.item_values(inventory)
+    analytics.valuation(inventory, values)
+    analytics.category_rollup(inventory, values)
+    analytics.top_items(inventory, 10, values)
+    analytics.low_stock(inventory)
+    analytics.value_percentiles(inventory, values=values)
+    analytics.abc_classification(inventory, values=values)
+
+
+def bench_analytics(args):
+    backends = [("list fetch_all", None), ("array stdlib", False)]
+    if analytics.np is not None:
+        backends.append(("NumPy", True))
+    else:
+        print("NumPy belum terpasang, hanya versi stdlib yang diukur")
+
+    print(f"{args.size:,} item")
+    print(f"{'cara':<16}{'muat ms':>10}{'rollup ms':>11}{'semua ms':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseManager(os.path.join(directory, "analytics.db"))
+        populate(db, args.size)
+        for label, use_numpy in backends:
+            if use_numpy is None:
+                load, _ = timed(db.fetch_all, args.repeat)
+                rollup, _ = timed(lambda: list_rollup(db), args.repeat)
+                # The old code only had totals and categories
+                print(f"{label:<16}{load:>10.0f}{rollup - load:>11.0f}{'-':>10}")
+                continue
+
+            inventory = analytics.load_inventory(db, use_numpy=use_numpy)
+            load, _ = timed(lambda: analytics.load_inventory(db, use_numpy=use_numpy), args.repeat)
+            rollup, _ = timed(lambda: analytics.category_rollup(inventory), args.repeat)
+            full, _ = timed(lambda: analytics_pass(inventory), args.repeat)
+            print(f"{label:<16}{load:>10.0f}{rollup:>11.0f}{full:>10.0f}")
+        db.close()
+    return 0
+
+
+def stress_terminal(path, seconds, items, check_version, seed, results):
+    """One cashier terminal: read an item, think briefly, add one to its stock"""
+    db = DatabaseManager(path, profile="shared")
+    rng = random.Random(seed)
+    updates = conflicts = busy = 0
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        code = f"QC-{rng.randrange(items):07d}"
+        version = db.get_item_version(code) if check_version else None
+        item = db.get_item_by_code(code)
+        time.sleep(rng.uniform(0, 0.002))
+        try:
+            db.update_item(code, item[1], item[2] + 1, item[3], item[4], item[5], expected_version=version)
+            updates += 1
+        except ConflictError:
+            conflicts += 1
+        except sqlite3.OperationalError:
+            busy += 1
+    db.close()
+    results.put((updates, conflicts, busy))
+
+
+def bench_stress(args):
+    runs = [("tanpa cek versi", False), ("cek versi", True)]
+
+    print(f"{args.processes} proses, {args.seconds} detik, {args.items} item diperebutkan")
+    print(f"{'mode':<18}{'update/detik':>14}{'konflik':>10}{'locked':>8}{'update hilang':>15}")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, check_version in runs:
+            path = os.path.join(directory, f"stress_{check_version}.db")
+            db = DatabaseManager(path, profile="shared")
+            populate(db, args.items)
+            db.c.execute("UPDATE items SET quantity = 0")
+            db.conn.commit()
+            db.close()
+
+            results = multiprocessing.Queue()
+            terminals = [
+                multiprocessing.Process(
+                    target=stress_terminal,
+                    args=(path, args.seconds, args.items, check_version, seed, results)
+                )
+                for seed in range(args.processes)
+            ]
+            for terminal in terminals:
+                terminal.start()
+            totals = [results.get() for _ in terminals]
+            for terminal in terminals:
+                terminal.join()
+
+            updates = sum(t[0] for t in totals)
+            conflicts = sum(t[1] for t in totals)
+            busy = sum(t[2] for t in totals)
+            # Every successful update added one, anything missing was overwritten
+            db = DatabaseManager(path, profile="shared")
+            stock = db.get_summary()[1]
+            db.close()
+            attempts = updates + conflicts + busy
+            print(f"{label:<18}{updates / args.seconds:>14,.0f}"
+                  f"{conflicts / attempts if attempts else 0:>10.1%}{busy:>8}{updates - stock:>15}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark database SmallBizz")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="bandingkan pencarian LIKE dengan indeks FTS5")
+    search.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    search.add_argument("--repeat", type=int, default=5)
+    search.set_defaults(func=bench_search)
+
+    typing = commands.add_parser("typing", help="ukur waktu pencarian langsung untuk setiap huruf yang diketik")
+    typing.add_argument("--size", type=int, default=100000)
+    typing.add_argument("--text", default="kabel lampu")
+    typing.add_argument("--filter", default="Semua")
+    typing.add_argument("--page-size", type=int, default=200)
+    typing.add_argument("--repeat", type=int, default=5)
+    typing.set_defaults(func=bench_typing)
+
+    writes = commands.add_parser("writes", help="bandingkan kecepatan tulis profil safe, WAL dan transaksi")
+    writes.add_argument("--count", type=int, default=2000)
+    writes.set_defaults(func=bench_writes)
+
+    startup = commands.add_parser("startup", help="ukur waktu membuka database lama dan terkini")
+    startup.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    startup.add_argument("--repeat", type=int, default=5)
+    startup.set_defaults(func=bench_startup)
+
+    updates = commands.add_parser("updates", help="bandingkan UPDATE massal dengan trigger timestamp lama dan baru")
+    updates.add_argument("--count", type=int, default=100000)
+    updates.set_defaults(func=bench_updates)
+
+    pages = commands.add_parser("pages", help="bandingkan halaman OFFSET dengan halaman keyset")
+    pages.add_argument("--size", type=int, default=1000000)
+    pages.add_argument("--page-size", type=int, default=200)
+    pages.add_argument("--repeat", type=int, default=5)
+    pages.set_defaults(func=bench_pages)
+
+    cache = commands.add_parser("cache", help="ukur hit rate cache get_item_by_code per ukuran cache")
+    cache.add_argument("--size", type=int, default=100000)
+    cache.add_argument("--lookups", type=int, default=200000)
+    cache.add_argument("--cache-sizes", type=int, nargs="+", default=[0, 256, 1024, 4096, 16384])
+    cache.set_defaults(func=bench_cache)
+
+    columnar = commands.add_parser("columnar", help="bandingkan ekspor dan muat ulang CSV dengan format kolom")
+    columnar.add_argument("--size", type=int, default=1000000)
+    columnar.add_argument("--repeat", type=int, default=3)
+    columnar.set_defaults(func=bench_columnar)
+
+    ledger = commands.add_parser("ledger", help="ukur pencatatan mutasi stok dan query stok per tanggal")
+    ledger.add_argument("--items", type=int, default=10000)
+    ledger.add_argument("--movements", type=int, default=1000000)
+    ledger.add_argument("--batch", type=int, default=10000)
+    ledger.add_argument("--repeat", type=int, default=5)
+    ledger.set_defaults(func=bench_ledger)
+
+    analytics_parser = commands.add_parser("analytics", help="bandingkan rollup list fetch_all dengan modul analytics")
+    analytics_parser.add_argument("--size", type=int, default=1000000)
+    analytics_parser.add_argument("--repeat", type=int, default=3)
+    analytics_parser.set_defaults(func=bench_analytics)
+
+    stress = commands.add_parser("stress", help="beberapa proses kasir menulis ke satu file database")
+    stress.add_argument("--processes", type=int, default=4)
+    stress.add_argument("--seconds", type=float, default=5)
+    stress.add_argument("--items", type=int, default=20)
+    stress.set_defaults(func=bench_stress)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
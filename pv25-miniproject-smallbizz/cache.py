@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Bounded mapping that forgets the least recently used key first.
+
+    Hits, misses and evictions are counted so the size can be tuned.
+    """
+
+    # Returned by get() for keys that are not cached, None is a valid value
+    MISSING = object()
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        value = self._entries.get(key, self.MISSING)
+        if value is self.MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return value
+
+    def peek(self, key):
+        """Cached value without touching the order or the counters"""
+        return self._entries.get(key, self.MISSING)
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,191 @@
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+# pyarrow is optional, without it only the .sbc format below is available
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Columns of a columnar export and their type
+EXPORT_COLUMNS = (
+    ("code", "str"),
+    ("name", "str"),
+    ("quantity", "int"),
+    ("price", "float"),
+    ("category", "str"),
+    ("notes", "str"),
+    ("created_at", "str"),
+    ("updated_at", "str"),
+)
+
+# SmallBizz columnar file (.sbc), stdlib only:
+#   magic, header length (uint32) and a JSON header with the columns,
+#   then blocks of: row count (uint32, 0 ends the file) and per column a
+#   compressed length (uint32) followed by the zlib compressed column.
+# A column starts with a flag byte. With HAS_NULLS a null mask (one byte
+# per row) follows. Numbers are little-endian int64/float64 values.
+# Strings are UTF-8 text joined by NUL, or with STRING_OFFSETS (a value
+# contains NUL itself) int64 end offsets followed by the joined text.
+SBC_MAGIC = b"SBCOL1\n"
+ARRAY_CODES = {"int": "q", "float": "d"}
+HAS_NULLS = 1
+STRING_OFFSETS = 2
+
+
+def parquet_available():
+    return pyarrow is not None
+
+
+def _arrow_type(kind):
+    return {"int": pyarrow.int64(), "float": pyarrow.float64(), "str": pyarrow.string()}[kind]
+
+
+def _little_endian(values):
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def _encode_column(kind, values):
+    flags = 0
+    parts = []
+    if None in values:
+        flags |= HAS_NULLS
+        parts.append(bytes(value is None for value in values))
+        empty = "" if kind == "str" else 0
+        values = [empty if value is None else value for value in values]
+
+    if kind == "str":
+        text = "\0".join(values)
+        if text.count("\0") != len(values) - 1:
+            flags |= STRING_OFFSETS
+            ends = array("q")
+            end = 0
+            for value in values:
+                end += len(value)
+                ends.append(end)
+            parts.append(_little_endian(ends).tobytes())
+            text = "".join(values)
+        parts.append(text.encode("utf-8"))
+    else:
+        numbers = array(ARRAY_CODES[kind], map(int if kind == "int" else float, values))
+        parts.append(_little_endian(numbers).tobytes())
+    return zlib.compress(bytes([flags]) + b"".join(parts), 1)
+
+
+def _decode_column(kind, data, count):
+    data = zlib.decompress(data)
+    flags = data[0]
+    position = 1
+    nulls = None
+    if flags & HAS_NULLS:
+        nulls = data[1:1 + count]
+        position += count
+
+    if kind == "str" and flags & STRING_OFFSETS:
+        ends = array("q")
+        ends.frombytes(data[position:position + 8 * count])
+        text = data[position + 8 * count:].decode("utf-8")
+        values = []
+        start = 0
+        for end in _little_endian(ends):
+            values.append(text[start:end])
+            start = end
+    elif kind == "str":
+        values = data[position:].decode("utf-8").split("\0")
+    else:
+        numbers = array(ARRAY_CODES[kind])
+        numbers.frombytes(data[position:])
+        values = _little_endian(numbers).tolist()
+
+    if nulls is not None:
+        values = [None if null else value for value, null in zip(values, nulls)]
+    return values
+
+
+class ColumnarWriter:
+    """Write rows of EXPORT_COLUMNS chunk by chunk as a columnar file.
+
+    Files ending in .parquet are written with pyarrow (zstd compressed row
+    groups), any other name uses the stdlib .sbc format.
+    """
+
+    def __init__(self, filename, columns=EXPORT_COLUMNS):
+        self.columns = columns
+        self.parquet = filename.lower().endswith(".parquet")
+        if self.parquet:
+            if pyarrow is None:
+                raise Exception("pyarrow belum terpasang, simpan sebagai file .sbc")
+            self.schema = pyarrow.schema([(name, _arrow_type(kind)) for name, kind in columns])
+            self.writer = pyarrow.parquet.ParquetWriter(filename, self.schema, compression="zstd")
+        else:
+            self.file = open(filename, "wb")
+            header = json.dumps({"columns": [list(column) for column in columns]}).encode("utf-8")
+            self.file.write(SBC_MAGIC + struct.pack("<I", len(header)) + header)
+
+    def write_chunk(self, rows):
+        """Write rows (sequences in column order) as one block/row group"""
+        if not rows:
+            return
+        values = list(zip(*rows))
+        if self.parquet:
+            arrays = [
+                pyarrow.array(column, type=_arrow_type(kind))
+                for column, (_, kind) in zip(values, self.columns)
+            ]
+            self.writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self.schema))
+            return
+
+        self.file.write(struct.pack("<I", len(rows)))
+        for column, (_, kind) in zip(values, self.columns):
+            data = _encode_column(kind, column)
+            self.file.write(struct.pack("<I", len(data)) + data)
+
+    def close(self):
+        if self.parquet:
+            self.writer.close()
+        else:
+            self.file.write(struct.pack("<I", 0))
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_columnar(filename, columns=None):
+    """Load a .parquet or .sbc export as {column: list of values}.
+
+    With columns only those columns are decoded, the others are skipped.
+    """
+    if filename.lower().endswith(".parquet"):
+        if pyarrow is None:
+            raise Exception("pyarrow belum terpasang, file .parquet tidak bisa dibaca")
+        return pyarrow.parquet.read_table(filename, columns=columns).to_pydict()
+
+    with open(filename, "rb") as f:
+        if f.read(len(SBC_MAGIC)) != SBC_MAGIC:
+            raise Exception(f"{filename} bukan file kolom SmallBizz")
+        header_size, = struct.unpack("<I", f.read(4))
+        file_columns = json.loads(f.read(header_size).decode("utf-8"))["columns"]
+        wanted = set(columns or [name for name, _ in file_columns])
+        result = {name: [] for name, _ in file_columns if name in wanted}
+
+        while True:
+            count, = struct.unpack("<I", f.read(4))
+            if count == 0:
+                break
+            for name, kind in file_columns:
+                size, = struct.unpack("<I", f.read(4))
+                if name in wanted:
+                    result[name].extend(_decode_column(kind, f.read(size), count))
+                else:
+                    f.seek(size, 1)
+    return result
@@ -1,20 +1,557 @@
 import sqlite3
+import base64
 import csv
+import contextlib
+import gzip
+import json
 import os
 import datetime
+import functools
+import random
+import re
+import tempfile
+import time
+import unicodedata
+from collections import namedtuple
+
+from cache import LRUCache
+from columnar import EXPORT_COLUMNS, ColumnarWriter
+
+# Column order of every row returned to the GUI
+ITEM_COLUMNS = ("code", "name", "quantity", "price", "category", "notes")
+
+# Search filter labels shown in the GUI mapped to their column
+SEARCH_COLUMNS = {
+    "Kode": "code",
+    "Nama": "name",
+    "Kategori": "category",
+    "Catatan": "notes",
+}
+
+# PRAGMA settings applied to every connection. "default" uses a write-ahead
+# log so readers never wait for the writer and a commit needs no fsync of
+# the main file; "safe" is SQLite's own rollback journal with full syncing.
+PERFORMANCE_PROFILES = {
+    "default": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16384,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "safe": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+    # Several processes, possibly on other machines, sharing one file on a
+    # network disk. WAL needs shared memory on one host, so this keeps the
+    # rollback journal and waits longer for the other writers.
+    "shared": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "busy_timeout": 10000,
+    },
+}
+
+# Outcome of import_from_csv, reject_file is None when no row was rejected
+ImportResult = namedtuple("ImportResult", "imported rejected reject_file")
+
+# One page of fetch_page, token reads the next page and is None after the last
+ItemPage = namedtuple("ItemPage", "rows token")
+
+# SQL used to sort by each column, NULLs are sorted as empty values
+SORT_EXPRESSIONS = {
+    "code": "code",
+    "name": "name",
+    "quantity": "COALESCE(quantity, 0)",
+    "price": "COALESCE(price, 0)",
+    "category": "COALESCE(category, '')",
+    "notes": "COALESCE(notes, '')",
+}
+
+def sort_key(row, order_by="name"):
+    """Python equivalent of the SQL ordering used by fetch_rows for one row"""
+    value = row[ITEM_COLUMNS.index(order_by)]
+    if value is None:
+        value = 0 if order_by in ("quantity", "price") else ""
+    return (value, row[0])
+
+def page_token(row, order_by="name", descending=False):
+    """Continuation token for the rows after row in the given order"""
+    value, code = sort_key(row, order_by)
+    data = json.dumps([order_by, bool(descending), value, code])
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+def _read_page_token(token, order_by, descending):
+    try:
+        saved_order, saved_descending, value, code = json.loads(
+            base64.urlsafe_b64decode(token.encode("ascii"))
+        )
+    except (ValueError, TypeError):
+        raise Exception("Token halaman tidak valid")
+    if saved_order != order_by or saved_descending != bool(descending):
+        raise Exception("Token halaman tidak cocok dengan urutan yang diminta")
+    return value, code
+
+class ConflictError(Exception):
+    """The item was changed by someone else since its version was read"""
+
+
+def is_busy_error(error):
+    """True for the error SQLite raises when another connection keeps the file locked"""
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+def _retry_busy(method):
+    """Run a write again, with growing pauses, while other processes keep the file locked.
+
+    busy_timeout already waits inside SQLite; this covers the cases it
+    gives up on. Calls inside transaction() are not retried, the caller
+    must start the whole transaction again.
+    """
+    @functools.wraps(method)
+    def retry(self, *args, **kwargs):
+        for attempt in range(self.busy_retries + 1):
+            try:
+                return method(self, *args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if self._depth or attempt == self.busy_retries or not is_busy_error(e):
+                    raise
+                time.sleep(min(1.0, 0.05 * 2 ** attempt) * random.uniform(0.5, 1.5))
+    return retry
+
+def _filter_columns(filter_by):
+    if filter_by == "Semua":
+        return ("code", "name", "category", "notes")
+    if filter_by in SEARCH_COLUMNS:
+        return (SEARCH_COLUMNS[filter_by],)
+    return None
+
+def item_matches(row, keyword, filter_by="Semua"):
+    """Python equivalent of the LIKE search in search_items for one row"""
+    columns = _filter_columns(filter_by)
+    if not keyword or columns is None:
+        return True
+
+    keyword = keyword.lower()
+    for column in columns:
+        value = row[ITEM_COLUMNS.index(column)]
+        if value is not None and keyword in str(value).lower():
+            return True
+    return False
+
+def search_tokens(text):
+    """Split text into tokens the way the FTS5 unicode61 tokenizer does"""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.findall(r"[^\W_]+", text)
+
+def fts_query(keyword, filter_by="Semua"):
+    """Turn a search keyword into an FTS5 query, None when it has nothing to match.
+
+    Every word of the keyword must match the start of a token, e.g. "kab
+    list" finds "Kabel Listrik" and "QC-00" finds "QC-001".
+    """
+    terms = [term for term in keyword.split() if search_tokens(term)]
+    if not terms:
+        return None
+
+    query = " AND ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+    if filter_by == "Semua":
+        return query
+    column = SEARCH_COLUMNS.get(filter_by)
+    if column is None:
+        return None
+    return f"{column} : ({query})"
+
+def fts_matches(row, keyword, filter_by="Semua"):
+    """Python equivalent of the fts_query search for one row"""
+    columns = _filter_columns(filter_by)
+    terms = [search_tokens(term) for term in keyword.split()]
+    terms = [term for term in terms if term]
+    if not terms or columns is None:
+        return True
+
+    column_tokens = [search_tokens(row[ITEM_COLUMNS.index(column)] or "") for column in columns]
+    for term in terms:
+        if not any(_phrase_prefix_in(term, tokens) for tokens in column_tokens):
+            return False
+    return True
+
+def _phrase_prefix_in(phrase, tokens):
+    # Consecutive tokens equal to the phrase, the last one only has to start with it
+    last = len(phrase) - 1
+    for start in range(len(tokens) - last):
+        if (tokens[start:start + last] == phrase[:last]
+                and tokens[start + last].startswith(phrase[last])):
+            return True
+    return False
+
+# Running totals of the items table kept up to date by triggers, so the
+# summary never has to aggregate the whole table
+SUMMARY_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS item_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_items INTEGER NOT NULL DEFAULT 0,
+        total_quantity INTEGER NOT NULL DEFAULT 0,
+        total_value REAL NOT NULL DEFAULT 0
+    );
+
+    CREATE TABLE IF NOT EXISTS item_category_totals (
+        category TEXT PRIMARY KEY,
+        total_items INTEGER NOT NULL DEFAULT 0,
+        total_quantity INTEGER NOT NULL DEFAULT 0,
+        total_value REAL NOT NULL DEFAULT 0
+    );
+
+    CREATE TRIGGER IF NOT EXISTS summary_after_insert
+    AFTER INSERT ON items
+    FOR EACH ROW
+    BEGIN
+        UPDATE item_totals SET
+            total_items = total_items + 1,
+            total_quantity = total_quantity + COALESCE(NEW.quantity, 0),
+            total_value = total_value + COALESCE(NEW.quantity, 0) * COALESCE(NEW.price, 0)
+        WHERE id = 1;
+
+        INSERT INTO item_category_totals (category, total_items, total_quantity, total_value)
+        VALUES (COALESCE(NEW.category, ''), 1, COALESCE(NEW.quantity, 0),
+                COALESCE(NEW.quantity, 0) * COALESCE(NEW.price, 0))
+        ON CONFLICT(category) DO UPDATE SET
+            total_items = total_items + 1,
+            total_quantity = total_quantity + excluded.total_quantity,
+            total_value = total_value + excluded.total_value;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS summary_after_delete
+    AFTER DELETE ON items
+    FOR EACH ROW
+    BEGIN
+        UPDATE item_totals SET
+            total_items = total_items - 1,
+            total_quantity = total_quantity - COALESCE(OLD.quantity, 0),
+            total_value = total_value - COALESCE(OLD.quantity, 0) * COALESCE(OLD.price, 0)
+        WHERE id = 1;
+
+        UPDATE item_category_totals SET
+            total_items = total_items - 1,
+            total_quantity = total_quantity - COALESCE(OLD.quantity, 0),
+            total_value = total_value - COALESCE(OLD.quantity, 0) * COALESCE(OLD.price, 0)
+        WHERE category = COALESCE(OLD.category, '');
+
+        DELETE FROM item_category_totals
+        WHERE category = COALESCE(OLD.category, '') AND total_items <= 0;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS summary_after_update
+    AFTER UPDATE OF quantity, price, category ON items
+    FOR EACH ROW
+    BEGIN
+        UPDATE item_totals SET
+            total_quantity = total_quantity - COALESCE(OLD.quantity, 0) + COALESCE(NEW.quantity, 0),
+            total_value = total_value
+                - COALESCE(OLD.quantity, 0) * COALESCE(OLD.price, 0)
+                + COALESCE(NEW.quantity, 0) * COALESCE(NEW.price, 0)
+        WHERE id = 1;
+
+        UPDATE item_category_totals SET
+            total_items = total_items - 1,
+            total_quantity = total_quantity - COALESCE(OLD.quantity, 0),
+            total_value = total_value - COALESCE(OLD.quantity, 0) * COALESCE(OLD.price, 0)
+        WHERE category = COALESCE(OLD.category, '');
+
+        INSERT INTO item_category_totals (category, total_items, total_quantity, total_value)
+        VALUES (COALESCE(NEW.category, ''), 1, COALESCE(NEW.quantity, 0),
+                COALESCE(NEW.quantity, 0) * COALESCE(NEW.price, 0))
+        ON CONFLICT(category) DO UPDATE SET
+            total_items = total_items + 1,
+            total_quantity = total_quantity + excluded.total_quantity,
+            total_value = total_value + excluded.total_value;
+
+        DELETE FROM item_category_totals
+        WHERE category = COALESCE(OLD.category, '') AND total_items <= 0;
+    END;
+'''
+
+# Totals computed straight from the items table, used to rebuild and verify
+SUMMARY_FROM_ITEMS = '''
+    SELECT
+        COUNT(*),
+        COALESCE(SUM(COALESCE(quantity, 0)), 0),
+        COALESCE(SUM(COALESCE(quantity, 0) * COALESCE(price, 0)), 0)
+    FROM items
+'''
+
+CATEGORY_SUMMARY_FROM_ITEMS = '''
+    SELECT
+        COALESCE(category, '') AS category,
+        COUNT(*),
+        COALESCE(SUM(COALESCE(quantity, 0)), 0),
+        COALESCE(SUM(COALESCE(quantity, 0) * COALESCE(price, 0)), 0)
+    FROM items
+    GROUP BY COALESCE(category, '')
+'''
+
+# Full-text index over the searchable columns, kept in sync by triggers
+# Prefix indexes of 1 and 2 characters keep the first keystrokes of a
+# live search from merging the doclists of every matching token
+FTS_SCHEMA = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+        code, name, category, notes,
+        content='items', content_rowid='id', prefix='1 2'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS items_fts_after_insert
+    AFTER INSERT ON items
+    FOR EACH ROW
+    BEGIN
+        INSERT INTO items_fts (rowid, code, name, category, notes)
+        VALUES (NEW.id, NEW.code, NEW.name, NEW.category, NEW.notes);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS items_fts_after_delete
+    AFTER DELETE ON items
+    FOR EACH ROW
+    BEGIN
+        INSERT INTO items_fts (items_fts, rowid, code, name, category, notes)
+        VALUES ('delete', OLD.id, OLD.code, OLD.name, OLD.category, OLD.notes);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS items_fts_after_update
+    AFTER UPDATE OF code, name, category, notes ON items
+    FOR EACH ROW
+    BEGIN
+        INSERT INTO items_fts (items_fts, rowid, code, name, category, notes)
+        VALUES ('delete', OLD.id, OLD.code, OLD.name, OLD.category, OLD.notes);
+        INSERT INTO items_fts (rowid, code, name, category, notes)
+        VALUES (NEW.id, NEW.code, NEW.name, NEW.category, NEW.notes);
+    END;
+'''
+
+# Append-only stock history. Movements written by record_movements (source
+# 'ledger') change items.quantity; quantity edits made on the items table
+# itself are logged back as movements (source 'items'). Either way the sum
+# of an item's movements equals its quantity. movement_seq tells the two
+# apart: the ledger sets it, direct edits leave it alone.
+LEDGER_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS stock_movements (
+        id INTEGER PRIMARY KEY,
+        item_code TEXT NOT NULL,
+        delta INTEGER NOT NULL,
+        reason TEXT,
+        source TEXT NOT NULL DEFAULT 'ledger',
+        created_at TEXT DEFAULT (datetime('now', 'localtime'))
+    );
+    CREATE INDEX IF NOT EXISTS idx_stock_movements_item ON stock_movements (item_code, id);
+
+    -- Quantity of every item at a movement id, stock_as_of starts from the
+    -- latest one instead of summing all movements
+    CREATE TABLE IF NOT EXISTS stock_snapshots (
+        id INTEGER PRIMARY KEY,
+        taken_at TEXT NOT NULL,
+        last_movement_id INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_stock_snapshots_taken ON stock_snapshots (taken_at);
+    CREATE TABLE IF NOT EXISTS stock_snapshot_items (
+        snapshot_id INTEGER NOT NULL,
+        item_code TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        PRIMARY KEY (snapshot_id, item_code)
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER IF NOT EXISTS stock_movement_check
+    BEFORE INSERT ON stock_movements
+    FOR EACH ROW
+    WHEN NEW.source = 'ledger' AND NOT EXISTS (SELECT 1 FROM items WHERE code = NEW.item_code)
+    BEGIN
+        SELECT RAISE(ABORT, 'kode barang tidak ditemukan');
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS stock_movement_apply
+    AFTER INSERT ON stock_movements
+    FOR EACH ROW
+    WHEN NEW.source = 'ledger'
+    BEGIN
+        UPDATE items SET
+            quantity = COALESCE(quantity, 0) + NEW.delta,
+            movement_seq = NEW.id,
+            updated_at = NEW.created_at,
+            version = version + 1
+        WHERE code = NEW.item_code;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS stock_log_insert
+    AFTER INSERT ON items
+    FOR EACH ROW
+    WHEN COALESCE(NEW.quantity, 0) <> 0
+    BEGIN
+        INSERT INTO stock_movements (item_code, delta, reason, source)
+        VALUES (NEW.code, NEW.quantity, 'stok awal', 'items');
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS stock_log_update
+    AFTER UPDATE OF quantity ON items
+    FOR EACH ROW
+    WHEN NEW.movement_seq IS OLD.movement_seq
+        AND COALESCE(NEW.quantity, 0) <> COALESCE(OLD.quantity, 0)
+    BEGIN
+        INSERT INTO stock_movements (item_code, delta, reason, source)
+        VALUES (NEW.code, COALESCE(NEW.quantity, 0) - COALESCE(OLD.quantity, 0), 'koreksi', 'items');
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS stock_log_delete
+    AFTER DELETE ON items
+    FOR EACH ROW
+    WHEN COALESCE(OLD.quantity, 0) <> 0
+    BEGIN
+        INSERT INTO stock_movements (item_code, delta, reason, source)
+        VALUES (OLD.code, -COALESCE(OLD.quantity, 0), 'hapus', 'items');
+    END;
+'''
+
+def _timestamp(when):
+    if isinstance(when, (datetime.datetime, datetime.date)):
+        return when.strftime('%Y-%m-%d %H:%M:%S')
+    return when
 
 class DatabaseManager:
-    def __init__(self, db_name="smallbizz.db"):
+    def __init__(self, db_name="smallbizz.db", check_same_thread=True, profile="default", progress_callback=None,
+                 cache_size=1024, shared=None, busy_retries=5):
         self.db_name = db_name
-        self.conn = sqlite3.connect(db_name)
+        # check_same_thread=False lets a worker thread use a connection made
+        # on the GUI thread, callers must then serialize access themselves
+        self.check_same_thread = check_same_thread
+        # Name from PERFORMANCE_PROFILES or a dict of PRAGMA settings
+        self.profile = PERFORMANCE_PROFILES[profile] if isinstance(profile, str) else dict(profile)
+        # Other processes write to the file too: cached reads are checked
+        # against PRAGMA data_version. Defaults to on for the shared profile.
+        self.shared = profile == "shared" if shared is None else shared
+        self.busy_retries = busy_retries
+        self._data_version = None
+        self.connect()
+        # Callables notified with (op, code, old, new) after every committed change
+        self.listeners = []
+        # Nesting depth of transaction() and the events waiting for its commit
+        self._depth = 0
+        self._pending_events = []
+        # Read-through caches of get_item_by_code and get_categories, kept
+        # in step with the writes of this connection by invalidate_cache
+        self.item_cache = LRUCache(cache_size)
+        self.category_cache = LRUCache(1)
+        # progress_callback(done, total) follows the migrations of an old file
+        self.create_table(progress_callback)
+
+    def connect(self):
+        """Open the connection with the settings every connection needs"""
+        # Statements are cached per connection by their SQL text, so the
+        # fixed queries below are prepared once and reused
+        self.conn = sqlite3.connect(
+            self.db_name, check_same_thread=self.check_same_thread, cached_statements=256
+        )
+        for name, value in self.profile.items():
+            self.conn.execute(f"PRAGMA {name} = {value}")
         # Enable foreign keys if needed for future relationships
         self.conn.execute("PRAGMA foreign_keys = ON")
         # Configure connection to return rows as dictionaries if necessary
         self.conn.row_factory = sqlite3.Row
         self.c = self.conn.cursor()
-        self.create_table()
 
-    def create_table(self):
+    def set_busy_timeout(self, milliseconds):
+        """Wait at most this long for another connection's lock, also after reopen()"""
+        self.profile = dict(self.profile, busy_timeout=int(milliseconds))
+        self.conn.execute(f"PRAGMA busy_timeout = {int(milliseconds)}")
+
+    def reopen(self):
+        """Close and open the connection again, e.g. after another connection restored the file"""
+        self.close()
+        self.connect()
+        self.invalidate_cache("reset")
+
+    def add_change_listener(self, listener):
+        """Call listener(op, code, old, new) after each committed item change.
+
+        op is "insert", "update" or "delete" and old/new are row tuples in
+        ITEM_COLUMNS order (None when the row did not exist). Bulk changes
+        such as imports and restores send a single "reset" with code None.
+        """
+        self.listeners.append(listener)
+
+    def remove_change_listener(self, listener):
+        """Stop notifying a listener added with add_change_listener"""
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def notify_change(self, op, code=None, old=None, new=None):
+        for listener in list(self.listeners):
+            listener(op, code, old, new)
+
+    # Schema migrations in order. PRAGMA user_version stores how many of
+    # them the database file has already run.
+    MIGRATIONS = (
+        "_migrate_items_table",
+        "_migrate_timestamp_trigger",
+        "_migrate_summary_tables",
+        "_migrate_search_index",
+        "_migrate_single_write_timestamp",
+        "_migrate_indexes",
+        "_migrate_item_version",
+        "_migrate_stock_ledger",
+        "_migrate_search_prefixes",
+        "_migrate_timestamp_guard",
+    )
+
+    # A stock snapshot is taken after this many movements, see record_movements
+    SNAPSHOT_INTERVAL = 100000
+    # Larger movement batches send one "reset" instead of an event per item
+    MOVEMENT_EVENT_LIMIT = 200
+
+    def create_table(self, progress_callback=None):
+        """Bring the schema up to date, a current database costs one PRAGMA read"""
+        version = self.schema_version()
+        if version > len(self.MIGRATIONS):
+            raise Exception("Database dibuat oleh versi aplikasi yang lebih baru")
+        if version < len(self.MIGRATIONS):
+            self.migrate(version, progress_callback)
+
+        # Searches fall back to LIKE when the SQLite build has no FTS5
+        try:
+            self.c.execute("SELECT rowid FROM items_fts WHERE 0")
+            self.full_text = True
+        except sqlite3.OperationalError:
+            self.full_text = False
+
+    def schema_version(self):
+        return self.c.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self, version, progress_callback=None):
+        """Run the migrations after version in a single transaction.
+
+        Files from before user_version was used report version 0; every
+        migration checks what already exists, so they upgrade the same way.
+        """
+        pending = self.MIGRATIONS[version:]
+        try:
+            with self.transaction():
+                for done, name in enumerate(pending, 1):
+                    getattr(self, name)()
+                    self.c.execute(f"PRAGMA user_version = {version + done}")
+                    if progress_callback:
+                        progress_callback(done, len(pending))
+        except Exception as e:
+            raise Exception(f"Gagal migrasi database: {str(e)}")
+
+    def _execute_script(self, script):
+        # executescript() would commit the migration transaction first
+        statement = ""
+        for line in script.splitlines(keepends=True):
+            statement += line
+            if sqlite3.complete_statement(statement):
+                self.c.execute(statement)
+                statement = ""
+
+    def _migrate_items_table(self):
         # Check if the table exists
         self.c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='items'")
         table_exists = self.c.fetchone()
@@ -34,96 +571,435 @@ class DatabaseManager:
                     updated_at TEXT DEFAULT (datetime('now', 'localtime'))
                 )
             ''')
-            self.conn.commit()
-        else:
-            # Check if notes column exists, if not, add it
-            self.c.execute("PRAGMA table_info(items)")
-            columns = [info[1] for info in self.c.fetchall()]
-            
-            if 'notes' not in columns:
-                self.c.execute('ALTER TABLE items ADD COLUMN notes TEXT')
-                self.conn.commit()
-            
-            if 'created_at' not in columns:
-                # Add created_at column without default
-                self.c.execute('ALTER TABLE items ADD COLUMN created_at TEXT')
-                # Update all existing rows with current time
-                current_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                self.c.execute('UPDATE items SET created_at = ?', (current_time,))
-                self.conn.commit()
-            
-            if 'updated_at' not in columns:
-                # Add updated_at column without default
-                self.c.execute('ALTER TABLE items ADD COLUMN updated_at TEXT')
-                # Update all existing rows with current time
-                current_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                self.c.execute('UPDATE items SET updated_at = ?', (current_time,))
-                self.conn.commit()
+            return
+
+        # Check if notes column exists, if not, add it
+        self.c.execute("PRAGMA table_info(items)")
+        columns = [info[1] for info in self.c.fetchall()]
+        current_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        # Create trigger to update timestamp
-        self.c.execute("SELECT name FROM sqlite_master WHERE type='trigger' AND name='update_timestamp'")
-        trigger_exists = self.c.fetchone()
+        if 'notes' not in columns:
+            self.c.execute('ALTER TABLE items ADD COLUMN notes TEXT')
         
-        if not trigger_exists:
+        if 'created_at' not in columns:
+            # Add created_at column without default
+            self.c.execute('ALTER TABLE items ADD COLUMN created_at TEXT')
+            # Update all existing rows with current time
+            self.c.execute('UPDATE items SET created_at = ?', (current_time,))
+        
+        if 'updated_at' not in columns:
+            # Add updated_at column without default
+            self.c.execute('ALTER TABLE items ADD COLUMN updated_at TEXT')
+            # Update all existing rows with current time
+            self.c.execute('UPDATE items SET updated_at = ?', (current_time,))
+
+    def _migrate_timestamp_trigger(self):
+        self.c.execute('''
+            CREATE TRIGGER IF NOT EXISTS update_timestamp 
+            AFTER UPDATE ON items
+            FOR EACH ROW
+            BEGIN
+                UPDATE items SET updated_at = datetime('now', 'localtime') WHERE id = OLD.id;
+            END
+        ''')
+
+    def _migrate_summary_tables(self):
+        # Summary tables, filled from the existing items the first time
+        self._execute_script(SUMMARY_SCHEMA)
+        self.c.execute("SELECT 1 FROM item_totals WHERE id = 1")
+        if not self.c.fetchone():
+            self.rebuild_summary()
+
+    def _migrate_search_index(self):
+        self.c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='items_fts'")
+        index_exists = self.c.fetchone()
+        self.c.execute("SAVEPOINT search_index")
+        try:
+            self._execute_script(FTS_SCHEMA)
+        except sqlite3.OperationalError:
+            # No FTS5 in this SQLite build
+            self.c.execute("ROLLBACK TO search_index")
+            self.c.execute("RELEASE search_index")
+            return
+        self.c.execute("RELEASE search_index")
+        if not index_exists:
+            self.rebuild_search_index()
+
+    def _migrate_single_write_timestamp(self):
+        # Writers set updated_at in their own UPDATE, the trigger only
+        # stamps rows changed by statements that leave it untouched
+        self.c.execute("DROP TRIGGER IF EXISTS update_timestamp")
+        self.c.execute('''
+            CREATE TRIGGER update_timestamp 
+            AFTER UPDATE ON items
+            FOR EACH ROW
+            WHEN NEW.updated_at IS OLD.updated_at
+            BEGIN
+                UPDATE items SET updated_at = datetime('now', 'localtime') WHERE id = OLD.id;
+            END
+        ''')
+
+    def _migrate_indexes(self):
+        # Pages sorted by name walk this index instead of sorting, code
+        # lookups already use the UNIQUE index of the code column
+        self.c.execute("CREATE INDEX IF NOT EXISTS idx_items_name_code ON items (name, code)")
+        # Covers SELECT DISTINCT category without touching the table
+        self.c.execute("CREATE INDEX IF NOT EXISTS idx_items_category ON items (category)")
+        # Same expressions as SORT_EXPRESSIONS, for the columns the table
+        # view is usually sorted by; notes stays unindexed
+        for column, expression in SORT_EXPRESSIONS.items():
+            if column in ("quantity", "price", "category"):
+                self.c.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_items_{column}_sort ON items ({expression}, code)"
+                )
+
+    def _migrate_item_version(self):
+        # Raised by every write, update_item and delete_item can refuse to
+        # overwrite a change they have not seen
+        self.c.execute("PRAGMA table_info(items)")
+        if "version" not in [info[1] for info in self.c.fetchall()]:
+            self.c.execute("ALTER TABLE items ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    def _migrate_stock_ledger(self):
+        self.c.execute("PRAGMA table_info(items)")
+        if "movement_seq" not in [info[1] for info in self.c.fetchall()]:
+            self.c.execute("ALTER TABLE items ADD COLUMN movement_seq INTEGER")
+        self._execute_script(LEDGER_SCHEMA)
+
+        # Existing stock becomes the opening balance of the ledger
+        self.c.execute("SELECT 1 FROM stock_movements LIMIT 1")
+        if not self.c.fetchone():
             self.c.execute('''
-                CREATE TRIGGER update_timestamp 
-                AFTER UPDATE ON items
-                FOR EACH ROW
-                BEGIN
-                    UPDATE items SET updated_at = datetime('now', 'localtime') WHERE id = OLD.id;
-                END
+                INSERT INTO stock_movements (item_code, delta, reason, source)
+                SELECT code, quantity, 'saldo awal', 'items' FROM items
+                WHERE COALESCE(quantity, 0) <> 0
             ''')
-            self.conn.commit()
 
+    def _migrate_search_prefixes(self):
+        # FTS5 options cannot be altered, recreate an index without prefixes
+        self.c.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='items_fts'")
+        row = self.c.fetchone()
+        if row is None or "prefix" in row[0]:
+            return
+        self.c.execute("DROP TABLE items_fts")
+        self._execute_script(FTS_SCHEMA)
+        self.rebuild_search_index()
+
+    def _migrate_timestamp_guard(self):
+        # Comparing the values alone also fires when a writer set the same
+        # stamp again within one second, skip rows already stamped now
+        self.c.execute("DROP TRIGGER IF EXISTS update_timestamp")
+        self.c.execute('''
+            CREATE TRIGGER update_timestamp 
+            AFTER UPDATE ON items
+            FOR EACH ROW
+            WHEN NEW.updated_at IS OLD.updated_at
+                AND OLD.updated_at IS NOT datetime('now', 'localtime')
+            BEGIN
+                UPDATE items SET updated_at = datetime('now', 'localtime') WHERE id = OLD.id;
+            END
+        ''')
+
+    def rebuild_search_index(self):
+        """Rebuild the full-text index from the items table"""
+        with self._write():
+            self.c.execute("INSERT INTO items_fts (items_fts) VALUES ('rebuild')")
+
+    def item_matches(self, row, keyword, filter_by="Semua"):
+        """Check in Python whether row is part of a search_items result"""
+        if self.full_text and fts_query(keyword, filter_by):
+            return fts_matches(row, keyword, filter_by)
+        return item_matches(row, keyword, filter_by)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Group item changes into one unit of work with a single commit.
+
+        insert_item, update_item and delete_item called inside the block do
+        not commit on their own; a failing call only undoes itself. The
+        whole block is committed at the end, or rolled back when it raises,
+        and the change events are sent after the commit. Blocks may nest.
+        """
+        if self._depth == 0 and not self.conn.in_transaction:
+            # Take the write lock up front, a read lock upgraded later fails
+            # without waiting when another process writes
+            self.conn.execute("BEGIN IMMEDIATE")
+        self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self._rollback()
+            raise
+
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                self.conn.commit()
+            except BaseException:
+                # A COMMIT refused while other terminals read leaves the
+                # transaction open; undo it so a retry starts from scratch
+                self._rollback()
+                raise
+            events, self._pending_events = self._pending_events, []
+            for event in events:
+                self.notify_change(*event)
+
+    def _rollback(self):
+        self.conn.rollback()
+        self._pending_events = []
+        # Reads inside the block may have cached rolled back rows
+        self.invalidate_cache("reset")
+
+    @contextlib.contextmanager
+    def _write(self):
+        """Run one change, committed right away or as part of the open transaction"""
+        if self._depth == 0:
+            if not self.conn.in_transaction:
+                self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+            return
+
+        self.c.execute("SAVEPOINT item_change")
+        try:
+            yield
+        except BaseException:
+            self.c.execute("ROLLBACK TO item_change")
+            self.c.execute("RELEASE item_change")
+            raise
+        self.c.execute("RELEASE item_change")
+
+    def _changed(self, op, code, old, new):
+        self.invalidate_cache(op, code, old, new)
+        # Events wait for the commit of an open transaction
+        if self._depth:
+            self._pending_events.append((op, code, old, new))
+        else:
+            self.notify_change(op, code, old, new)
+
+    @_retry_busy
     def insert_item(self, code, name, quantity, price, category, notes=""):
         """Insert a new item into the database"""
         try:
             current_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            self.c.execute('''
-                INSERT INTO items (code, name, quantity, price, category, notes, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (code, name, quantity, price, category, notes, current_time, current_time))
-            self.conn.commit()
-            return True
+            with self._write():
+                self.c.execute('''
+                    INSERT INTO items (code, name, quantity, price, category, notes, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (code, name, quantity, price, category, notes, current_time, current_time))
         except sqlite3.IntegrityError:
             # Handle duplicate code error
-            self.conn.rollback()
             raise Exception(f"Kode barang '{code}' sudah ada dalam database")
-        except Exception as e:
-            self.conn.rollback()
-            raise e
 
-    def update_item(self, code, name, quantity, price, category, notes=""):
-        """Update an existing item by code"""
-        try:
-            self.c.execute('''
+        self._changed("insert", code, None, (code, name, quantity, price, category, notes))
+        return True
+
+    @_retry_busy
+    def update_item(self, code, name, quantity, price, category, notes="", expected_version=None):
+        """Update an existing item by code.
+
+        With expected_version (from get_item_version) the update is refused
+        with ConflictError when the item changed since that version was read.
+        """
+        with self._write():
+            old = self.get_item_by_code(code)
+            self.c.execute(f'''
                 UPDATE items 
-                SET name=?, quantity=?, price=?, category=?, notes=?
-                WHERE code=?
-            ''', (name, quantity, price, category, notes, code))
+                SET name=?, quantity=?, price=?, category=?, notes=?,
+                    updated_at=datetime('now', 'localtime'), version=version + 1
+                WHERE code=?{self._version_check(expected_version)}
+            ''', (name, quantity, price, category, notes, code) + self._version_params(expected_version))
             
             if self.c.rowcount == 0:
-                raise Exception(f"Item dengan kode '{code}' tidak ditemukan")
-                
-            self.conn.commit()
-            return True
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+                self._missing_or_conflict(code, old)
 
-    def delete_item(self, code):
-        """Delete an item by code"""
-        try:
-            self.c.execute('DELETE FROM items WHERE code=?', (code,))
+        self._changed("update", code, tuple(old), (code, name, quantity, price, category, notes))
+        return True
+
+    @_retry_busy
+    def delete_item(self, code, expected_version=None):
+        """Delete an item by code, with expected_version as in update_item"""
+        with self._write():
+            old = self.get_item_by_code(code)
+            self.c.execute(
+                f'DELETE FROM items WHERE code=?{self._version_check(expected_version)}',
+                (code,) + self._version_params(expected_version)
+            )
             
             if self.c.rowcount == 0:
-                raise Exception(f"Item dengan kode '{code}' tidak ditemukan")
-                
-            self.conn.commit()
-            return True
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+                self._missing_or_conflict(code, old)
+
+        self._changed("delete", code, tuple(old), None)
+        return True
+
+    def _version_check(self, expected_version):
+        return "" if expected_version is None else " AND version=?"
+
+    def _version_params(self, expected_version):
+        return () if expected_version is None else (expected_version,)
+
+    def _missing_or_conflict(self, code, old):
+        if old is None:
+            raise Exception(f"Item dengan kode '{code}' tidak ditemukan")
+        raise ConflictError(
+            f"Item '{code}' sudah diubah oleh pengguna lain, muat ulang data lalu coba lagi"
+        )
+
+    def get_item_version(self, code):
+        """Version of an item for update_item/delete_item, None when it does not exist.
+
+        Read it before the item values: a change in between then shows up
+        as a conflict instead of being overwritten.
+        """
+        self.c.execute('SELECT version FROM items WHERE code = ?', (code,))
+        row = self.c.fetchone()
+        return None if row is None else row[0]
+
+    def data_version(self):
+        """Number that changes whenever another connection commits to the file"""
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _check_shared_cache(self):
+        # Writes of other processes never reach invalidate_cache
+        if not self.shared:
+            return
+        version = self.data_version()
+        if version != self._data_version:
+            self._data_version = version
+            self.invalidate_cache("reset")
+
+    @_retry_busy
+    def delete_items(self, codes):
+        """Delete several items with a single commit.
+
+        Codes that cannot be deleted are skipped; their error messages are
+        returned.
+        """
+        errors = []
+        with self.transaction():
+            for code in codes:
+                try:
+                    self.delete_item(code)
+                except Exception as e:
+                    errors.append(str(e))
+        return errors
+
+    @_retry_busy
+    def record_movements(self, movements):
+        """Append stock movements, an iterable of (code, delta, reason), in one batch.
+
+        The quantity of every item is updated in the same transaction by
+        the stock_movement_apply trigger. The whole batch is refused when a
+        code does not exist.
+        """
+        movements = [(code, int(delta), reason) for code, delta, reason in movements]
+        codes = list(dict.fromkeys(movement[0] for movement in movements))
+        send_events = len(codes) <= self.MOVEMENT_EVENT_LIMIT
+        try:
+            with self._write():
+                old = {code: self.get_item_by_code(code) for code in codes} if send_events else None
+                self.c.executemany('''
+                    INSERT INTO stock_movements (item_code, delta, reason)
+                    VALUES (?, ?, ?)
+                ''', movements)
+        except sqlite3.IntegrityError as e:
+            raise Exception(f"Gagal mencatat mutasi stok: {str(e)}")
+
+        if send_events:
+            for code in codes:
+                self.item_cache.discard(code)
+                self._changed("update", code, tuple(old[code]), tuple(self.get_item_by_code(code)))
+        else:
+            self._changed("reset", None, None, None)
+
+        if self._depth == 0:
+            self._snapshot_if_due()
+        return len(movements)
+
+    def add_stock_movement(self, code, delta, reason=""):
+        """Add delta (negative for stock going out) to the stock of one item"""
+        return self.record_movements([(code, delta, reason)])
+
+    def get_stock(self, code):
+        """Current stock of an item, None when it does not exist"""
+        item = self.get_item_by_code(code)
+        return None if item is None else item[2] or 0
+
+    def get_movements(self, code, limit=100):
+        """Latest movements of an item, newest first"""
+        self.c.execute('''
+            SELECT id, delta, reason, source, created_at
+            FROM stock_movements
+            WHERE item_code = ?
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (code, limit))
+        return self.c.fetchall()
+
+    def create_stock_snapshot(self):
+        """Store the quantity of every item as a checkpoint for stock_as_of"""
+        with self._write():
+            # items.quantity equals the sum of the movements so far
+            self.c.execute('''
+                INSERT INTO stock_snapshots (taken_at, last_movement_id)
+                SELECT datetime('now', 'localtime'), COALESCE(MAX(id), 0) FROM stock_movements
+            ''')
+            snapshot_id = self.c.lastrowid
+            self.c.execute('''
+                INSERT INTO stock_snapshot_items (snapshot_id, item_code, quantity)
+                SELECT ?, code, quantity FROM items WHERE COALESCE(quantity, 0) <> 0
+            ''', (snapshot_id,))
+        return snapshot_id
+
+    def _snapshot_if_due(self):
+        self.c.execute('''
+            SELECT (SELECT COALESCE(MAX(id), 0) FROM stock_movements)
+                 - (SELECT COALESCE(MAX(last_movement_id), 0) FROM stock_snapshots)
+        ''')
+        if self.c.fetchone()[0] >= self.SNAPSHOT_INTERVAL:
+            self.create_stock_snapshot()
+
+    def stock_as_of(self, when, code=None):
+        """Stock at a past moment (datetime or 'YYYY-mm-dd HH:MM:SS').
+
+        Starts from the latest snapshot taken before `when` and adds only
+        the movements after it. Returns the quantity of code, or a list of
+        (code, quantity) for every item with stock when code is None.
+        """
+        when = _timestamp(when)
+        self.c.execute('''
+            SELECT id, last_movement_id FROM stock_snapshots
+            WHERE taken_at <= ?
+            ORDER BY taken_at DESC, id DESC
+            LIMIT 1
+        ''', (when,))
+        snapshot = self.c.fetchone()
+        snapshot_id, last_movement_id = snapshot if snapshot else (None, 0)
+
+        item_filter = "" if code is None else " AND item_code = ?"
+        item_params = () if code is None else (code,)
+        self.c.execute(f'''
+            SELECT item_code, SUM(quantity) FROM (
+                SELECT item_code, quantity FROM stock_snapshot_items
+                WHERE snapshot_id IS ?{item_filter}
+                UNION ALL
+                SELECT item_code, delta FROM stock_movements
+                WHERE id > ? AND created_at <= ?{item_filter}
+            )
+            GROUP BY item_code
+            HAVING SUM(quantity) <> 0
+            ORDER BY item_code
+        ''', (snapshot_id,) + item_params + (last_movement_id, when) + item_params)
+        rows = self.c.fetchall()
+        if code is None:
+            return [tuple(row) for row in rows]
+        return rows[0][1] if rows else 0
 
     def fetch_all(self):
         """Fetch all items from the database"""
@@ -136,180 +1012,636 @@ class DatabaseManager:
 
     def get_item_by_code(self, code):
         """Get a single item by its code"""
+        self._check_shared_cache()
+        item = self.item_cache.get(code)
+        if item is not LRUCache.MISSING:
+            return item
+
         self.c.execute('''
             SELECT code, name, quantity, price, category, notes
             FROM items
             WHERE code = ?
         ''', (code,))
-        return self.c.fetchone()
+        # Unknown codes are cached too, scanners ask for them repeatedly
+        item = self.c.fetchone()
+        self.item_cache.put(code, item)
+        return item
+
+    def _search_filter(self, keyword, filter_by):
+        """Build the condition and parameters for a keyword search"""
+        if not keyword:
+            return "", ()
+
+        if self.full_text:
+            match = fts_query(keyword, filter_by)
+            if match:
+                return "id IN (SELECT rowid FROM items_fts WHERE items_fts MATCH ?)", (match,)
+
+        pattern = f'%{keyword}%'
+        if filter_by == "Semua":
+            return "(code LIKE ? OR name LIKE ? OR category LIKE ? OR notes LIKE ?)", (pattern,) * 4
+
+        column = SEARCH_COLUMNS.get(filter_by)
+        if column is None:
+            return "", ()
+        return f"{column} LIKE ?", (pattern,)
+
+    def _where(self, *conditions):
+        conditions = [condition for condition in conditions if condition]
+        return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+    def search_items(self, keyword, filter_by, ranked=False):
+        """Search items with various filters.
+
+        With the full-text index every word matches the start of a word in
+        the filtered column(s). ranked=True orders by relevance (bm25)
+        instead of by name.
+        """
+        match = fts_query(keyword, filter_by) if self.full_text and keyword else None
+        if ranked and match:
+            self.c.execute('''
+                SELECT items.code, items.name, items.quantity, items.price, items.category, items.notes
+                FROM items_fts
+                JOIN items ON items.id = items_fts.rowid
+                WHERE items_fts MATCH ?
+                ORDER BY items_fts.rank
+            ''', (match,))
+            return self.c.fetchall()
 
-    def search_items(self, keyword, filter_by):
-        """Search items with various filters"""
         query = '''
             SELECT code, name, quantity, price, category, notes 
             FROM items
         '''
-        params = ()
-
-        if keyword:
-            if filter_by == "Semua":
-                query += " WHERE code LIKE ? OR name LIKE ? OR category LIKE ? OR notes LIKE ?"
-                params = (f'%{keyword}%', f'%{keyword}%', f'%{keyword}%', f'%{keyword}%')
-            elif filter_by == "Kode":
-                query += " WHERE code LIKE ?"
-                params = (f'%{keyword}%',)
-            elif filter_by == "Nama":
-                query += " WHERE name LIKE ?"
-                params = (f'%{keyword}%',)
-            elif filter_by == "Kategori":
-                query += " WHERE category LIKE ?"
-                params = (f'%{keyword}%',)
-            elif filter_by == "Catatan":
-                query += " WHERE notes LIKE ?"
-                params = (f'%{keyword}%',)
-
-        query += " ORDER BY name"
+        condition, params = self._search_filter(keyword, filter_by)
+        query += self._where(condition) + " ORDER BY name"
         self.c.execute(query, params)
         return self.c.fetchall()
 
+    def count_items(self, keyword="", filter_by="Semua"):
+        """Count the items matching a search (all items when keyword is empty)"""
+        condition, params = self._search_filter(keyword, filter_by)
+        self.c.execute("SELECT COUNT(*) FROM items" + self._where(condition), params)
+        return self.c.fetchone()[0]
+
+    def count_before(self, row, keyword="", filter_by="Semua", order_by="name", descending=False):
+        """Count the matching items that sort before row, i.e. its position in fetch_rows"""
+        expression = SORT_EXPRESSIONS[order_by]
+        value, code = sort_key(row, order_by)
+        op = ">" if descending else "<"
+        condition, params = self._search_filter(keyword, filter_by)
+        position = f"({expression} {op} ? OR ({expression} = ? AND code {op} ?))"
+        self.c.execute(
+            "SELECT COUNT(*) FROM items" + self._where(condition, position),
+            params + (value, value, code)
+        )
+        return self.c.fetchone()[0]
+
+    def fetch_rows(self, offset, limit, keyword="", filter_by="Semua", order_by="name", descending=False):
+        """Fetch one page of items, optionally filtered and sorted by a column"""
+        if order_by not in SORT_EXPRESSIONS:
+            raise Exception(f"Kolom '{order_by}' tidak dapat diurutkan")
+
+        condition, params = self._search_filter(keyword, filter_by)
+        self.c.execute(f'''
+            SELECT code, name, quantity, price, category, notes
+            FROM items{self._where(condition)}
+            ORDER BY {self._order(order_by, descending)}
+            LIMIT ? OFFSET ?
+        ''', params + (limit, offset))
+        return self.c.fetchall()
+
+    def fetch_page(self, limit=200, keyword="", filter_by="Semua", order_by="name", descending=False, token=None):
+        """Fetch the page that follows token, the first page without one.
+
+        Pages continue after the (sort value, code) of the previous page's
+        last row instead of skipping an OFFSET, so a page deep in a large
+        table costs the same as the first. Returns an ItemPage.
+        """
+        if order_by not in SORT_EXPRESSIONS:
+            raise Exception(f"Kolom '{order_by}' tidak dapat diurutkan")
+
+        condition, params = self._search_filter(keyword, filter_by)
+        after = ""
+        if token is not None:
+            value, code = _read_page_token(token, order_by, descending)
+            op = "<" if descending else ">"
+            if order_by == "code":
+                after, params = f"code {op} ?", params + (code,)
+            else:
+                # Spelled out instead of a row value so SQLite can seek in
+                # the expression indexes of the sort columns
+                expression = SORT_EXPRESSIONS[order_by]
+                after = f"{expression} {op}= ? AND ({expression} {op} ? OR code {op} ?)"
+                params += (value, value, code)
+
+        # One extra row tells whether another page follows
+        self.c.execute(f'''
+            SELECT code, name, quantity, price, category, notes
+            FROM items{self._where(condition, after)}
+            ORDER BY {self._order(order_by, descending)}
+            LIMIT ?
+        ''', params + (limit + 1,))
+        rows = self.c.fetchall()
+        if len(rows) <= limit:
+            return ItemPage(rows, None)
+        rows = rows[:limit]
+        return ItemPage(rows, page_token(rows[-1], order_by, descending))
+
+    def _order(self, order_by, descending):
+        direction = "DESC" if descending else "ASC"
+        if order_by == "code":
+            return f"code {direction}"
+        return f"{SORT_EXPRESSIONS[order_by]} {direction}, code {direction}"
+
     def get_summary(self):
-        """Get inventory summary statistics"""
+        """Get inventory summary statistics from the trigger maintained totals"""
         self.c.execute('''
-            SELECT 
-                COUNT(*) as total_items, 
-                COALESCE(SUM(quantity), 0) as total_quantity, 
-                COALESCE(SUM(quantity * price), 0) as total_value 
-            FROM items
+            SELECT total_items, total_quantity, total_value
+            FROM item_totals
+            WHERE id = 1
         ''')
         return self.c.fetchone()
 
+    def get_category_summary(self):
+        """Get item count, quantity and value per category"""
+        self.c.execute('''
+            SELECT category, total_items, total_quantity, total_value
+            FROM item_category_totals
+            ORDER BY category
+        ''')
+        return self.c.fetchall()
+
+    def rebuild_summary(self):
+        """Recompute the summary tables from the items table"""
+        try:
+            with self._write():
+                self.c.execute('DELETE FROM item_totals')
+                self.c.execute(f'''
+                    INSERT INTO item_totals (id, total_items, total_quantity, total_value)
+                    SELECT 1, * FROM ({SUMMARY_FROM_ITEMS})
+                ''')
+                self.c.execute('DELETE FROM item_category_totals')
+                self.c.execute(f'''
+                    INSERT INTO item_category_totals (category, total_items, total_quantity, total_value)
+                    {CATEGORY_SUMMARY_FROM_ITEMS}
+                ''')
+        except Exception as e:
+            raise Exception(f"Gagal membangun ulang ringkasan: {str(e)}")
+
+    def verify_summary(self):
+        """Compare the summary tables with the items table.
+
+        Returns a list of human readable differences, empty when the
+        totals are in sync.
+        """
+        problems = []
+
+        stored = self.get_summary()
+        stored = tuple(stored) if stored else (0, 0, 0)
+        self.c.execute(SUMMARY_FROM_ITEMS)
+        actual = tuple(self.c.fetchone())
+        if not self._totals_equal(stored, actual):
+            problems.append(f"Total: tersimpan {stored}, seharusnya {actual}")
+
+        stored_categories = {row[0]: tuple(row[1:]) for row in self.get_category_summary()}
+        self.c.execute(CATEGORY_SUMMARY_FROM_ITEMS)
+        actual_categories = {row[0]: tuple(row[1:]) for row in self.c.fetchall()}
+        for category in sorted(set(stored_categories) | set(actual_categories)):
+            stored_row = stored_categories.get(category, (0, 0, 0))
+            actual_row = actual_categories.get(category, (0, 0, 0))
+            if not self._totals_equal(stored_row, actual_row):
+                problems.append(f"Kategori '{category}': tersimpan {stored_row}, seharusnya {actual_row}")
+
+        return problems
+
+    def _totals_equal(self, stored, actual):
+        # Values are REAL sums, allow for rounding left by many small updates
+        return (stored[0] == actual[0] and stored[1] == actual[1]
+                and abs(stored[2] - actual[2]) < 0.01)
+
     def get_categories(self):
         """Get list of all unique categories"""
-        self.c.execute('SELECT DISTINCT category FROM items ORDER BY category')
-        return [row[0] for row in self.c.fetchall()]
+        self._check_shared_cache()
+        categories = self.category_cache.get("all")
+        if categories is LRUCache.MISSING:
+            self.c.execute('SELECT DISTINCT category FROM items ORDER BY category')
+            categories = tuple(row[0] for row in self.c.fetchall())
+            self.category_cache.put("all", categories)
+        return list(categories)
+
+    def invalidate_cache(self, op, code=None, old=None, new=None):
+        """Drop the cached reads made stale by one change event.
 
-    def export_to_csv(self, filename):
-        """Export database contents to CSV file"""
+        Called for every change made through this object. A GUI that writes
+        through another connection passes that connection's events here.
+        """
+        if op == "reset":
+            self.item_cache.clear()
+            self.category_cache.clear()
+            return
+
+        self.item_cache.discard(code)
+        categories = self.category_cache.peek("all")
+        if categories is LRUCache.MISSING:
+            return
+        # A category appears with a new one and may vanish with its last item
+        new_category = new is not None and new[4] not in categories
+        old_category = old is not None and (new is None or old[4] != new[4])
+        if new_category or old_category:
+            self.category_cache.clear()
+
+    def cache_stats(self):
+        """Hit, miss and eviction counters of the read caches"""
+        return {"items": self.item_cache.stats(), "categories": self.category_cache.stats()}
+
+    def explain_queries(self, keyword="a"):
+        """Query plans of the read queries the application runs.
+
+        Every read method is called with sample arguments while the
+        statements are traced. Returns (sql, plan) pairs, plan being the
+        EXPLAIN QUERY PLAN details indented by nesting level.
+        """
+        first = self.fetch_rows(0, 1)
+        row = tuple(first[0]) if first else ("", "", 0, 0, "", "")
+        calls = [
+            (self.get_summary, ()),
+            (self.get_category_summary, ()),
+            (self.get_categories, ()),
+            (self.get_item_by_code, (row[0],)),
+            (self.fetch_all, ()),
+            (self.search_items, (keyword, "Semua", True)),
+        ]
+        for filter_by in ["Semua", *SEARCH_COLUMNS]:
+            calls.append((self.count_items, (keyword, filter_by)))
+            calls.append((self.search_items, (keyword, filter_by)))
+        for order_by in SORT_EXPRESSIONS:
+            for descending in (False, True):
+                calls.append((self.fetch_rows, (0, 1, "", "Semua", order_by, descending)))
+                calls.append((self.fetch_page, (
+                    1, "", "Semua", order_by, descending, page_token(row, order_by, descending)
+                )))
+                calls.append((self.count_before, (row, "", "Semua", order_by, descending)))
+
+        statements = []
+        def trace(sql):
+            sql = " ".join(sql.split())
+            if sql.upper().startswith("SELECT") and sql not in statements:
+                statements.append(sql)
+
+        self.conn.set_trace_callback(trace)
         try:
-            self.c.execute('''
+            for function, args in calls:
+                function(*args)
+        finally:
+            self.conn.set_trace_callback(None)
+
+        plans = []
+        for sql in statements:
+            depth = {0: -1}
+            plan = []
+            for node, parent, _, detail in self.conn.execute("EXPLAIN QUERY PLAN " + sql):
+                depth[node] = depth.get(parent, -1) + 1
+                plan.append("  " * depth[node] + detail)
+            plans.append((sql, plan))
+        return plans
+
+    def export_to_csv(self, filename, chunk_size=5000, compress=None, progress_callback=None):
+        """Export database contents to CSV file.
+
+        Rows are streamed from the cursor in chunks of chunk_size, so memory
+        use does not depend on the size of the table. The file is gzip
+        compressed when compress is True, by default when filename ends in
+        .gz. progress_callback(done, total) is called after every chunk.
+        """
+        if compress is None:
+            compress = filename.lower().endswith(".gz")
+
+        # Own cursor, the progress callback may run other queries on self.c
+        cursor = self.conn.cursor()
+        try:
+            total = self.get_summary()[0]
+            cursor.execute('''
                 SELECT code, name, quantity, price, category, notes
                 FROM items
                 ORDER BY name
             ''')
             
-            rows = self.c.fetchall()
+            if compress:
+                f = gzip.open(filename, 'wt', newline='', encoding='utf-8')
+            else:
+                f = open(filename, 'w', newline='', encoding='utf-8', buffering=1024 * 1024)
             
-            with open(filename, 'w', newline='', encoding='utf-8') as f:
+            exported = 0
+            with f:
                 writer = csv.writer(f)
                 # Write header
                 writer.writerow(['Kode', 'Nama', 'Jumlah', 'Harga', 'Kategori', 'Catatan'])
                 # Write data
-                writer.writerows(rows)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    writer.writerows(rows)
+                    exported += len(rows)
+                    if progress_callback:
+                        progress_callback(exported, total)
                 
-            return len(rows)
+            return exported
         except Exception as e:
             raise Exception(f"Gagal ekspor data: {str(e)}")
+        finally:
+            cursor.close()
+
+    def export_columnar(self, filename, chunk_size=50000, progress_callback=None):
+        """Export items with their timestamps as a typed, compressed columnar file.
+
+        .parquet files need pyarrow, other names use the stdlib .sbc format
+        of columnar.py. Rows are streamed in chunks of chunk_size, each
+        chunk becomes one compressed block.
+        """
+        cursor = self.conn.cursor()
+        try:
+            total = self.get_summary()[0]
+            cursor.execute(f'''
+                SELECT {", ".join(name for name, _ in EXPORT_COLUMNS)}
+                FROM items
+                ORDER BY code
+            ''')
 
-    def import_from_csv(self, filename):
-        """Import data from CSV file to database"""
+            exported = 0
+            with ColumnarWriter(filename) as writer:
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    writer.write_chunk(rows)
+                    exported += len(rows)
+                    if progress_callback:
+                        progress_callback(exported, total)
+            return exported
+        except Exception as e:
+            raise Exception(f"Gagal ekspor data: {str(e)}")
+        finally:
+            cursor.close()
+
+    def import_from_csv(self, filename, chunk_size=5000, progress_callback=None, reject_file=None):
+        """Import data from CSV file to database.
+
+        Rows are upserted by code in batches of chunk_size, all in one
+        transaction. progress_callback(done, total) is called after every
+        batch with the characters read so far and the file size. Rows with
+        missing fields or an invalid quantity/price are not imported but
+        written to reject_file (default: <file>_ditolak.csv, only created
+        when something is rejected).
+        """
         if not os.path.exists(filename):
             raise Exception(f"File {filename} tidak ditemukan")
-            
+
+        if reject_file is None:
+            reject_file = os.path.splitext(filename)[0] + "_ditolak.csv"
+
+        imported_count = 0
+        rejected_count = 0
+        rejects = None
+        total_size = os.path.getsize(filename)
+        read_size = [0]
+        current_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        def counted_lines(f):
+            for line in f:
+                read_size[0] += len(line)
+                yield line
+
+        with self._bulk_pragmas():
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                with open(filename, 'r', newline='', encoding='utf-8') as f:
+                    reader = csv.reader(counted_lines(f))
+                    # Skip header row
+                    next(reader, None)
+
+                    batch = []
+                    for row in reader:
+                        item, reason = self._parse_csv_row(row)
+                        if reason:
+                            if rejects is None:
+                                rejects = open(reject_file, 'w', newline='', encoding='utf-8')
+                                reject_writer = csv.writer(rejects)
+                                reject_writer.writerow(['Baris', 'Alasan', 'Kode', 'Nama', 'Jumlah', 'Harga', 'Kategori', 'Catatan'])
+                            reject_writer.writerow([reader.line_num, reason] + row)
+                            rejected_count += 1
+                            continue
+
+                        batch.append(item + (current_time, current_time))
+                        if len(batch) >= chunk_size:
+                            imported_count += self._upsert_batch(batch)
+                            batch = []
+                            if progress_callback:
+                                progress_callback(read_size[0], total_size)
+
+                    if batch:
+                        imported_count += self._upsert_batch(batch)
+
+                self.conn.commit()
+            except Exception as e:
+                self.conn.rollback()
+                raise Exception(f"Gagal impor data: {str(e)}")
+            finally:
+                if rejects is not None:
+                    rejects.close()
+
+        if progress_callback:
+            progress_callback(total_size, total_size)
+        self.invalidate_cache("reset")
+        self.notify_change("reset")
+        return ImportResult(imported_count, rejected_count, reject_file if rejected_count else None)
+
+    def _parse_csv_row(self, row):
+        """Validate one CSV row, returns (item, None) or (None, reason)"""
+        if len(row) < 5:
+            return None, "Kolom kurang dari 5"
+
+        code = row[0].strip()
+        name = row[1].strip()
+        if not code or not name:
+            return None, "Kode dan Nama harus diisi"
+
         try:
-            imported_count = 0
-            current_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            with open(filename, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                # Skip header row
-                next(reader, None)
-                
-                for row in reader:
-                    if len(row) >= 5:  # Ensure we have at least the required fields
-                        code = row[0].strip()
-                        name = row[1].strip()
-                        
-                        try:
-                            quantity = int(row[2])
-                        except ValueError:
-                            quantity = 0
-                            
-                        try:
-                            price = float(row[3])
-                        except ValueError:
-                            price = 0
-                            
-                        category = row[4].strip()
-                        
-                        # Handle notes field if exists
-                        notes = row[5].strip() if len(row) > 5 else ""
-                        
-                        # Try to update first
-                        self.c.execute('''
-                            UPDATE items 
-                            SET name=?, quantity=?, price=?, category=?, notes=?, updated_at=?
-                            WHERE code=?
-                        ''', (name, quantity, price, category, notes, current_time, code))
-                        
-                        # If not updated, insert
-                        if self.c.rowcount == 0:
-                            self.c.execute('''
-                                INSERT INTO items (code, name, quantity, price, category, notes, created_at, updated_at)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                            ''', (code, name, quantity, price, category, notes, current_time, current_time))
-                            
-                        imported_count += 1
-            
-            self.conn.commit()
-            return imported_count
-            
-        except Exception as e:
-            self.conn.rollback()
-            raise Exception(f"Gagal impor data: {str(e)}")
+            quantity = int(row[2])
+        except ValueError:
+            return None, f"Jumlah tidak valid: '{row[2]}'"
+
+        try:
+            price = float(row[3])
+        except ValueError:
+            return None, f"Harga tidak valid: '{row[3]}'"
+
+        if quantity < 0 or price < 0:
+            return None, "Jumlah dan Harga tidak boleh negatif"
+
+        category = row[4].strip()
+        # Handle notes field if exists
+        notes = row[5].strip() if len(row) > 5 else ""
+        return (code, name, quantity, price, category, notes), None
+
+    def _upsert_batch(self, batch):
+        self.c.executemany('''
+            INSERT INTO items (code, name, quantity, price, category, notes, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(code) DO UPDATE SET
+                name = excluded.name,
+                quantity = excluded.quantity,
+                price = excluded.price,
+                category = excluded.category,
+                notes = excluded.notes,
+                updated_at = excluded.updated_at,
+                version = version + 1
+        ''', batch)
+        return len(batch)
+
+    @contextlib.contextmanager
+    def _bulk_pragmas(self):
+        """Relax durability and enlarge the page cache for a bulk write, then restore.
+
+        Must be entered and left outside a transaction. The journal mode is
+        left alone: the whole import is one transaction, and an in-memory
+        journal could corrupt the store on a crash.
+        """
+        settings = {"synchronous": "OFF", "cache_size": "-65536", "temp_store": "MEMORY"}
+        previous = {name: self.conn.execute(f"PRAGMA {name}").fetchone()[0] for name in settings}
+        for name, value in settings.items():
+            self.conn.execute(f"PRAGMA {name} = {value}")
+        try:
+            yield
+        finally:
+            for name, value in previous.items():
+                self.conn.execute(f"PRAGMA {name} = {value}")
+
+    def backup_database(self, backup_file, pages=256, sleep=0.01, progress_callback=None, verify=True):
+        """Create a backup of the database while it stays in use.
+
+        The copy runs in steps of `pages` pages with a pause of `sleep`
+        seconds in between, so other connections can read and write between
+        the steps. progress_callback(done, total) is called after every
+        step. With verify the backup is checked with PRAGMA integrity_check
+        and removed again if it is damaged.
+
+        Call it on a connection of its own (the app uses a second
+        DatabaseWorker); a write committed through another connection makes
+        SQLite start the copy over at the next step.
+        """
+        def report(status, remaining, total):
+            if progress_callback:
+                progress_callback(total - remaining, total)
 
-    def backup_database(self, backup_file):
-        """Create a backup of the database"""
         try:
             # Create a new connection to backup DB
             backup_conn = sqlite3.connect(backup_file)
-            
-            # Backup database
-            with backup_conn:
-                self.conn.backup(backup_conn)
-                
-            backup_conn.close()
+            try:
+                # Backup database
+                with backup_conn:
+                    self.conn.backup(backup_conn, pages=pages, progress=report, sleep=sleep)
+
+                if verify:
+                    result = backup_conn.execute("PRAGMA integrity_check").fetchone()[0]
+                    if result != "ok":
+                        raise Exception(f"hasil backup rusak ({result})")
+            finally:
+                backup_conn.close()
             return True
         except Exception as e:
+            if verify and os.path.exists(backup_file):
+                os.remove(backup_file)
             raise Exception(f"Gagal membuat backup: {str(e)}")
 
-    def restore_database(self, backup_file):
-        """Restore database from backup file"""
+    def create_rotating_backup(self, backup_dir, keep=24, **kwargs):
+        """Back up into backup_dir with a timestamped name and keep only the newest `keep` backups.
+
+        Extra keyword arguments are passed on to backup_database. Returns
+        the path of the new backup.
+        """
+        os.makedirs(backup_dir, exist_ok=True)
+        prefix = os.path.splitext(os.path.basename(self.db_name))[0] + "-"
+        timestamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        backup_file = os.path.join(backup_dir, f"{prefix}{timestamp}.db")
+        self.backup_database(backup_file, **kwargs)
+
+        # Timestamped names sort from oldest to newest
+        backups = sorted(
+            name for name in os.listdir(backup_dir)
+            if name.startswith(prefix) and name.endswith(".db")
+        )
+        for name in backups[:max(len(backups) - keep, 0)]:
+            os.remove(os.path.join(backup_dir, name))
+        return backup_file
+
+    def restore_database(self, backup_file, progress_callback=None):
+        """Restore database from backup file.
+
+        The backup is checked first and copied into a temporary file next to
+        the live database. That copy is then written into the live database
+        through this connection in a single backup step, which holds the
+        exclusive lock for the whole write. Other connections wait for it and
+        read the restored data afterwards; they keep working on the same
+        file instead of an old one that was renamed away. A failure at any
+        point leaves the live database as it was.
+        """
         if not os.path.exists(backup_file):
             raise Exception(f"File backup {backup_file} tidak ditemukan")
-            
+
+        def report(status, remaining, total):
+            if progress_callback:
+                progress_callback(total - remaining, total)
+
+        directory = os.path.dirname(os.path.abspath(self.db_name))
+        temp_file = None
         try:
-            # Create a new connection to backup DB
+            self._check_backup(backup_file)
+
+            # Copy in steps with progress first, the backup file may be on a
+            # slow disk; the live file is only locked for the local copy below
+            fd, temp_file = tempfile.mkstemp(prefix=".restore-", suffix=".db", dir=directory)
+            os.close(fd)
             backup_conn = sqlite3.connect(backup_file)
-            
-            # Close current connection
-            self.conn.close()
-            
-            # Delete current database and replace with backup
-            os.remove(self.db_name)
-            
-            # Restore from backup
-            with backup_conn:
-                backup_conn.backup(self.conn)
-                
-            backup_conn.close()
-            
-            # Reopen connection
-            self.conn = sqlite3.connect(self.db_name)
-            self.c = self.conn.cursor()
-            
-            return True
+            temp_conn = sqlite3.connect(temp_file)
+            try:
+                backup_conn.backup(temp_conn, pages=1024, progress=report)
+                # pages=-1: one step under one exclusive lock, written through
+                # the journal so a crash rolls it back
+                temp_conn.backup(self.conn, pages=-1)
+            finally:
+                temp_conn.close()
+                backup_conn.close()
         except Exception as e:
             raise Exception(f"Gagal restore database: {str(e)}")
+        finally:
+            if temp_file is not None and os.path.exists(temp_file):
+                os.remove(temp_file)
+
+        # Older backups may need the migrations
+        self.create_table()
+        self.invalidate_cache("reset")
+        self.notify_change("reset")
+        return True
+
+    def _check_backup(self, backup_file):
+        """Raise when backup_file is not a healthy SmallBizz database"""
+        try:
+            backup_conn = sqlite3.connect(f"file:{backup_file}?mode=ro", uri=True)
+            try:
+                result = backup_conn.execute("PRAGMA integrity_check").fetchone()[0]
+                has_items = backup_conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type='table' AND name='items'"
+                ).fetchone()
+            finally:
+                backup_conn.close()
+        except sqlite3.DatabaseError as e:
+            raise Exception(f"file backup tidak valid ({e})")
+
+        if result != "ok":
+            raise Exception(f"file backup rusak ({result})")
+        if not has_items:
+            raise Exception("file backup tidak berisi tabel items")
 
     def close(self):
         """Close the database connection"""
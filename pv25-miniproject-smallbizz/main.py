@@ -1,12 +1,34 @@
+import os
 import sys
+import time
 from PyQt6.QtWidgets import (QMainWindow, QApplication, QWidget, QVBoxLayout, QHBoxLayout,
-                             QLabel, QLineEdit, QPushButton, QTableWidget, QTableWidgetItem,
+                             QLabel, QLineEdit, QPushButton, QTableView, QAbstractItemView,
                              QSpinBox, QDoubleSpinBox, QComboBox, QFormLayout, QGroupBox, QMessageBox, QHeaderView, QSplitter, 
-                             QDialog, QDialogButtonBox, QTabWidget, QFileDialog)
+                             QDialog, QDialogButtonBox, QTabWidget, QFileDialog, QProgressBar)
 from PyQt6.QtGui import QAction
-from PyQt6.QtCore import Qt, QSize, QDate, QDateTime
+from PyQt6.QtCore import Qt, QSize, QDateTime, QTimer
 
+from analytics import inventory_report
+from columnar import parquet_available
 from db import DatabaseManager
+from models import InventoryTableModel
+from worker import DatabaseWorker
+
+# Automatic backups: folder, interval and how many files to keep
+BACKUP_DIR = "backups"
+BACKUP_INTERVAL_MS = 60 * 60 * 1000
+BACKUP_KEEP = 24
+
+# Connection profile from db.PERFORMANCE_PROFILES, "shared" for several
+# cashier terminals using one database file on a network disk
+DATABASE_PROFILE = os.environ.get("SMALLBIZZ_PROFILE", "default")
+# How often a shared database is checked for changes of other terminals
+SHARED_POLL_MS = 2000
+# Pause in typing after which the search runs
+SEARCH_DEBOUNCE_MS = 150
+# Longest wait of a GUI read for another connection's lock, the table shows
+# a placeholder and reads again instead of freezing the window
+GUI_BUSY_TIMEOUT_MS = 100
 
 class InventoryApp(QMainWindow):
     def __init__(self):
@@ -39,7 +61,7 @@ class InventoryApp(QMainWindow):
             QPushButton:hover {
                 background-color: #e0e0e0;
             }
-            QTableWidget {
+            QTableView {
                 gridline-color: #d0d0d0;
                 selection-background-color: #a6c9e2;
                 alternate-background-color: #f9f9f9;
@@ -57,7 +79,21 @@ class InventoryApp(QMainWindow):
             }
         """)
 
-        self.db = DatabaseManager()
+        # The GUI thread only reads; writes, imports, exports and searches
+        # run on the worker thread with its own connection
+        self.db = DatabaseManager(profile=DATABASE_PROFILE)
+        self.db.set_busy_timeout(GUI_BUSY_TIMEOUT_MS)
+        self.restoring = False
+        # (code, version) of the selected item, see update_item, and whether
+        # the worker is still reading it
+        self.selected_version = None
+        self.selection_pending = False
+        self.worker = DatabaseWorker(self.db.db_name, self, profile=DATABASE_PROFILE)
+        self.worker.busyChanged.connect(self.set_busy)
+        # Backups get their own connection and thread, so sales, edits and
+        # searches on the worker go through between the copy steps
+        self.backup_worker = DatabaseWorker(self.db.db_name, self, profile=DATABASE_PROFILE)
+        self.backup_worker.busyChanged.connect(self.set_busy)
 
         # Main widget with splitter for resizable sections
         self.main_widget = QWidget()
@@ -71,9 +107,14 @@ class InventoryApp(QMainWindow):
         self.create_menu()
         self.create_toolbar()
         self.create_main_content()
+        self.create_status_bar()
 
-        # Load initial data
+        # Load initial data, later changes are patched in by on_item_changed
         self.load_data()
+        self.worker.itemChanged.connect(self.on_item_changed)
+        
+        self.setup_auto_backup()
+        self.setup_shared_refresh()
         
     def create_menu(self):
         menu_bar = self.menuBar()
@@ -93,6 +134,17 @@ class InventoryApp(QMainWindow):
         
         file_menu.addSeparator()
         
+        backup_action = QAction("Backup Database", self)
+        backup_action.setShortcut("Ctrl+B")
+        backup_action.triggered.connect(self.backup_data)
+        file_menu.addAction(backup_action)
+        
+        restore_action = QAction("Restore Database", self)
+        restore_action.triggered.connect(self.restore_data)
+        file_menu.addAction(restore_action)
+        
+        file_menu.addSeparator()
+        
         exit_action = QAction("Keluar", self)
         exit_action.setShortcut("Ctrl+Q")
         exit_action.triggered.connect(self.close)
@@ -114,6 +166,10 @@ class InventoryApp(QMainWindow):
         refresh_action.triggered.connect(self.load_data)
         view_menu.addAction(refresh_action)
         
+        analytics_action = QAction("Analisis Stok", self)
+        analytics_action.triggered.connect(self.show_analytics)
+        view_menu.addAction(analytics_action)
+        
         # Help menu
         help_menu = menu_bar.addMenu("Bantuan")
         
@@ -154,13 +210,15 @@ class InventoryApp(QMainWindow):
             QMessageBox.warning(self, "Input Error", "Kode dan Nama harus diisi!")
             return
         
-        try:
-            self.db.insert_item(code, name, qty, prc, cat, note)
-            self.load_data()
+        def done(_):
             dialog.accept()
             QMessageBox.information(self, "Tambah Berhasil", f"Item '{name}' berhasil ditambahkan")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Gagal menambahkan item: {str(e)}")
+        
+        self.worker.submit(
+            DatabaseManager.insert_item, code, name, qty, prc, cat, note,
+            on_done=done,
+            on_error=lambda e: QMessageBox.critical(self, "Error", f"Gagal menambahkan item: {e}")
+        )
 
     def create_main_content(self):
         # Use splitter for resizable areas
@@ -284,19 +342,22 @@ class InventoryApp(QMainWindow):
         return group
 
     def create_table(self):
-        self.table = QTableWidget()
-        self.table.setColumnCount(6)  # Added column for notes
-        self.table.setHorizontalHeaderLabels(["Kode", "Nama", "Stok", "Harga Satuan", "Kategori", "Catatan"])
-        self.table.setSortingEnabled(True)
+        # Rows are paged in from the database by the model as the view scrolls
+        self.model = InventoryTableModel(self.db, parent=self)
+        
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.setAlternatingRowColors(True)
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         
         # Connect table selection to form update
-        self.table.itemSelectionChanged.connect(self.on_table_selection_changed)
+        self.table.selectionModel().selectionChanged.connect(self.on_table_selection_changed)
         
         # Set columns to resize with table
         header = self.table.horizontalHeader()
+        header.setSortIndicator(1, Qt.SortOrder.AscendingOrder)
+        self.table.setSortingEnabled(True)
         header.setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
         header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
         header.setSectionResizeMode(2, QHeaderView.ResizeMode.ResizeToContents)
@@ -315,6 +376,14 @@ class InventoryApp(QMainWindow):
         self.filter_combo = QComboBox()
         self.filter_combo.addItems(["Semua", "Kode", "Nama", "Kategori", "Catatan"])
         
+        # Search as you type, one timer restarted by every keystroke
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.live_search)
+        self.search_input.textChanged.connect(self.schedule_search)
+        self.filter_combo.currentIndexChanged.connect(self.schedule_search)
+        
         self.search_btn = QPushButton("Cari")
         self.search_btn.clicked.connect(self.search_items)
         
@@ -356,6 +425,29 @@ class InventoryApp(QMainWindow):
         self.summary_layout.addWidget(self.total_value)
         self.summary_layout.addWidget(self.date_label)
 
+    def create_status_bar(self):
+        status_bar = self.statusBar()
+        
+        # Busy indicator, switches to a percentage for imports and exports
+        self.busy_bar = QProgressBar()
+        self.busy_bar.setMaximumWidth(200)
+        self.busy_bar.setMaximumHeight(16)
+        self.busy_bar.setRange(0, 0)
+        self.busy_bar.hide()
+        status_bar.addPermanentWidget(self.busy_bar)
+
+    def set_busy(self, busy):
+        busy = self.worker.is_busy() or self.backup_worker.is_busy()
+        self.busy_bar.setRange(0, 0)
+        self.busy_bar.setVisible(busy)
+        if not busy:
+            self.statusBar().clearMessage()
+
+    def show_progress(self, message, done, total):
+        self.statusBar().showMessage(message)
+        self.busy_bar.setRange(0, 100)
+        self.busy_bar.setValue(int(done * 100 / total) if total else 100)
+
     def create_identity_label(self):
         self.identity_label = QLabel("Muhammad Nune Huria Sakti - F1D022075")
         self.identity_label.setStyleSheet("color: gray; font-size: 12px; font-style: italic;")
@@ -428,54 +520,53 @@ class InventoryApp(QMainWindow):
         help_dialog.setLayout(layout)
         help_dialog.exec()
 
-    def load_data(self):
-        self.table.setRowCount(0)
-        items = self.db.fetch_all()
-        
-        for row_data in items:
-            row_number = self.table.rowCount()
-            self.table.insertRow(row_number)
-            
-            # Assume db returns kode, nama, qty, price, category, notes
-            for column_number, data in enumerate(row_data):
-                item = QTableWidgetItem(str(data))
-                
-                # Format price column with currency format
-                if column_number == 3:  # Price column
-                    item = QTableWidgetItem(f"Rp {int(data):,}")
-                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-                
-                self.table.setItem(row_number, column_number, item)
-        
-        self.update_summary()
-        
-        # Update date/time label
-        now = QDateTime.currentDateTime()
-        self.date_label.setText(f"Terakhir update: {now.toString('dd/MM/yyyy HH:mm')}")
-
     def on_table_selection_changed(self):
-        selected_rows = self.table.selectedItems()
+        selected_rows = self.table.selectionModel().selectedRows()
         if selected_rows:
-            row = selected_rows[0].row()
-            self.item_code.setText(self.table.item(row, 0).text())
-            self.item_name.setText(self.table.item(row, 1).text())
-            self.quantity.setValue(int(self.table.item(row, 2).text()))
+            row_data = self.model.row_at(selected_rows[0].row())
+            if row_data is None:
+                return
+            code = row_data[0]
+            self.fill_form(row_data)
             
-            # Parse price from string like "Rp 5,000"
-            price_text = self.table.item(row, 3).text().replace("Rp ", "").replace(",", "")
-            self.price.setValue(float(price_text))
+            # Version first, then the values: a change made in between is
+            # reported as a conflict on update instead of being overwritten
+            def read(db):
+                return db.get_item_version(code), db.get_item_by_code(code)
             
-            # Find category index
-            category_text = self.table.item(row, 4).text()
-            category_index = self.category.findText(category_text)
-            if category_index >= 0:
-                self.category.setCurrentIndex(category_index)
-                
-            # Set notes if available
-            if self.table.columnCount() > 5 and self.table.item(row, 5) is not None:
-                self.notes.setText(self.table.item(row, 5).text())
-            else:
-                self.notes.clear()
+            def done(result):
+                version, current = result
+                self.selected_version = (code, version)
+                self.selection_pending = False
+                if current is not None and tuple(current) != tuple(row_data):
+                    self.fill_form(current)
+            
+            def failed(error):
+                self.selection_pending = False
+                self.statusBar().showMessage(f"Gagal membaca item: {error}", 5000)
+            
+            # On the worker, the file can be locked by another terminal for seconds
+            self.selected_version = None
+            self.selection_pending = True
+            self.worker.submit(read, group="selection", on_done=done, on_error=failed)
+
+    def fill_form(self, row_data):
+        code, name, quantity, price, category, notes = row_data
+        self.item_code.setText(code)
+        self.item_name.setText(name)
+        self.quantity.setValue(int(quantity or 0))
+        self.price.setValue(float(price or 0))
+        
+        # Find category index
+        category_index = self.category.findText(category or "")
+        if category_index >= 0:
+            self.category.setCurrentIndex(category_index)
+            
+        # Set notes if available
+        if notes:
+            self.notes.setText(notes)
+        else:
+            self.notes.clear()
 
     def add_item(self):
         code = self.item_code.text().strip()
@@ -489,13 +580,15 @@ class InventoryApp(QMainWindow):
             QMessageBox.warning(self, "Input Error", "Kode dan Nama harus diisi!")
             return
             
-        try:
-            self.db.insert_item(code, name, quantity, price, category, notes)
-            self.load_data()
+        def done(_):
             self.clear_form()
             QMessageBox.information(self, "Tambah Berhasil", f"Item '{name}' berhasil ditambahkan")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Gagal menambahkan item: {str(e)}")
+        
+        self.worker.submit(
+            DatabaseManager.insert_item, code, name, quantity, price, category, notes,
+            on_done=done,
+            on_error=lambda e: QMessageBox.critical(self, "Error", f"Gagal menambahkan item: {e}")
+        )
 
     def update_item(self):
         code = self.item_code.text().strip()
@@ -508,14 +601,25 @@ class InventoryApp(QMainWindow):
         if not code:
             QMessageBox.warning(self, "Update Error", "Kode Barang harus diisi untuk update!")
             return     
+
+        if self.selection_pending:
+            # Without the version the update could overwrite another terminal's change
+            QMessageBox.warning(self, "Update Error", "Data item masih dimuat, coba lagi sebentar.")
+            return
+
+        expected_version = None
+        if self.selected_version is not None and self.selected_version[0] == code:
+            expected_version = self.selected_version[1]
             
-        try:
-            self.db.update_item(code, name, quantity, price, category, notes)
-            self.load_data()
+        def done(_):
             self.clear_form()
             QMessageBox.information(self, "Update Berhasil", f"Item '{name}' berhasil diupdate")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Gagal mengupdate item: {str(e)}")
+        
+        self.worker.submit(
+            DatabaseManager.update_item, code, name, quantity, price, category, notes,
+            expected_version=expected_version, on_done=done,
+            on_error=lambda e: QMessageBox.critical(self, "Error", f"Gagal mengupdate item: {e}")
+        )
 
     def delete_item(self):
         selected_rows = self.table.selectionModel().selectedRows()
@@ -531,42 +635,53 @@ class InventoryApp(QMainWindow):
         )
 
         if reply == QMessageBox.StandardButton.Yes:
-            for row in selected_rows:
-                item_code = self.table.item(row.row(), 0).text()  # Assuming the first column is the item code
-                try:
-                    self.db.delete_item(item_code)
-                except Exception as e:
-                    QMessageBox.critical(self, "Error", f"Gagal menghapus item: {str(e)}")
-            self.load_data()
-            QMessageBox.information(self, "Hapus Berhasil", "Item berhasil dihapus")
+            # Read the codes first, every delete removes its row from the model
+            item_codes = [self.model.row_at(row.row())[0] for row in selected_rows]
+            
+            def done(errors):
+                for error in errors:
+                    QMessageBox.critical(self, "Error", f"Gagal menghapus item: {error}")
+                QMessageBox.information(self, "Hapus Berhasil", "Item berhasil dihapus")
+            
+            # All selected rows are deleted with one commit
+            self.worker.submit(DatabaseManager.delete_items, item_codes, on_done=done)
 
     def load_data(self):
-        self.table.setRowCount(0)
-        items = self.db.fetch_all()
+        # The connection is closed while restoring, finishing reloads anyway
+        if self.restoring:
+            return
+        self.model.refresh()
         
-        for row_data in items:
-            row_number = self.table.rowCount()
-            self.table.insertRow(row_number)
-            
-            for column_number, data in enumerate(row_data):
-                item = QTableWidgetItem(str(data))
-                
-                # Format price column with currency format
-                if column_number == 3:  # Price column
-                    item = QTableWidgetItem(f"Rp {int(data):,}")
-                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-                
-                self.table.setItem(row_number, column_number, item)
-        
-        # Resize columns and update summary
-        self.table.resizeColumnsToContents()
+        # Update summary
         self.update_summary()
-    
-        # Update date/time label
+        self.update_date_label()
+
+    def update_date_label(self):
         now = QDateTime.currentDateTime()
         self.date_label.setText(f"Terakhir update: {now.toString('dd/MM/yyyy HH:mm')}")
 
+    def on_item_changed(self, op, code, old, new):
+        # The worker wrote through its own connection
+        self.db.invalidate_cache(op, code, old, new)
+
+        # Writes queued before a restore; the reload after it shows them
+        if self.restoring:
+            return
+
+        # Imports and restores touch everything, reload once
+        if op == "reset":
+            self.load_data()
+            return
+
+        # Patch only the changed row, the totals are kept by database triggers
+        self.model.apply_change(op, code, old, new)
+        self.update_summary()
+        self.update_date_label()
+
     def clear_form(self):
+        self.worker.cancel_group("selection")
+        self.selected_version = None
+        self.selection_pending = False
         self.item_code.clear()
         self.item_name.clear()
         self.quantity.setValue(0)
@@ -574,65 +689,109 @@ class InventoryApp(QMainWindow):
         self.category.setCurrentIndex(0)
         self.notes.clear()
 
+    def schedule_search(self):
+        self.search_timer.start()
+
+    def live_search(self):
+        # Trailing spaces and the same filter again do not change the result
+        keyword = self.search_input.text().strip()
+        if (keyword, self.filter_combo.currentText()) != (self.model.keyword, self.model.filter_by):
+            self.search_items()
+
     def search_items(self):
+        self.search_timer.stop()
+        if self.restoring:
+            return
         keyword = self.search_input.text().strip()
         filter_by = self.filter_combo.currentText()
 
-        items = self.db.search_items(keyword, filter_by)
-        self.table.setRowCount(0)
-        
-        for row_data in items:
-            row_number = self.table.rowCount()
-            self.table.insertRow(row_number)
-            
-            for column_number, data in enumerate(row_data):
-                item = QTableWidgetItem(str(data))
-                
-                # Format price column
-                if column_number == 3:  # Price column
-                    item = QTableWidgetItem(f"Rp {int(data):,}")
-                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-                    
-                self.table.setItem(row_number, column_number, item)
-        
-        self.table.resizeColumnsToContents()
-        QMessageBox.information(self, "Pencarian", f"Ditemukan {self.table.rowCount()} item")
+        order_by, descending = self.model.sort_order()
+        page_size = self.model.page_size
+        started = time.perf_counter()
+        
+        # Count and read the first page off the GUI thread
+        def search(db):
+            total = db.count_items(keyword, filter_by)
+            page = db.fetch_page(page_size, keyword, filter_by, order_by, descending)
+            return total, [tuple(row) for row in page.rows], page.token
+        
+        def done(result):
+            if self.restoring:
+                return
+            self.model.set_filter(keyword, filter_by)
+            if self.model.sort_order() == (order_by, descending):
+                self.model.load(*result)
+            else:
+                self.model.refresh()
+            elapsed = (time.perf_counter() - started) * 1000
+            self.statusBar().showMessage(f"Ditemukan {self.model.total_count()} item ({elapsed:.0f} ms)")
+        
+        # A newer search cancels the one still running, results only go to the status bar
+        self.worker.submit(
+            search, group="search", on_done=done,
+            on_error=lambda e: self.statusBar().showMessage(f"Gagal mencari item: {e}")
+        )
 
     def reset_search(self):
         self.search_input.clear()
         self.filter_combo.setCurrentIndex(0)
+        self.search_timer.stop()
+        self.worker.cancel_group("search")
+        self.model.set_filter("", "Semua")
         self.load_data()
 
     def update_summary(self):
-        items = self.db.fetch_all()
-        total_items = len(items)
+        # Read the running totals, no need to sum the whole table. On the
+        # worker, the file can be locked by another terminal for seconds;
+        # a newer read replaces one still waiting
+        def read(db):
+            return db.get_summary(), db.get_category_summary()
         
-        # Calculate totals from data
-        try:
-            total_stock = sum([item[2] for item in items])
-            total_value = sum([item[2] * item[3] for item in items])
-        except:
-            total_stock = 0
-            total_value = 0
+        self.worker.submit(read, group="summary", on_done=self.show_summary)
 
+    def show_summary(self, result):
+        (total_items, total_stock, total_value), categories = result
         self.total_items.setText(f"Total Jenis: {total_items}")
         self.total_stock.setText(f"Total Stok: {total_stock}")
         self.total_value.setText(f"Nilai Inventori: Rp{total_value:,.0f}")
 
+        # Per category breakdown on hover
+        lines = [
+            f"{category or '-'}: {count} jenis, {quantity} stok, Rp{value:,.0f}"
+            for category, count, quantity, value in categories
+        ]
+        self.total_value.setToolTip("\n".join(lines))
+
+    def show_analytics(self):
+        # Reads every item, so it runs on the worker
+        self.worker.submit(
+            inventory_report,
+            on_done=lambda lines: QMessageBox.information(self, "Analisis Stok", "\n".join(lines)),
+            on_error=lambda e: QMessageBox.critical(self, "Analisis Gagal", f"Gagal menganalisis stok: {e}")
+        )
+
     def export_data(self):
+        # Columnar files are for reporting jobs, Parquet only with pyarrow
+        filters = "CSV Files (*.csv);;CSV gzip (*.csv.gz);;Kolom SmallBizz (*.sbc);;"
+        if parquet_available():
+            filters += "Parquet (*.parquet);;"
         file_name, _ = QFileDialog.getSaveFileName(
             self,
             "Export Data",
             "",
-            "CSV Files (*.csv);;All Files (*)"
+            filters + "All Files (*)"
         )
         
         if file_name:
-            try:
-                self.db.export_to_csv(file_name)
-                QMessageBox.information(self, "Export Berhasil", f"Data berhasil diekspor ke {file_name}")
-            except Exception as e:
-                QMessageBox.critical(self, "Export Gagal", f"Gagal mengekspor data: {str(e)}")
+            export = DatabaseManager.export_to_csv
+            if file_name.lower().endswith((".sbc", ".parquet")):
+                export = DatabaseManager.export_columnar
+            self.worker.submit(
+                export, file_name,
+                on_progress=lambda done, total: self.show_progress("Mengekspor data...", done, total),
+                on_done=lambda _: QMessageBox.information(self, "Export Berhasil", f"Data berhasil diekspor ke {file_name}"),
+                on_error=lambda e: QMessageBox.critical(self, "Export Gagal", f"Gagal mengekspor data: {e}")
+            )
 
     def import_data(self):
         file_name, _ = QFileDialog.getOpenFileName(
@@ -643,12 +802,134 @@ class InventoryApp(QMainWindow):
         )
         
         if file_name:
-            try:
-                count = self.db.import_from_csv(file_name)
-                self.load_data()
-                QMessageBox.information(self, "Import Berhasil", f"{count} data berhasil diimpor")
-            except Exception as e:
-                QMessageBox.critical(self, "Import Gagal", f"Gagal mengimpor data: {str(e)}")
+            def done(result):
+                message = f"{result.imported} data berhasil diimpor"
+                if result.rejected:
+                    message += f"\n{result.rejected} baris ditolak, lihat {result.reject_file}"
+                QMessageBox.information(self, "Import Berhasil", message)
+            
+            self.worker.submit(
+                DatabaseManager.import_from_csv, file_name,
+                on_progress=lambda done, total: self.show_progress("Mengimpor data...", done, total),
+                on_done=done,
+                on_error=lambda e: QMessageBox.critical(self, "Import Gagal", f"Gagal mengimpor data: {e}")
+            )
+
+    def backup_data(self):
+        if self.restoring:
+            QMessageBox.warning(self, "Backup Database", "Restore sedang berjalan, coba lagi setelah selesai.")
+            return
+        
+        file_name, _ = QFileDialog.getSaveFileName(
+            self,
+            "Backup Database",
+            "",
+            "SQLite Database (*.db);;All Files (*)"
+        )
+        
+        if file_name:
+            # Copied in small steps on the backup connection, the shop can keep working
+            self.backup_worker.submit(
+                DatabaseManager.backup_database, file_name,
+                on_progress=lambda done, total: self.show_progress("Membuat backup...", done, total),
+                on_done=lambda _: QMessageBox.information(self, "Backup Berhasil", f"Database berhasil dibackup ke {file_name}"),
+                on_error=lambda e: QMessageBox.critical(self, "Backup Gagal", str(e))
+            )
+
+    def restore_data(self):
+        if self.restoring:
+            return
+        if self.backup_worker.is_busy():
+            QMessageBox.warning(self, "Restore Database", "Backup sedang berjalan, coba lagi setelah selesai.")
+            return
+        
+        file_name, _ = QFileDialog.getOpenFileName(
+            self,
+            "Restore Database",
+            "",
+            "SQLite Database (*.db);;All Files (*)"
+        )
+        
+        if not file_name:
+            return
+        
+        reply = QMessageBox.question(
+            self,
+            "Konfirmasi Restore",
+            "Semua data saat ini akan diganti dengan isi backup. Lanjutkan?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        
+        # Closed until the restore is done, so its reads do not hold up the restore's exclusive lock
+        self.restoring = True
+        self.table.setEnabled(False)
+        self.model.load(0, [])
+        self.db.close()
+        
+        def finished():
+            self.restoring = False
+            self.db.reopen()
+            self.load_data()
+            self.table.setEnabled(True)
+            # A search typed while restoring
+            self.live_search()
+        
+        def done(_):
+            finished()
+            QMessageBox.information(self, "Restore Berhasil", f"Database berhasil dipulihkan dari {file_name}")
+        
+        def failed(error):
+            finished()
+            QMessageBox.critical(self, "Restore Gagal", error)
+        
+        self.worker.submit(
+            DatabaseManager.restore_database, file_name,
+            on_progress=lambda done, total: self.show_progress("Memulihkan database...", done, total),
+            on_done=done,
+            on_error=failed
+        )
+
+    def setup_shared_refresh(self):
+        if not self.db.shared:
+            return
+        self.seen_data_version = self.worker.data_version()
+        self.shared_timer = QTimer(self)
+        self.shared_timer.timeout.connect(self.check_shared_changes)
+        self.shared_timer.start(SHARED_POLL_MS)
+
+    def check_shared_changes(self):
+        # Other terminals commit straight to the file, no change events arrive.
+        # Read on the worker connection: the app's own writes go through it
+        # and arrive as change events, they do not move its data_version
+        if self.restoring or self.worker.is_busy():
+            return
+        version = self.worker.data_version()
+        if version != self.seen_data_version:
+            self.seen_data_version = version
+            self.load_data()
+
+    def setup_auto_backup(self):
+        self.backup_timer = QTimer(self)
+        self.backup_timer.timeout.connect(self.run_auto_backup)
+        self.backup_timer.start(BACKUP_INTERVAL_MS)
+
+    def run_auto_backup(self):
+        if self.restoring or self.backup_worker.is_busy():
+            return
+        self.backup_worker.submit(
+            DatabaseManager.create_rotating_backup, BACKUP_DIR, BACKUP_KEEP,
+            on_done=lambda path: self.statusBar().showMessage(f"Backup otomatis tersimpan di {path}", 5000),
+            on_error=lambda e: self.statusBar().showMessage(f"Backup otomatis gagal: {e}", 10000)
+        )
+
+    def closeEvent(self, event):
+        # Let queued writes finish before closing the connections
+        self.backup_worker.close()
+        self.worker.close()
+        self.db.close()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,139 @@
+import argparse
+import sys
+
+from analytics import inventory_report
+from db import DatabaseManager
+
+
+def verify_summary(db, args):
+    problems = db.verify_summary()
+    if not problems:
+        print("Ringkasan sesuai dengan tabel items")
+        return 0
+
+    for problem in problems:
+        print(problem)
+    if args.fix:
+        db.rebuild_summary()
+        print("Ringkasan telah dibangun ulang")
+        return 0
+    return 1
+
+
+def rebuild_summary(db, args):
+    db.rebuild_summary()
+    total_items, total_quantity, total_value = db.get_summary()
+    print(f"Ringkasan dibangun ulang: {total_items} jenis, {total_quantity} stok, Rp{total_value:,.0f}")
+    return 0
+
+
+def rebuild_search(db, args):
+    if not db.full_text:
+        print("SQLite ini tidak mendukung FTS5, pencarian memakai LIKE")
+        return 1
+    db.rebuild_search_index()
+    print("Indeks pencarian dibangun ulang")
+    return 0
+
+
+def backup(db, args):
+    def report(done, total):
+        print(f"\rMembuat backup... {done * 100 // total if total else 100}%", end="", flush=True)
+
+    path = db.create_rotating_backup(args.dir, args.keep, progress_callback=report)
+    print(f"\nBackup tersimpan di {path}")
+    return 0
+
+
+def stock_snapshot(db, args):
+    snapshot_id = db.create_stock_snapshot()
+    print(f"Snapshot stok #{snapshot_id} tersimpan")
+    return 0
+
+
+def stock_as_of(db, args):
+    if args.code:
+        print(f"{args.code}: {db.stock_as_of(args.date, args.code)}")
+        return 0
+    for code, quantity in db.stock_as_of(args.date):
+        print(f"{code}: {quantity}")
+    return 0
+
+
+def analytics(db, args):
+    for line in inventory_report(db, args.top, args.low):
+        print(line)
+    return 0
+
+
+def plan_problem(detail):
+    """Full table scan or an extra sort step in one EXPLAIN QUERY PLAN line"""
+    detail = detail.strip()
+    return detail == "SCAN items" or "TEMP B-TREE" in detail
+
+
+def explain(db, args):
+    problems = 0
+    for sql, plan in db.explain_queries(args.keyword):
+        print(sql)
+        for detail in plan:
+            marker = "!" if plan_problem(detail) else " "
+            problems += marker == "!"
+            print(f"  {marker} {detail}")
+        print()
+    print(f"{problems} langkah scan penuh/sort sementara (ditandai !)")
+    return 1 if args.strict and problems else 0
+
+
+def report_migration(done, total):
+    print(f"Migrasi skema database {done}/{total}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perawatan database SmallBizz")
+    parser.add_argument("--db", default="smallbizz.db", help="file database (default: smallbizz.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    verify = commands.add_parser("verify-summary", help="cek selisih tabel ringkasan dengan tabel items")
+    verify.add_argument("--fix", action="store_true", help="bangun ulang ringkasan jika ada selisih")
+    verify.set_defaults(func=verify_summary)
+
+    rebuild = commands.add_parser("rebuild-summary", help="hitung ulang tabel ringkasan")
+    rebuild.set_defaults(func=rebuild_summary)
+
+    search = commands.add_parser("rebuild-search", help="bangun ulang indeks pencarian FTS5")
+    search.set_defaults(func=rebuild_search)
+
+    backup_parser = commands.add_parser("backup", help="backup bergilir yang diverifikasi, untuk dijadwalkan lewat cron/Task Scheduler")
+    backup_parser.add_argument("--dir", default="backups", help="folder backup (default: backups)")
+    backup_parser.add_argument("--keep", type=int, default=24, help="jumlah backup terbaru yang disimpan (default: 24)")
+    backup_parser.set_defaults(func=backup)
+
+    snapshot_parser = commands.add_parser("stock-snapshot", help="simpan snapshot stok untuk mempercepat stock-as-of")
+    snapshot_parser.set_defaults(func=stock_snapshot)
+
+    as_of_parser = commands.add_parser("stock-as-of", help="stok pada tanggal tertentu")
+    as_of_parser.add_argument("date", help="'YYYY-MM-DD HH:MM:SS', tanggal saja berarti awal hari itu")
+    as_of_parser.add_argument("--code", help="hanya item dengan kode ini")
+    as_of_parser.set_defaults(func=stock_as_of)
+
+    analytics_parser = commands.add_parser("analytics", help="nilai stok per kategori, barang teratas, persentil dan kelas ABC")
+    analytics_parser.add_argument("--top", type=int, default=10, help="jumlah barang teratas (default: 10)")
+    analytics_parser.add_argument("--low", type=int, default=5, help="batas stok menipis (default: 5)")
+    analytics_parser.set_defaults(func=analytics)
+
+    explain_parser = commands.add_parser("explain", help="tampilkan EXPLAIN QUERY PLAN semua query aplikasi")
+    explain_parser.add_argument("--keyword", default="a", help="kata kunci contoh untuk query pencarian")
+    explain_parser.add_argument("--strict", action="store_true", help="keluar dengan kode 1 jika ada scan penuh atau sort sementara")
+    explain_parser.set_defaults(func=explain)
+
+    args = parser.parse_args(argv)
+    db = DatabaseManager(args.db, progress_callback=report_migration)
+    try:
+        return args.func(db, args)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+import sqlite3
+from collections import OrderedDict
+
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer
+
+from db import ITEM_COLUMNS, is_busy_error, page_token, sort_key
+
+
+class InventoryTableModel(QAbstractTableModel):
+    """Table model that reads the items table lazily, one page at a time.
+
+    Give it a connection with a short busy_timeout: while another
+    connection locks the file, reads that give up show PLACEHOLDER and are
+    tried again after BUSY_RETRY_MS instead of freezing the window.
+    """
+
+    HEADERS = ["Kode", "Nama", "Stok", "Harga Satuan", "Kategori", "Catatan"]
+    PRICE_COLUMN = 3
+    BUSY_RETRY_MS = 250
+    PLACEHOLDER = "…"
+
+    def __init__(self, db, page_size=200, max_pages=20, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.page_size = page_size
+        # Only this many pages are kept in memory, older ones are read again when needed
+        self.max_pages = max_pages
+
+        self.keyword = ""
+        self.filter_by = "Semua"
+        self.sort_column = 1
+        self.descending = False
+
+        self._pages = OrderedDict()
+        # Continuation token of every page whose start is known, kept after
+        # the page itself is dropped from the cache
+        self._tokens = {}
+        self._total = 0
+        self._loaded = 0
+        # A read gave up on a locked file; the retry refreshes when it was a count
+        self._retry_pending = False
+        self._refresh_pending = False
+
+    def set_filter(self, keyword, filter_by):
+        """Set the search used by the next refresh"""
+        self.keyword = keyword
+        self.filter_by = filter_by
+
+    def refresh(self):
+        """Drop all cached rows and count the matching items again"""
+        try:
+            total = self.db.count_items(self.keyword, self.filter_by)
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e):
+                raise
+            self._retry_later(refresh=True)
+            return
+        self.beginResetModel()
+        self._pages.clear()
+        self._tokens.clear()
+        self._total = total
+        self._loaded = 0
+        self.endResetModel()
+
+    def _retry_later(self, refresh=False):
+        self._refresh_pending = self._refresh_pending or refresh
+        if not self._retry_pending:
+            self._retry_pending = True
+            QTimer.singleShot(self.BUSY_RETRY_MS, self._retry)
+
+    def _retry(self):
+        self._retry_pending = False
+        if self._refresh_pending:
+            self._refresh_pending = False
+            self.refresh()
+        elif self._loaded:
+            # The view asks again for the cells it shows
+            self.dataChanged.emit(self.index(0, 0), self.index(self._loaded - 1, len(self.HEADERS) - 1))
+
+    def total_count(self):
+        """Number of items matching the current search, fetched or not"""
+        return self._total
+
+    def apply_change(self, op, code, old, new):
+        """Patch the rows touched by one DatabaseManager change event instead of reloading"""
+        if op == "reset":
+            self.refresh()
+            return
+
+        try:
+            self._apply_change(old, new)
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e):
+                raise
+            # Where the row goes is unknown, count everything again later
+            self._retry_later(refresh=True)
+
+    def _apply_change(self, old, new):
+        old_visible = old is not None and self.db.item_matches(old, self.keyword, self.filter_by)
+        new_visible = new is not None and self.db.item_matches(new, self.keyword, self.filter_by)
+
+        # Same position in the current order, only the cells changed
+        if old_visible and new_visible and self._sort_key(old) == self._sort_key(new):
+            row = self._cached_position(old)
+            if row is not None:
+                page_number, offset = divmod(row, self.page_size)
+                self._pages[page_number][offset] = tuple(new)
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.HEADERS) - 1))
+            return
+
+        if old_visible:
+            self._remove_row(old, new if new_visible else None)
+        if new_visible:
+            self._insert_row(new)
+
+    def _sort_key(self, row):
+        return sort_key(row, ITEM_COLUMNS[self.sort_column])
+
+    def _sorts_before(self, a, b):
+        if self.descending:
+            return self._sort_key(a) > self._sort_key(b)
+        return self._sort_key(a) < self._sort_key(b)
+
+    def _cached_position(self, row):
+        """Position of row found through the cached pages, None when they do not cover it"""
+        for page_number, page in self._pages.items():
+            if not page:
+                continue
+            start = page_number * self.page_size
+            is_last_page = start + len(page) >= self._total
+            if self._sorts_before(row, page[0]) and page_number != 0:
+                continue
+            if self._sorts_before(page[-1], row) and not is_last_page:
+                continue
+
+            # Binary search for the number of page rows sorting before row
+            low, high = 0, len(page)
+            while low < high:
+                middle = (low + high) // 2
+                if self._sorts_before(page[middle], row):
+                    low = middle + 1
+                else:
+                    high = middle
+            return start + low
+        return None
+
+    def _position(self, row, inserted=None):
+        """Position of row in the current order.
+
+        When the database already contains `inserted` in place of row (an
+        update that moved the item), it is not counted.
+        """
+        position = self._cached_position(row)
+        if position is not None:
+            return position
+
+        position = self.db.count_before(
+            row, self.keyword, self.filter_by,
+            ITEM_COLUMNS[self.sort_column], self.descending
+        )
+        if inserted is not None and self._sorts_before(inserted, row):
+            position -= 1
+        return position
+
+    def _drop_pages_from(self, row):
+        first_page = row // self.page_size
+        for page_number in [p for p in self._pages if p >= first_page]:
+            del self._pages[page_number]
+        # The start of first_page is still behind the same row
+        for page_number in [p for p in self._tokens if p > first_page]:
+            del self._tokens[page_number]
+
+    def _remove_row(self, old, inserted=None):
+        position = self._position(old, inserted)
+        self._total -= 1
+        if position < self._loaded:
+            self.beginRemoveRows(QModelIndex(), position, position)
+            self._loaded -= 1
+            self._drop_pages_from(position)
+            self.endRemoveRows()
+        else:
+            # The last cached page can reach past the fetched rows
+            self._drop_pages_from(position)
+
+    def _insert_row(self, new):
+        position = self._position(new)
+        all_loaded = self._loaded == self._total
+        self._total += 1
+        # Rows past the fetched part only grow the total, fetchMore reads them later
+        if position < self._loaded or all_loaded:
+            self.beginInsertRows(QModelIndex(), position, position)
+            self._loaded += 1
+            self._drop_pages_from(position)
+            self.endInsertRows()
+        else:
+            self._drop_pages_from(position)
+
+    def load(self, total, first_page, next_token=None):
+        """Show a search that was counted and partly fetched elsewhere, e.g. on a worker thread"""
+        self.beginResetModel()
+        self._pages.clear()
+        self._tokens.clear()
+        if first_page:
+            self._pages[0] = [tuple(r) for r in first_page]
+        if next_token is not None:
+            self._tokens[1] = next_token
+        self._total = total
+        self._loaded = 0
+        self.endResetModel()
+
+    def sort_order(self):
+        """Column name and direction the rows are currently sorted by"""
+        return ITEM_COLUMNS[self.sort_column], self.descending
+
+    def row_at(self, row):
+        """Return the raw (code, name, quantity, price, category, notes) tuple of a row"""
+        if row < 0 or row >= self._loaded:
+            return None
+
+        page_number, offset = divmod(row, self.page_size)
+        page = self._pages.get(page_number)
+        if page is None:
+            try:
+                page = self._fetch_page(page_number)
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e):
+                    raise
+                self._retry_later()
+                return None
+            self._pages[page_number] = page
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page_number)
+
+        return page[offset] if offset < len(page) else None
+
+    def _fetch_page(self, page_number):
+        """Read a page after its keyset token, by offset only when its start is unknown"""
+        order_by, descending = self.sort_order()
+        token = self._tokens.get(page_number)
+        previous = self._pages.get(page_number - 1)
+        if token is None and previous is not None and len(previous) == self.page_size:
+            token = page_token(previous[-1], order_by, descending)
+
+        if page_number == 0 or token is not None:
+            rows, next_token = self.db.fetch_page(
+                self.page_size, self.keyword, self.filter_by, order_by, descending, token
+            )
+        else:
+            # A jump with the scroll bar, the pages after it continue by token
+            rows = self.db.fetch_rows(
+                page_number * self.page_size, self.page_size,
+                self.keyword, self.filter_by, order_by, descending
+            )
+            next_token = None
+            if len(rows) == self.page_size:
+                next_token = page_token(rows[-1], order_by, descending)
+
+        if next_token is not None:
+            self._tokens[page_number + 1] = next_token
+        return [tuple(r) for r in rows]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < self._total
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.page_size, self._total - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+
+        column = index.column()
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            if column == self.PRICE_COLUMN:
+                return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+            return None
+
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+
+        row = self.row_at(index.row())
+        if row is None:
+            return self.PLACEHOLDER if self._retry_pending else None
+
+        value = row[column]
+        # Price is only formatted when the cell is actually drawn
+        if column == self.PRICE_COLUMN:
+            return f"Rp {int(value or 0):,}"
+        return "" if value is None else str(value)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return str(section + 1)
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        """Sort in SQLite instead of in the view"""
+        self.sort_column = column
+        self.descending = order == Qt.SortOrder.DescendingOrder
+        self.refresh()
@@ -0,0 +1,196 @@
+import itertools
+import threading
+import time
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from db import DatabaseManager
+
+
+class DatabaseTask(QRunnable):
+    """One queued call on the worker's DatabaseManager"""
+
+    def __init__(self, worker, task_id, function, args, kwargs):
+        super().__init__()
+        self.worker = worker
+        self.task_id = task_id
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
+
+    def run(self):
+        if not self.worker._start(self):
+            # Lets the GUI thread see that the worker went idle
+            self.worker.taskFailed.emit(self.task_id, "dibatalkan")
+            return
+        try:
+            result = self.function(self.worker.db, *self.args, **self.kwargs)
+        except Exception as e:
+            self.worker._finish(self)
+            self.worker.taskFailed.emit(self.task_id, str(e))
+        else:
+            if self.worker._finish(self):
+                self.worker.taskFinished.emit(self.task_id, result)
+            else:
+                self.worker.taskFailed.emit(self.task_id, "dibatalkan")
+
+
+class DatabaseWorker(QObject):
+    """Runs DatabaseManager calls on a background thread with its own connection.
+
+    Calls are queued with submit() and run one at a time, in order.
+    Results, errors and progress are delivered as Qt signals, so the
+    callbacks given to submit() always run on the GUI thread.
+    """
+
+    taskFinished = pyqtSignal(int, object)
+    taskFailed = pyqtSignal(int, str)
+    taskProgress = pyqtSignal(int, object, object)
+    # Item change events from the worker connection, see add_change_listener
+    itemChanged = pyqtSignal(str, object, object, object)
+    busyChanged = pyqtSignal(bool)
+
+    # Minimum time between two progress signals of one task
+    PROGRESS_INTERVAL = 0.05
+
+    def __init__(self, db_name="smallbizz.db", parent=None, profile="default"):
+        super().__init__(parent)
+        self.db = DatabaseManager(db_name, check_same_thread=False, profile=profile)
+        self.db.add_change_listener(self.itemChanged.emit)
+
+        # A single thread keeps SQLite access serialized
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.pool.setExpiryTimeout(-1)
+
+        self._ids = itertools.count(1)
+        self._callbacks = {}
+        self._groups = {}
+        self._lock = threading.Lock()
+        self._running = None
+        # Tasks the pool thread has not finished, cancelled ones included:
+        # their query may still be using the connection
+        self._queued = set()
+        self._busy = False
+
+        self.taskFinished.connect(self._on_finished)
+        self.taskFailed.connect(self._on_failed)
+        self.taskProgress.connect(self._on_progress)
+
+    def submit(self, function, *args, on_done=None, on_error=None, on_progress=None, group=None, **kwargs):
+        """Queue function(db, *args, **kwargs) and return its task id.
+
+        With on_progress a progress_callback keyword is passed to function
+        and on_progress(done, total) is called on the GUI thread. A task
+        submitted with a group cancels the earlier task of that group, so
+        only the latest search of a burst delivers its result.
+        """
+        task_id = next(self._ids)
+        if on_progress is not None:
+            kwargs["progress_callback"] = self._progress_reporter(task_id)
+
+        task = DatabaseTask(self, task_id, function, args, kwargs)
+        if group is not None:
+            previous = self._groups.get(group)
+            if previous is not None:
+                self.cancel(previous)
+            self._groups[group] = task
+
+        self._callbacks[task_id] = (on_done, on_error, on_progress, group)
+        with self._lock:
+            self._queued.add(task)
+        self.pool.start(task)
+        self._update_busy()
+        return task_id
+
+    def cancel(self, task):
+        """Drop a queued task, or interrupt its query when it is running"""
+        with self._lock:
+            task.cancelled = True
+            if self._running is task:
+                self.db.conn.interrupt()
+        self._release(task.task_id)
+
+    def cancel_group(self, group):
+        """Cancel the latest task of a group if it has not delivered its result yet"""
+        task = self._groups.get(group)
+        if task is not None:
+            self.cancel(task)
+
+    def is_busy(self):
+        """True while a task waits for its result or still runs after being cancelled"""
+        with self._lock:
+            return bool(self._callbacks or self._queued)
+
+    def data_version(self):
+        """PRAGMA data_version of the worker connection, changed only by commits of other connections.
+
+        Reads the connection from the calling thread, so only call it while
+        the worker is not busy.
+        """
+        return self.db.data_version()
+
+    def close(self):
+        """Cancel queued searches, wait for the remaining tasks and close the connection"""
+        for task in list(self._groups.values()):
+            self.cancel(task)
+        self.pool.waitForDone()
+        self.db.close()
+
+    def _progress_reporter(self, task_id):
+        last = [0.0]
+
+        def report(done, total):
+            now = time.monotonic()
+            if done >= total or now - last[0] >= self.PROGRESS_INTERVAL:
+                last[0] = now
+                self.taskProgress.emit(task_id, done, total)
+        return report
+
+    # Called on the pool thread around every task
+    def _start(self, task):
+        with self._lock:
+            if task.cancelled:
+                self._queued.discard(task)
+                return False
+            self._running = task
+            return True
+
+    def _finish(self, task):
+        with self._lock:
+            self._running = None
+            self._queued.discard(task)
+            return not task.cancelled
+
+    # Called on the GUI thread through queued signals
+    def _release(self, task_id):
+        callbacks = self._callbacks.pop(task_id, None)
+        if callbacks is not None:
+            group = callbacks[3]
+            if group is not None and self._groups.get(group) is not None \
+                    and self._groups[group].task_id == task_id:
+                del self._groups[group]
+        self._update_busy()
+        return callbacks
+
+    def _update_busy(self):
+        busy = self.is_busy()
+        if busy != self._busy:
+            self._busy = busy
+            self.busyChanged.emit(busy)
+
+    def _on_finished(self, task_id, result):
+        callbacks = self._release(task_id)
+        if callbacks and callbacks[0]:
+            callbacks[0](result)
+
+    def _on_failed(self, task_id, message):
+        callbacks = self._release(task_id)
+        if callbacks and callbacks[1]:
+            callbacks[1](message)
+
+    def _on_progress(self, task_id, done, total):
+        callbacks = self._callbacks.get(task_id)
+        if callbacks and callbacks[2]:
+            callbacks[2](done, total)